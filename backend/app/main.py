@@ -1,20 +1,61 @@
 from dotenv import load_dotenv
 
 load_dotenv()
-from fastapi import FastAPI, UploadFile, File, HTTPException, BackgroundTasks, Query
+from fastapi import FastAPI, UploadFile, File, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from contextlib import asynccontextmanager
 from pathlib import Path
+import hashlib
+import json
 import os
-from fastapi.responses import JSONResponse
+import threading
+import time
+import uuid
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
+from starlette.concurrency import run_in_threadpool
 import logging
 from typing import Optional, Dict, List
 
-from .services import ocr, pdf_ocr, chunker, embedder
-from .services.faiss_store import store_chunks as faiss_store_chunks, query_chunks
-from .services.embedder import get_embedder
-from .services.llm import generate_structured_answer
+from .services import embedder, reranker, metrics, warmup, dedup
+from .services.faiss_store import (
+    query_chunks, find_document_by_hash, get_index_manager, delete_document, document_exists, RETRIEVAL_MODES
+)
+from .services.embedding_cache import get_embedding_cache
+from .services.answer_cache import get_answer_cache, digest
+from .services.ingest import recover_index, run_job
+from .services.jobs import JobQueue, JobStore
+from .services.executors import run_in_search_executor
+from .services.query_batcher import QUERY_BATCHING, embed_query, get_query_batcher
+from .services.llm import close_client
+from .services.synthesis import synthesize, stream_synthesize
+
+# Created in lifespan, so importing the app neither opens the job database nor touches the filesystem
+job_queue: Optional[JobQueue] = None
+
+def _ingest_when_writer():
+    """Run ingestion in the worker that holds the index writer lock: now, or once the current writer exits."""
+    if get_index_manager().acquire_writer(blocking=True):
+        try:
+            recover_index()  # Vectors a crashed writer never persisted
+        except Exception as e:
+            logger.error(f"❌ Restoring vectors missing from the FAISS index failed: {e}", exc_info=True)
+        job_queue.start()  # Resumes jobs left unfinished by a previous run
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    global job_queue
+    UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+    INCOMING_DIR.mkdir(parents=True, exist_ok=True)
+    job_queue = JobQueue(JobStore(), run_job)
+    # With several workers one becomes the writer; the rest serve queries and leave uploads in the job table
+    threading.Thread(target=_ingest_when_writer, name="index-writer", daemon=True).start()
+    warmup.start()  # Loads the index and models in the background; see /ready
+    yield
+    job_queue.shutdown()
+    get_index_manager().release_writer()
+    await close_client()
 
-app = FastAPI(title="Document Research Backend (FAISS Only)")
+app = FastAPI(title="Document Research Backend (FAISS Only)", lifespan=lifespan)
 
 # Configure CORS
 app.add_middleware(
@@ -29,7 +70,77 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 UPLOAD_DIR = Path(__file__).parent.parent / "data"
-UPLOAD_DIR.mkdir(parents=True, exist_ok=True)
+# Uploads are streamed here first and renamed into UPLOAD_DIR once complete
+INCOMING_DIR = UPLOAD_DIR / ".incoming"
+UPLOAD_CHUNK_BYTES = 1024 * 1024
+ALLOWED_TYPES = ["application/pdf", "image/jpeg", "image/png", "image/tiff"]
+
+# Byte-identical re-uploads skip OCR, chunking and embedding entirely
+file_dedup_stats = {"hits": 0, "misses": 0}
+
+def _file_hit_rate() -> float:
+    total = file_dedup_stats["hits"] + file_dedup_stats["misses"]
+    return file_dedup_stats["hits"] / total if total else 0.0
+
+def _queue_depth() -> int:
+    counts = job_queue.store.counts()
+    return sum(counts.get(status, 0) for status in ("queued", "retrying"))
+
+# Scrape-time gauges
+metrics.Gauge("index_vectors", "Vectors in the FAISS index", fn=lambda: get_index_manager().info()["vectors"])
+metrics.Gauge("index_pending_deletes", "Deleted vectors awaiting compaction", fn=lambda: get_index_manager().info()["pending_deletes"])
+metrics.Gauge("lexical_chunks", "Chunks in the BM25 index", fn=lambda: get_index_manager().lexical.stats()["chunks"])
+metrics.Gauge("ingest_jobs", "Ingestion jobs by status", ("status",), fn=lambda: job_queue.store.counts())
+metrics.Gauge("ingest_queue_depth", "Ingestion jobs waiting to run (queued or retrying)", fn=_queue_depth)
+metrics.Gauge("cache_hit_ratio", "Hit ratio of the embedding, answer and upload caches", ("cache",), fn=lambda: {
+    "embeddings": get_embedding_cache().stats()["hit_rate"],
+    "answers": get_answer_cache().stats()["hit_rate"],
+    "files": _file_hit_rate(),
+})
+metrics.Gauge("query_batch_mean_size", "Mean queries per embedding/search micro-batch",
+              fn=lambda: get_query_batcher().stats()["mean_batch_size"] if QUERY_BATCHING else 0.0)
+metrics.Gauge("dedup_chunks", "Chunks seen at ingest and near-duplicates skipped (DEDUP_MODE=index)", ("outcome",),
+              fn=lambda: {"seen": dedup.stats()["chunks_seen"], "dropped": dedup.stats()["chunks_dropped"]})
+metrics.Gauge("dedup_results_collapsed", "Near-duplicate search results folded into a better-ranked copy",
+              fn=lambda: dedup.stats()["results_collapsed"])
+metrics.Gauge("ready", "1 once startup warm-up has loaded the index and models", fn=lambda: float(warmup.is_ready()))
+
+@app.middleware("http")
+async def record_request_timing(request: Request, call_next):
+    """Request latency histogram, plus a Server-Timing stage breakdown when asked for."""
+    started = time.perf_counter()
+    breakdown = metrics.METRICS_TIMING_HEADER == "always" or (
+        metrics.METRICS_TIMING_HEADER == "request" and request.headers.get("x-timing") == "1"
+    )
+    token = metrics.start_request_timing() if breakdown else None
+    try:
+        response = await call_next(request)
+    finally:
+        timings = metrics.finish_request_timing(token) if token else None
+    elapsed = time.perf_counter() - started
+    route = request.scope.get("route")
+    metrics.HTTP_REQUEST_SECONDS.observe(
+        elapsed, method=request.method, route=getattr(route, "path", "other"), status=response.status_code
+    )
+    if timings is not None:
+        response.headers["Server-Timing"] = metrics.server_timing(timings + [("total", elapsed)])
+    return response
+
+@app.get("/health")
+def health():
+    """Liveness: the process is up and serving requests"""
+    return {"status": "ok"}
+
+@app.get("/ready")
+def ready():
+    """Readiness: 200 once the index and models are loaded, 503 while warming up or if warm-up failed"""
+    state = warmup.status()
+    return JSONResponse(status_code=200 if state["status"] == "ready" else 503, content=state)
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def prometheus_metrics():
+    """Stage histograms, request latency and gauges in the Prometheus text format"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
 
 @app.get("/files")
 def list_uploaded_files():
@@ -37,34 +148,142 @@ def list_uploaded_files():
     files = [f.name for f in UPLOAD_DIR.glob("*") if f.is_file()]
     return {"files": files}
 
+@app.get("/cache/stats")
+def cache_stats():
+    """Hit/miss counters for the embedding, answer and file-level upload caches"""
+    return {
+        "embeddings": get_embedding_cache().stats(),
+        "answers": get_answer_cache().stats(),
+        "files": file_dedup_stats
+    }
+
+@app.delete("/documents/{name}")
+def delete_document_endpoint(name: str):
+    """Remove a document's file and its chunks from the index"""
+    file_path = UPLOAD_DIR / Path(name).name
+    if not document_exists(name) and not file_path.is_file():
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    # A pending ingest job would re-index the document after it is deleted
+    cancelled_jobs = job_queue.store.cancel_pending(name)
+    if cancelled_jobs is None:
+        raise HTTPException(status_code=409, detail="Document is being ingested; delete it once its job finishes")
+
+    deleted_chunks = delete_document(name)
+    if file_path.is_file():
+        file_path.unlink()
+    return {"status": "deleted", "filename": name, "chunks": deleted_chunks, "cancelled_jobs": cancelled_jobs}
+
+@app.get("/index")
+def index_info():
+    """Type and size of the FAISS index, this worker's role and snapshot, whether a migration is running, near-duplicate and query batching counters"""
+    return {
+        **get_index_manager().info(),
+        "ingesting": job_queue.started,
+        "dedup": dedup.stats(),
+        "query_batching": get_query_batcher().stats() if QUERY_BATCHING else None
+    }
+
+def _retrieve(question: str, **kwargs) -> List[Dict]:
+    return query_chunks(embedder.get_embedder(), question, **kwargs)
+
+def _retrieve_reranked(question: str, k: int, candidates: int, budget_ms: float, **kwargs) -> tuple:
+    """Over-retrieve, then re-rank with the cross-encoder within the latency budget."""
+    first_stage = _retrieve(question, k=max(candidates, k), **kwargs)
+    chunks, info = reranker.rerank(question, first_stage, k, budget_ms=budget_ms)
+    logger.info(f"🎯 Re-ranked {info['scored']}/{info['candidates']} candidates in {info['ms']:.0f} ms"
+                + (f" (skipped: {info['skipped']})" if info["skipped"] else ""))
+    return chunks, info
+
+def _embed_question(question: str) -> List[float]:
+    return embed_query(embedder.get_embedder(), question)
+
+async def _cache_lookup(scope: tuple, question: str):
+    """Check the answer cache; returns (cached value or None, question embedding if computed)."""
+    cache = get_answer_cache()
+    embedding = None
+    if cache.semantic:
+        embedding = await run_in_search_executor(_embed_question, question)
+    return cache.get(scope, question, embedding), embedding
+
+def _index_version() -> int:
+    return get_index_manager().version()
+
+async def _scope_version() -> int:
+    """Index version for cache scopes, read off the event loop: it may load the index or wait on its lock."""
+    return await run_in_search_executor(_index_version)
+
+async def _synthesis_scope(payload: dict) -> tuple:
+    return (
+        "synthesize",
+        digest(payload.get("results", [])),
+        payload.get("style", "detailed"),
+        bool(payload.get("include_sources", True)),
+        payload.get("length", "long"),
+        await _scope_version()
+    )
+
 @app.get("/query")
 async def query_docs(
     q: str = Query(..., description="Your question to ask the documents"),
     k: int = 4,
-    docs: Optional[str] = None
+    docs: Optional[str] = None,
+    nprobe: Optional[int] = Query(None, description="IVF lists to probe (IVF index types only)"),
+    ef_search: Optional[int] = Query(None, description="HNSW search breadth (HNSW index type only)"),
+    mode: Optional[str] = Query(None, description="Retrieval mode: hybrid, dense or lexical (default RETRIEVAL_MODE)"),
+    rerank: Optional[bool] = Query(None, description="Re-rank candidates with the cross-encoder (default RERANK_ENABLED)"),
+    rerank_candidates: Optional[int] = Query(None, description="First-stage candidates to re-rank (default RERANK_CANDIDATES)"),
+    rerank_budget_ms: Optional[float] = Query(None, description="Latency budget for re-ranking in ms (default RERANK_BUDGET_MS)")
 ):
+    if mode and mode not in RETRIEVAL_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {', '.join(RETRIEVAL_MODES)}")
     try:
-        embedder_instance = embedder.get_embedder()
         filters = {}
+        doc_list = []
         if docs:
             doc_list = [d.strip() for d in docs.split(",")]
             filters["filename"] = {"$in": doc_list}
 
-        retrieved_chunks = query_chunks(embedder_instance, q, k=k, filters=filters)
+        if rerank is None:
+            rerank = reranker.RERANK_ENABLED
+        rerank_options = (rerank_candidates or reranker.RERANK_CANDIDATES, rerank_budget_ms or reranker.RERANK_BUDGET_MS) if rerank else None
+
+        scope = ("query", k, tuple(sorted(doc_list)), nprobe, ef_search, mode, rerank_options, await _scope_version())
+        cached, query_vector = await _cache_lookup(scope, q)
+        if cached is not None:
+            return {**cached, "query": q, "cached": True}
+
+        # Embedding, search and re-ranking are CPU-bound; keep them off the event loop
+        search_kwargs = dict(filters=filters, nprobe=nprobe, ef_search=ef_search, query_vector=query_vector, mode=mode)
+        rerank_info = None
+        if rerank_options:
+            retrieved_chunks, rerank_info = await run_in_search_executor(
+                _retrieve_reranked, q, k, *rerank_options, **search_kwargs
+            )
+        else:
+            retrieved_chunks = await run_in_search_executor(_retrieve, q, k=k, **search_kwargs)
 
         # Extract relevant metadata for citation (assuming page_number is in metadata)
         detailed_results = []
         for chunk in retrieved_chunks:
-            detailed_results.append({
+            result = {
                 "filename": chunk['metadata'].get('filename', 'N/A'),
                 "content": chunk['content'],
-                "citation": f"Page {chunk['metadata'].get('page_number', '?')}, Chunk {chunk['metadata'].get('chunk_num', '?')}"
-            })
+                "citation": _format_citation(chunk['metadata'])
+            }
+            if chunk.get('duplicates'):
+                # Near-identical chunks collapsed into this one (boilerplate repeated across documents)
+                result["also_in"] = [f"{d.get('filename', 'N/A')}, {_format_citation(d)}" for d in chunk['duplicates']]
+            detailed_results.append(result)
 
-        return {
+        response = {
             "query": q,
             "results": detailed_results
         }
+        if rerank_info:
+            response["rerank"] = rerank_info
+        get_answer_cache().put(scope, q, response, query_vector)
+        return response
     except Exception as e:
         logger.error(f"Query failed: {str(e)}", exc_info=True)
         return JSONResponse(
@@ -72,6 +291,15 @@ async def query_docs(
             content={"error": "Query failed", "details": str(e)}
         )
 
+def _format_citation(metadata: Dict) -> str:
+    page_start = metadata.get('page_number', '?')
+    page_end = metadata.get('page_end', page_start)
+    pages = f"Page {page_start}" if page_end == page_start else f"Pages {page_start}-{page_end}"
+    citation = f"{pages}, Chunk {metadata.get('chunk_num', '?')}"
+    if metadata.get('duplicate_pages'):
+        citation += f" (repeated on pages {', '.join(str(p) for p in metadata['duplicate_pages'])})"
+    return citation
+
 @app.post("/synthesize")
 async def synthesize_answer(payload: dict):
     try:
@@ -84,7 +312,12 @@ async def synthesize_answer(payload: dict):
         if not question or not results:
             raise HTTPException(status_code=400, detail="Missing question or results")
 
-        detailed_response = generate_structured_answer(
+        scope = await _synthesis_scope(payload)
+        cached, question_vector = await _cache_lookup(scope, question)
+        if cached is not None:
+            return {**cached, "cached": True}
+
+        detailed_response = await synthesize(
             question,
             results,
             style=style,
@@ -92,10 +325,12 @@ async def synthesize_answer(payload: dict):
             length=length
         )
 
-        return {
+        response = {
             "answer": detailed_response,
             "type": "detailed"
         }
+        get_answer_cache().put(scope, question, response, question_vector)
+        return response
     except Exception as e:
         logger.error(f"Synthesis failed: {str(e)}", exc_info=True)
         return JSONResponse(
@@ -103,74 +338,166 @@ async def synthesize_answer(payload: dict):
             content={"error": "Synthesis failed", "details": str(e)}
         )
 
+async def _stream_to_disk(file: UploadFile) -> tuple:
+    """Copy an upload to a temp file in fixed-size chunks, hashing as we go."""
+    tmp_path = INCOMING_DIR / f"{uuid.uuid4().hex}.part"
+    sha = hashlib.sha256()
+    size = 0
+    with open(tmp_path, "wb") as f:
+        while True:
+            chunk = await file.read(UPLOAD_CHUNK_BYTES)
+            if not chunk:
+                break
+            sha.update(chunk)
+            size += len(chunk)
+            await run_in_threadpool(f.write, chunk)
+    return tmp_path, sha.hexdigest(), size
+
+async def _accept_upload(file: UploadFile, chunk_size: int, chunk_overlap: int) -> Dict:
+    """Store one uploaded file and queue it for ingestion unless it is a duplicate."""
+    tmp_path, sha256, size = await _stream_to_disk(file)
+    try:
+        existing = find_document_by_hash(sha256)
+        if existing:
+            file_dedup_stats["hits"] += 1
+            logger.info(f"♻️ {file.filename} is identical to already indexed {existing}, skipping")
+            return {"status": "duplicate", "filename": file.filename, "duplicate_of": existing}
+        active = job_queue.store.find_active(sha256)
+        if active:
+            file_dedup_stats["hits"] += 1
+            return {"status": "queued", "filename": file.filename, "job_id": active["id"], "duplicate_of": active["filename"]}
+        file_dedup_stats["misses"] += 1
+
+        file_path = UPLOAD_DIR / Path(file.filename).name
+        os.replace(tmp_path, file_path)
+
+        job = job_queue.enqueue(
+            file.filename,
+            file_path,
+            file.content_type,
+            sha256,
+            {"chunk_size": chunk_size, "chunk_overlap": chunk_overlap}
+        )
+        return {"status": "queued", "filename": file.filename, "job_id": job["id"], "size": size}
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+def _sse(data: Dict, event: Optional[str] = None) -> str:
+    prefix = f"event: {event}\n" if event else ""
+    return f"{prefix}data: {json.dumps(data)}\n\n"
+
+@app.post("/synthesize/stream")
+async def synthesize_answer_stream(payload: dict):
+    """
+    Same as /synthesize, but streams the answer as Server-Sent Events:
+    `data: {"token": ...}` per delta, then `event: done` with time-to-first-token
+    and total latency in milliseconds (or `event: error`).
+    """
+    question = payload.get("question", "")
+    results = payload.get("results", [])
+    if not question or not results:
+        raise HTTPException(status_code=400, detail="Missing question or results")
+
+    scope = await _synthesis_scope(payload)
+    cached, question_vector = await _cache_lookup(scope, question)
+
+    async def events():
+        started = time.perf_counter()
+        if cached is not None:
+            yield _sse({"token": cached["answer"]})
+            yield _sse({"ttft_ms": (time.perf_counter() - started) * 1000, "total_ms": 0.0, "cached": True}, event="done")
+            return
+
+        ttft_ms = None
+        answer = []
+        try:
+            async for token in stream_synthesize(
+                question,
+                results,
+                style=payload.get("style", "detailed"),
+                include_sources=payload.get("include_sources", True),
+                length=payload.get("length", "long")
+            ):
+                if ttft_ms is None:
+                    ttft_ms = (time.perf_counter() - started) * 1000
+                    metrics.observe_stage("synthesis_ttft", ttft_ms / 1000)
+                answer.append(token)
+                yield _sse({"token": token})
+        except Exception as e:
+            logger.error(f"Streaming synthesis failed: {str(e)}", exc_info=True)
+            yield _sse({"error": "Synthesis failed", "details": str(e)}, event="error")
+            return
+        total_ms = (time.perf_counter() - started) * 1000
+        metrics.observe_stage("synthesis_total", total_ms / 1000)
+        logger.info(f"⏱️ Synthesis stream: TTFT {ttft_ms or 0:.0f} ms, total {total_ms:.0f} ms")
+        get_answer_cache().put(scope, question, {"answer": "".join(answer), "type": "detailed"}, question_vector)
+        yield _sse({"ttft_ms": ttft_ms, "total_ms": total_ms}, event="done")
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.post("/upload")
 async def upload_document(
-    background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     chunk_size: int = 500,
     chunk_overlap: int = 100
 ):
     logger.info(f"Received upload: {file.filename} with content_type: {file.content_type}")
-    allowed_types = ["application/pdf", "image/jpeg", "image/png", "image/tiff"]
-    if file.content_type not in allowed_types:
+    if file.content_type not in ALLOWED_TYPES:
         logger.warning(f"Unsupported file type: {file.content_type} for file {file.filename}")
         raise HTTPException(status_code=400, detail="Unsupported file type")
 
     try:
-        file_path = UPLOAD_DIR / file.filename
-        with open(file_path, "wb") as f:
-            f.write(await file.read())
-
-        background_tasks.add_task(
-            process_document,
-            file_path,
-            file.content_type,
-            file.filename,
-            chunk_size,
-            chunk_overlap
-        )
-
-        return {"status": "success", "filename": file.filename}
+        return await _accept_upload(file, chunk_size, chunk_overlap)
     except Exception as e:
         logger.error(f"Upload failed: {str(e)}")
         raise HTTPException(500, "Document processing failed") from e
 
-def process_document(file_path: Path, content_type: str, filename: str, chunk_size: int, chunk_overlap: int):
-    logger.info(f"🔄 Started processing {filename}")
-
-    try:
-        if content_type.startswith("image/"):
-            logger.info("🧠 Running OCR on image...")
-            text = ocr.extract_text_from_image(file_path)
-        else:
-            logger.info("🧠 Running OCR on PDF...")
-            text = pdf_ocr.ocr_pdf(file_path)
-
-        if not text.strip():
-            logger.warning(f"⚠️ No text extracted from {filename}")
-            return
+@app.post("/upload/batch")
+async def upload_documents(
+    files: List[UploadFile] = File(...),
+    chunk_size: int = 500,
+    chunk_overlap: int = 100
+):
+    """Accept many files in one request; each is streamed to disk and queued for ingestion"""
+    logger.info(f"Received batch upload of {len(files)} files")
+    results = []
+    for file in files:
+        if file.content_type not in ALLOWED_TYPES:
+            logger.warning(f"Unsupported file type: {file.content_type} for file {file.filename}")
+            results.append({"status": "rejected", "filename": file.filename, "error": "Unsupported file type"})
+            continue
+        try:
+            results.append(await _accept_upload(file, chunk_size, chunk_overlap))
+        except Exception as e:
+            logger.error(f"Upload failed for {file.filename}: {str(e)}")
+            results.append({"status": "error", "filename": file.filename, "error": str(e)})
+    return {"results": results}
 
-        logger.info("✂️ Chunking text...")
-        chunks = chunker.chunk_text(text, chunk_size, chunk_overlap)
-        logger.info(f"📦 Chunked into {len(chunks)} chunks")
-
-        logger.info("🧬 Embedding chunks...")
-        embedder_instance = get_embedder()
-        embeddings = embedder_instance.embed_documents(chunks)
-        logger.info("✅ Embeddings created")
-
-        logger.info("📚 Storing in FAISS vector store...")
-        metadatas = [
-            {
-                "filename": filename,
-                "chunk_num": i,
-                "page_number": (i + 1)  # Assuming sequential page numbering per document
-            }
-            for i in range(len(chunks))
-        ]
+@app.get("/jobs")
+def list_jobs(status: Optional[str] = None, limit: int = 100):
+    """Ingestion jobs, newest first, with per-status counts"""
+    return {
+        "jobs": job_queue.store.list(status=status, limit=limit),
+        "counts": job_queue.store.counts()
+    }
 
-        faiss_store_chunks(embedder_instance, chunks, metadatas)
-        logger.info(f"✅ Successfully processed and stored {filename} in FAISS")
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """Status, current stage (extract / chunk / embed / index) and progress of one job"""
+    job = job_queue.store.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
 
-    except Exception as e:
-        logger.error(f"❌ Processing failed for {filename}: {str(e)}", exc_info=True)
\ No newline at end of file
+@app.post("/jobs/{job_id}/retry")
+def retry_job(job_id: str):
+    """Re-run a failed job from the start"""
+    job = job_queue.retry(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
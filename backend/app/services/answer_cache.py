@@ -0,0 +1,143 @@
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Dict, Hashable, Optional
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# In-memory cache of /query and /synthesize responses
+ANSWER_CACHE_MAX_ENTRIES = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1024"))
+ANSWER_CACHE_TTL = float(os.getenv("ANSWER_CACHE_TTL", "3600"))
+# Cosine similarity above which a differently worded question reuses a cached answer; 0 disables
+ANSWER_CACHE_SIMILARITY = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0"))
+
+
+def normalize_question(question: str) -> str:
+    """Case-fold, collapse whitespace and drop trailing punctuation."""
+    return re.sub(r"\s+", " ", question).strip().lower().rstrip("?!. ")
+
+def digest(value: Any) -> str:
+    """Stable hash of a JSON-serializable value, for use inside a cache scope."""
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+class _Entry:
+    __slots__ = ("scope", "value", "expires_at", "embedding")
+
+    def __init__(self, scope: Hashable, value: Any, expires_at: float, embedding: Optional[np.ndarray]):
+        self.scope = scope
+        self.value = value
+        self.expires_at = expires_at
+        self.embedding = embedding
+
+
+class AnswerCache:
+    """
+    TTL + LRU cache of answers. Entries are keyed on a scope (everything that
+    affects the answer besides the question: k, document filter, options and the
+    index version) plus the normalized question. With a similarity threshold set,
+    a miss falls back to the most similar cached question in the same scope.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = ANSWER_CACHE_MAX_ENTRIES,
+        ttl: float = ANSWER_CACHE_TTL,
+        similarity: float = ANSWER_CACHE_SIMILARITY,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity = similarity
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[tuple, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def semantic(self) -> bool:
+        return self.similarity > 0
+
+    def get(self, scope: Hashable, question: str, embedding: Optional[np.ndarray] = None) -> Optional[Any]:
+        key = (scope, normalize_question(question))
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry.expires_at > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.value
+            if entry:
+                del self._entries[key]
+
+            if self.semantic and embedding is not None:
+                match = self._most_similar(scope, embedding, now)
+                if match is not None:
+                    self._entries.move_to_end(match)
+                    self.semantic_hits += 1
+                    return self._entries[match].value
+
+            self.misses += 1
+            return None
+
+    def _most_similar(self, scope: Hashable, embedding: np.ndarray, now: float) -> Optional[tuple]:
+        candidates = [
+            (key, entry) for key, entry in self._entries.items()
+            if entry.scope == scope and entry.embedding is not None and entry.expires_at > now
+        ]
+        if not candidates:
+            return None
+        matrix = np.stack([entry.embedding for _, entry in candidates])
+        scores = matrix @ _unit(embedding)
+        best = int(np.argmax(scores))
+        return candidates[best][0] if scores[best] >= self.similarity else None
+
+    def put(self, scope: Hashable, question: str, value: Any, embedding: Optional[np.ndarray] = None):
+        key = (scope, normalize_question(question))
+        unit = _unit(embedding) if embedding is not None else None
+        with self._lock:
+            self._entries[key] = _Entry(scope, value, time.time() + self.ttl, unit)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            size = len(self._entries)
+        lookups = self.hits + self.semantic_hits + self.misses
+        return {
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": ((self.hits + self.semantic_hits) / lookups) if lookups else 0.0,
+            "evictions": self.evictions,
+            "entries": size,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "similarity_threshold": self.similarity,
+        }
+
+
+def _unit(vector) -> np.ndarray:
+    vector = np.asarray(vector, dtype="float32")
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+@lru_cache(maxsize=1)
+def get_answer_cache() -> AnswerCache:
+    return AnswerCache()
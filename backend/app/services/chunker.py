@@ -1,10 +1,22 @@
 from ..config import CHROMA_DB_PATH, TESSERACT_PATH
-from langchain_text_splitters import RecursiveCharacterTextSplitter
-from typing import List, Optional
+from bisect import bisect_right
+from typing import List, Optional, Dict
 import logging
 
 logger = logging.getLogger(__name__)
 
+PAGE_SEPARATOR = "\n\n"
+
+def _splitter(chunk_size: int, chunk_overlap: int, separators: Optional[List[str]], add_start_index: bool = False):
+    from langchain_text_splitters import RecursiveCharacterTextSplitter
+
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+        separators=separators or ["\n\n", "\n", ".", " ", ""],
+        add_start_index=add_start_index
+    )
+
 def chunk_text(
     text: str,
     chunk_size: int = 500,
@@ -16,14 +28,67 @@ def chunk_text(
         logger.warning("Empty or invalid text provided")
         return []
 
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap,
-        separators=separators or ["\n\n", "\n", ".", " ", ""]
-    )
+    splitter = _splitter(chunk_size, chunk_overlap, separators)
     
     try:
         return splitter.split_text(text)
     except Exception as e:
         logger.error(f"Chunking failed: {str(e)}")
-        return []
\ No newline at end of file
+        return []
+
+def page_offsets(pages: List[Dict]) -> List[Dict]:
+    """
+    Annotate page records with their character span in the joined document text
+    (pages joined by PAGE_SEPARATOR). Returns the same records.
+    """
+    offset = 0
+    for page in pages:
+        page["char_start"] = offset
+        page["char_end"] = offset + len(page["text"])
+        offset = page["char_end"] + len(PAGE_SEPARATOR)
+    return pages
+
+def chunk_pages(
+    pages: List[Dict],
+    chunk_size: int = 500,
+    chunk_overlap: int = 100,
+    separators: Optional[List[str]] = None
+) -> List[Dict]:
+    """
+    Page-aware chunking. Takes page records ({"page_number", "text"}) and returns
+    chunks carrying their true page span:
+    {"text", "page_start", "page_end", "char_start", "char_end"}
+    """
+    pages = [p for p in pages if p.get("text")]
+    if not pages:
+        logger.warning("Empty or invalid text provided")
+        return []
+
+    page_offsets(pages)
+    text = PAGE_SEPARATOR.join(p["text"] for p in pages)
+    starts = [p["char_start"] for p in pages]
+
+    def page_at(offset: int) -> int:
+        return pages[max(0, bisect_right(starts, offset) - 1)]["page_number"]
+
+    splitter = _splitter(chunk_size, chunk_overlap, separators, add_start_index=True)
+    try:
+        docs = splitter.create_documents([text])
+    except Exception as e:
+        logger.error(f"Chunking failed: {str(e)}")
+        return []
+
+    chunks = []
+    for doc in docs:
+        char_start = doc.metadata.get("start_index", -1)
+        if char_start < 0:  # Splitter could not locate the chunk; reuse the previous position
+            char_start = chunks[-1]["char_start"] if chunks else 0
+        char_end = char_start + len(doc.page_content)
+        chunks.append({
+            "text": doc.page_content,
+            "page_start": page_at(char_start),
+            "page_end": page_at(max(char_start, char_end - 1)),
+            "char_start": char_start,
+            "char_end": char_end
+        })
+    return chunks
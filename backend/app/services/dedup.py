@@ -0,0 +1,156 @@
+from typing import Dict, List, Optional
+import hashlib
+import os
+import threading
+import logging
+
+import numpy as np
+
+from .lexical_index import tokenize
+
+logger = logging.getLogger(__name__)
+
+# Near-duplicate chunks (headers, footers, disclaimers, repeated clauses):
+# "off", "query" (fold copies together in search results) or "index" (also skip
+# copies within a document at ingest, so they are never embedded or stored)
+DEDUP_MODE = os.getenv("DEDUP_MODE", "query").strip().lower()
+DEDUP_MODES = ("off", "query", "index")
+# Estimated Jaccard similarity of word-pair shingles above which two chunks are near-duplicates
+DEDUP_THRESHOLD = float(os.getenv("DEDUP_THRESHOLD", "0.75"))
+# Candidates first fetched per requested result when collapsing (doubled until k distinct remain)
+DEDUP_OVERFETCH = int(os.getenv("DEDUP_OVERFETCH", "2"))
+
+# Words per shingle
+SHINGLE_SIZE = 2
+# MinHash permutations, split into LSH bands of BAND_ROWS rows: texts sharing any
+# band become candidates (~99.5% likely at Jaccard 0.75), then the full signatures
+# are compared against DEDUP_THRESHOLD
+NUM_PERM = 64
+BAND_ROWS = 4
+
+# Random odd multipliers and offsets: hash_i(x) = a_i * x + b_i mod 2**64
+_rng = np.random.default_rng(0x5EED)
+_A = _rng.integers(1, 2 ** 63, NUM_PERM, dtype=np.uint64) * np.uint64(2) + np.uint64(1)
+_B = _rng.integers(0, 2 ** 63, NUM_PERM, dtype=np.uint64)
+
+_lock = threading.Lock()
+_stats = {
+    "chunks_seen": 0,
+    "chunks_dropped": 0,
+    "index_bytes_saved": 0,
+    "queries": 0,
+    "results_collapsed": 0,
+}
+
+
+def minhash(text: str) -> Optional[np.ndarray]:
+    """MinHash signature of a text's shingles of BM25 tokens; None for text without tokens."""
+    tokens = tokenize(text)
+    if not tokens:
+        return None
+    size = min(SHINGLE_SIZE, len(tokens))
+    shingles = {" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little") for s in shingles),
+        dtype=np.uint64,
+        count=len(shingles),
+    )
+    # uint64 arithmetic wraps, which is the mod 2**64 the permutations need
+    return (hashes[:, None] * _A + _B).min(axis=0)
+
+def similarity(a: np.ndarray, b: np.ndarray) -> float:
+    """Estimated Jaccard similarity of the texts behind two signatures."""
+    return float(np.count_nonzero(a == b)) / NUM_PERM
+
+
+class NearDuplicateIndex:
+    """LSH over MinHash bands, so each lookup only compares signatures sharing a band."""
+
+    def __init__(self, threshold: float = DEDUP_THRESHOLD):
+        self.threshold = threshold
+        self._buckets: List[Dict[bytes, List[int]]] = [{} for _ in range(NUM_PERM // BAND_ROWS)]
+        self._signatures: List[np.ndarray] = []
+
+    def _keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[i * BAND_ROWS:(i + 1) * BAND_ROWS].tobytes() for i in range(len(self._buckets))]
+
+    def find(self, signature: np.ndarray) -> Optional[int]:
+        """Position of the earliest added signature at or above the threshold, or None."""
+        candidates = set()
+        for bucket, key in zip(self._buckets, self._keys(signature)):
+            candidates.update(bucket.get(key, ()))
+        for position in sorted(candidates):
+            if similarity(signature, self._signatures[position]) >= self.threshold:
+                return position
+        return None
+
+    def add(self, signature: np.ndarray) -> int:
+        position = len(self._signatures)
+        self._signatures.append(signature)
+        for bucket, key in zip(self._buckets, self._keys(signature)):
+            bucket.setdefault(key, []).append(position)
+        return position
+
+
+def canonical_positions(texts: List[str]) -> List[int]:
+    """
+    For each text, the position of the first text it near-duplicates (its own
+    position if it is the first of its kind).
+    """
+    index = NearDuplicateIndex()
+    positions: List[int] = []  # index position -> text position
+    canonical = []
+    for position, text in enumerate(texts):
+        signature = minhash(text)
+        match = index.find(signature) if signature is not None else None
+        if match is not None:
+            canonical.append(positions[match])
+            continue
+        if signature is not None:
+            index.add(signature)
+            positions.append(position)
+        canonical.append(position)
+    return canonical
+
+def record_ingest(seen: int, dropped: int, vector_bytes: int):
+    with _lock:
+        _stats["chunks_seen"] += seen
+        _stats["chunks_dropped"] += dropped
+        _stats["index_bytes_saved"] += dropped * vector_bytes
+
+def collapse(results: List[Dict], k: int) -> List[Dict]:
+    """
+    Fold near-duplicate results into the best-ranked copy, listing the metadata of
+    the others under "duplicates", and return the first k distinct results.
+    """
+    index = NearDuplicateIndex()
+    positions: List[int] = []  # index position -> position in `kept`
+    kept: List[Dict] = []
+    for result in results:
+        result = {key: value for key, value in result.items() if key != "duplicates"}
+        signature = minhash(result["content"])
+        match = index.find(signature) if signature is not None else None
+        if match is not None:
+            kept[positions[match]].setdefault("duplicates", []).append(result["metadata"])
+            continue
+        if signature is not None:
+            index.add(signature)
+            positions.append(len(kept))
+        kept.append(result)
+    return kept[:k]
+
+def record_query(collapsed: int):
+    """Count a collapsed query and the duplicates folded into its results."""
+    with _lock:
+        _stats["queries"] += 1
+        _stats["results_collapsed"] += collapsed
+
+def stats() -> Dict:
+    with _lock:
+        seen = _stats["chunks_seen"]
+        return {
+            "mode": DEDUP_MODE,
+            "threshold": DEDUP_THRESHOLD,
+            **_stats,
+            "drop_rate": round(_stats["chunks_dropped"] / seen, 4) if seen else 0.0,
+        }
@@ -1,19 +1,47 @@
 from ..config import  TESSERACT_PATH
-from langchain_huggingface import HuggingFaceEmbeddings
-from functools import lru_cache
+from .embedding_cache import CachedEmbeddings
 import os
+import threading
 import logging
-import torch
-torch.cuda.is_available()
 
 
 logger = logging.getLogger(__name__)
 
-@lru_cache(maxsize=1)
+# torch (HuggingFaceEmbeddings) | onnx (onnxruntime, see onnx_embedder)
+EMBEDDING_BACKEND = os.getenv("EMBEDDING_BACKEND", "torch").strip().lower()
+
+_embedder = None
+_embedder_lock = threading.Lock()
+
 def get_embedder():
-    """Load HuggingFace embedder with safe fallback to CPU and better logging."""
+    """
+    Return the process-wide embedder, with document embeddings served from the persistent cache.
+    Created under a lock: warm-up and the first query or ingest job may ask for it at the same time.
+    """
+    global _embedder
+    if _embedder is None:
+        with _embedder_lock:
+            if _embedder is None:
+                _embedder = _create_embedder()
+    return _embedder
+
+def _create_embedder():
     model_name = os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L12-v2")
-    device = os.getenv("EMBEDDING_DEVICE", "cuda").strip()
+    if EMBEDDING_BACKEND == "onnx":
+        from .onnx_embedder import OnnxEmbeddings
+        model = OnnxEmbeddings(model_name)
+        # int8 vectors differ slightly from fp32 ones; keep their cache entries apart
+        cache_name = f"{model_name}@onnx-{'int8' if model.quantized else 'fp32'}"
+        return CachedEmbeddings(model, cache_name)
+    return CachedEmbeddings(_load_model(model_name), model_name)
+
+def _load_model(model_name: str):
+    """Load HuggingFace embedder with safe fallback to CPU and better logging."""
+    # Imported here: torch and sentence-transformers take seconds to import
+    import torch
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    device = os.getenv("EMBEDDING_DEVICE", "").strip() or ("cuda" if torch.cuda.is_available() else "cpu")
 
     logger.info(f"🔍 Loading embedding model: {model_name} on device: {device}")
 
@@ -0,0 +1,38 @@
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache, partial
+import asyncio
+import contextvars
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Threads for CPU-bound retrieval work (query embedding, FAISS search). Torch and
+# FAISS release the GIL, so these scale across cores without blocking the event loop.
+SEARCH_WORKERS = int(os.getenv("SEARCH_WORKERS", "0")) or (os.cpu_count() or 1)
+# BM25 lookups run here, concurrently with the vector search of the same query. A
+# separate pool, because the caller is itself a search-executor thread.
+LEXICAL_WORKERS = int(os.getenv("LEXICAL_WORKERS", "0")) or SEARCH_WORKERS
+# Per-document shard searches of one scoped query fan out here (see shard_store)
+SHARD_WORKERS = int(os.getenv("SHARD_WORKERS", "0")) or SEARCH_WORKERS
+
+
+@lru_cache(maxsize=1)
+def get_search_executor() -> ThreadPoolExecutor:
+    logger.info(f"🧵 Starting search executor with {SEARCH_WORKERS} threads")
+    return ThreadPoolExecutor(max_workers=SEARCH_WORKERS, thread_name_prefix="search")
+
+@lru_cache(maxsize=1)
+def get_lexical_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=LEXICAL_WORKERS, thread_name_prefix="lexical")
+
+@lru_cache(maxsize=1)
+def get_shard_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=SHARD_WORKERS, thread_name_prefix="shard")
+
+async def run_in_search_executor(fn, *args, **kwargs):
+    """Run a blocking retrieval call on the dedicated executor and await its result."""
+    loop = asyncio.get_running_loop()
+    # Carry the caller's context (per-request stage timings) into the worker thread
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(get_search_executor(), partial(context.run, fn, *args, **kwargs))
@@ -1,84 +1,1198 @@
-from typing import List, Optional, Dict
+from typing import List, Optional, Dict, Tuple
+import atexit
+import json
 import os
-import pickle
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
 from pathlib import Path
 import logging
 
-from langchain_community.vectorstores import FAISS   # LangChain’s FAISS wrapper
-from langchain.docstore.document import Document
-from langchain.embeddings.base import Embeddings
+import numpy as np
+from filelock import FileLock, Timeout
+from langchain_core.embeddings import Embeddings
+
+from . import index_factory
+from .executors import get_lexical_executor
+from .lexical_index import LexicalIndex, reciprocal_rank_fusion
+from .query_batcher import QUERY_BATCHING, embed_query, get_query_batcher
+from .shard_store import FAISS_SHARDS, SHARD_MAX_FANOUT, ShardStore
+from . import dedup
+from .metrics import stage
+import contextvars
 
 logger = logging.getLogger(__name__)
 
-# Path to store the FAISS index
-VDB_PATH = Path(os.getenv("FAISS_PATH", "vector_store/faiss_index")).with_suffix(".pkl")
+# Base path for the vector store: <base>.vNNNNNNNN.faiss snapshots (the published one named in
+# <base>.current) hold the vectors, <base>.sqlite the chunk text/metadata
+VDB_BASE = Path(os.getenv("FAISS_PATH", "vector_store/faiss_index"))
+INDEX_PATH = VDB_BASE.with_suffix(".faiss")
+META_PATH = VDB_BASE.with_suffix(".sqlite")
+# Pickled LangChain store written by older versions; migrated once on first load
+LEGACY_PKL_PATH = VDB_BASE.with_suffix(".pkl")
+# Seconds to wait after the last write before persisting; 0 persists synchronously
+PERSIST_DELAY = float(os.getenv("FAISS_PERSIST_DELAY", "2.0"))
+# Open the index file with mmap so cold start does not copy the vectors into RAM
+USE_MMAP = os.getenv("FAISS_MMAP", "1") == "1"
+# One process at a time holds <base>.writer.lock, ingests and publishes snapshots; the others only
+# read. auto: take the lock when free (or when the writer exits) | reader: never write
+INDEX_ROLE = os.getenv("INDEX_ROLE", "auto").strip().lower()
+# Seconds between checks for a newly published snapshot, or deletes made by another worker
+SNAPSHOT_POLL = float(os.getenv("FAISS_SNAPSHOT_POLL", "1.0"))
+# Published snapshots kept on disk (readers may still be serving a superseded one)
+SNAPSHOT_KEEP = int(os.getenv("FAISS_SNAPSHOT_KEEP", "3"))
+# Filtered searches over at most this many vectors scan only the subset instead of the index
+SUBSET_SCAN_MAX = int(os.getenv("FAISS_SUBSET_SCAN_MAX", "50000"))
+# Seconds after a delete before deleted vectors are physically removed from the index
+COMPACT_DELAY = float(os.getenv("FAISS_COMPACT_DELAY", "10"))
+# Default retrieval: hybrid (BM25 + vectors, fused by reciprocal rank) | dense | lexical
+RETRIEVAL_MODE = os.getenv("RETRIEVAL_MODE", "hybrid").strip().lower()
+RETRIEVAL_MODES = ("hybrid", "dense", "lexical")
+# Candidates each retriever contributes to fusion, as a multiple of k
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "5"))
+
+
+def _save_index(index: "faiss.Index", path: Path = INDEX_PATH):
+    """Save FAISS index to disk atomically (write to a temp file, then rename)."""
+    import faiss  # Deferred like in index_factory: keeps app import fast
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    faiss.write_index(index, str(tmp_path))
+    os.replace(tmp_path, path)
+    logger.info(f"💾  FAISS index saved → {path}")
+
+def _load_index(path: Path = INDEX_PATH, mmap: bool = USE_MMAP) -> Tuple[Optional["faiss.Index"], bool]:
+    """
+    Load FAISS index from disk, if available.
+    Returns the index and whether it is backed by a read-only memory map.
+    """
+    import faiss
+
+    if not path.exists():
+        return None, False
+    if mmap:
+        flags = getattr(faiss, "IO_FLAG_MMAP_IFC", faiss.IO_FLAG_MMAP) | faiss.IO_FLAG_READ_ONLY
+        try:
+            # Snapshots written before IVF indexes kept a direct map get one on load
+            return index_factory.enable_reconstruct(faiss.read_index(str(path), flags)), True
+        except RuntimeError as e:
+            logger.info(f"ℹ️  mmap load not supported for this index, reading into memory: {e}")
+    return index_factory.enable_reconstruct(faiss.read_index(str(path))), False
+
+
+def _snapshot_path(index_path: Path, version: int) -> Path:
+    return index_path.with_name(f"{index_path.stem}.v{version:08d}{index_path.suffix}")
+
+def _read_current(index_path: Path = INDEX_PATH) -> Tuple[int, Path]:
+    """
+    The published snapshot as (version, file). Stores written before snapshots
+    existed have no pointer; their unversioned index file is version 0.
+    """
+    try:
+        current = json.loads(index_path.with_suffix(".current").read_text())
+    except FileNotFoundError:
+        return 0, index_path
+    return current["version"], index_path.with_name(current["file"])
+
+def _publish_snapshot(index: "faiss.Index", index_path: Path, version: int) -> Path:
+    """
+    Write the index as snapshot `version`, then atomically repoint <base>.current at it.
+    Readers only ever see complete files; superseded snapshots beyond SNAPSHOT_KEEP are removed.
+    """
+    path = _snapshot_path(index_path, version)
+    _save_index(index, path)
+    pointer = index_path.with_suffix(".current")
+    tmp_pointer = pointer.with_suffix(".current.tmp")
+    tmp_pointer.write_text(json.dumps({"version": version, "file": path.name, "vectors": index.ntotal, "published_at": time.time()}))
+    os.replace(tmp_pointer, pointer)
+
+    stale = [index_path] if index_path.exists() else []  # Unversioned file of older deployments
+    for old in index_path.parent.glob(f"{index_path.stem}.v*{index_path.suffix}"):
+        try:
+            if int(old.name[len(index_path.stem) + 2:-len(index_path.suffix)]) <= version - SNAPSHOT_KEEP:
+                stale.append(old)
+        except ValueError:
+            continue
+    for old in stale:
+        try:
+            # Safe for readers that still map it: POSIX keeps unlinked files alive while open
+            old.unlink()
+        except OSError as e:
+            logger.debug(f"Could not remove old snapshot {old}: {e}")
+    return path
+
+
+class MetadataStore:
+    """
+    SQLite sidecar holding chunk text and metadata keyed by FAISS vector id.
+    Rows are only read for the hits a query actually returns.
+    """
+
+    def __init__(self, path: Path = META_PATH):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS chunks (
+                id INTEGER PRIMARY KEY,
+                filename TEXT NOT NULL,
+                chunk_num INTEGER,
+                page_number INTEGER,
+                content TEXT NOT NULL,
+                metadata TEXT NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_chunks_filename ON chunks(filename)")
+        # Extracted page text, kept so documents can be re-chunked without re-running OCR
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS pages (
+                filename TEXT NOT NULL,
+                page_number INTEGER NOT NULL,
+                method TEXT,
+                char_start INTEGER,
+                char_end INTEGER,
+                text TEXT NOT NULL,
+                PRIMARY KEY (filename, page_number)
+            )
+            """
+        )
+        # One row per indexed document, keyed by content hash for upload dedup
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS documents (
+                filename TEXT PRIMARY KEY,
+                sha256 TEXT NOT NULL,
+                size INTEGER,
+                chunk_count INTEGER,
+                indexed_at REAL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_documents_sha256 ON documents(sha256)")
+        # Vector ids of deleted chunks still present in the FAISS index until compaction
+        self._conn.execute("CREATE TABLE IF NOT EXISTS tombstones (id INTEGER PRIMARY KEY)")
+        # High-water mark of allocated vector ids. Ids are never reused: a deleted chunk's id may
+        # still be tombstoned in the index or have postings in the BM25 segments
+        self._conn.execute("CREATE TABLE IF NOT EXISTS id_sequence (next_id INTEGER NOT NULL)")
+        self._conn.execute(
+            """
+            INSERT INTO id_sequence (next_id)
+            SELECT MAX(COALESCE((SELECT MAX(id) FROM chunks), -1), COALESCE((SELECT MAX(id) FROM tombstones), -1)) + 1
+            WHERE NOT EXISTS (SELECT 1 FROM id_sequence)
+            """
+        )
+        self._conn.commit()
+
+    def next_id(self) -> int:
+        """First unallocated vector id; never lower than an id handed out before, even if deleted."""
+        with self._lock:
+            return self._conn.execute("SELECT next_id FROM id_sequence").fetchone()[0]
+
+    def add(self, ids: List[int], chunks: List[str], metadatas: List[dict]):
+        rows = [
+            (i, m.get("filename", ""), m.get("chunk_num"), m.get("page_number"), c, json.dumps(m))
+            for i, c, m in zip(ids, chunks, metadatas)
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT INTO chunks (id, filename, chunk_num, page_number, content, metadata) VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            if ids:
+                self._conn.execute("UPDATE id_sequence SET next_id = MAX(next_id, ?)", (max(ids) + 1,))
+            self._conn.commit()
+
+    def get(self, ids: List[int]) -> Dict[int, dict]:
+        """Fetch content and metadata for the given vector ids."""
+        if not ids:
+            return {}
+        placeholders = ",".join("?" * len(ids))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id, content, metadata FROM chunks WHERE id IN ({placeholders})",
+                [int(i) for i in ids],
+            ).fetchall()
+        return {row[0]: {"content": row[1], "metadata": json.loads(row[2])} for row in rows}
+
+    def ids_for_filenames(self, filenames: List[str]) -> np.ndarray:
+        """Vector ids of every chunk belonging to the given documents."""
+        if not filenames:
+            return np.zeros(0, dtype="int64")
+        placeholders = ",".join("?" * len(filenames))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT id FROM chunks WHERE filename IN ({placeholders})",
+                list(filenames),
+            ).fetchall()
+        return np.fromiter((row[0] for row in rows), dtype="int64", count=len(rows))
+
+    def put_pages(self, filename: str, pages: List[dict]):
+        """Replace the stored page records of a document."""
+        rows = [
+            (filename, p["page_number"], p.get("method"), p.get("char_start"), p.get("char_end"), p.get("text", ""))
+            for p in pages
+        ]
+        with self._lock:
+            self._conn.execute("DELETE FROM pages WHERE filename = ?", (filename,))
+            self._conn.executemany(
+                "INSERT INTO pages (filename, page_number, method, char_start, char_end, text) VALUES (?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+
+    def get_pages(self, filename: str, page_numbers: Optional[List[int]] = None) -> List[dict]:
+        """Stored page records of a document, optionally limited to some pages."""
+        query = "SELECT page_number, method, char_start, char_end, text FROM pages WHERE filename = ?"
+        params: list = [filename]
+        if page_numbers:
+            query += f" AND page_number IN ({','.join('?' * len(page_numbers))})"
+            params += [int(n) for n in page_numbers]
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY page_number", params).fetchall()
+        return [
+            {"page_number": r[0], "method": r[1], "char_start": r[2], "char_end": r[3], "text": r[4]}
+            for r in rows
+        ]
+
+    def put_document(self, filename: str, sha256: str, size: int, chunk_count: int):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO documents (filename, sha256, size, chunk_count, indexed_at) VALUES (?, ?, ?, ?, ?)",
+                (filename, sha256, size, chunk_count, time.time()),
+            )
+            self._conn.commit()
+
+    def find_document_by_hash(self, sha256: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT filename FROM documents WHERE sha256 = ? LIMIT 1", (sha256,)).fetchone()
+        return row[0] if row else None
+
+    def delete_document(self, filename: str) -> List[int]:
+        """
+        Remove a document's chunks, pages and hash record in one transaction and
+        tombstone its vector ids. Returns the ids whose vectors must leave the index.
+        """
+        with self._lock:
+            ids = [r[0] for r in self._conn.execute("SELECT id FROM chunks WHERE filename = ?", (filename,))]
+            self._conn.executemany("INSERT OR IGNORE INTO tombstones (id) VALUES (?)", [(i,) for i in ids])
+            self._conn.execute("DELETE FROM chunks WHERE filename = ?", (filename,))
+            self._conn.execute("DELETE FROM pages WHERE filename = ?", (filename,))
+            self._conn.execute("DELETE FROM documents WHERE filename = ?", (filename,))
+            self._conn.commit()
+        return ids
+
+    def tombstones(self) -> List[int]:
+        with self._lock:
+            return [r[0] for r in self._conn.execute("SELECT id FROM tombstones")]
+
+    def clear_tombstones(self, ids: List[int]):
+        with self._lock:
+            self._conn.executemany("DELETE FROM tombstones WHERE id = ?", [(int(i),) for i in ids])
+            self._conn.commit()
+
+    def chunks_after(self, after_id: int, limit: int = 10000) -> List[Tuple[int, str]]:
+        """(id, content) of chunks with ids above `after_id`, in id order."""
+        with self._lock:
+            return self._conn.execute(
+                "SELECT id, content FROM chunks WHERE id > ? ORDER BY id LIMIT ?", (after_id, limit)
+            ).fetchall()
+
+    def has_document(self, filename: str) -> bool:
+        with self._lock:
+            return self._conn.execute("SELECT 1 FROM chunks WHERE filename = ? LIMIT 1", (filename,)).fetchone() is not None
+
+    def count(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM chunks").fetchone()[0]
+
+    def chunk_filenames(self) -> List[Tuple[int, str]]:
+        """(id, filename) of every chunk."""
+        with self._lock:
+            return self._conn.execute("SELECT id, filename FROM chunks").fetchall()
+
+    def data_version(self) -> int:
+        """Changes whenever another connection (e.g. another worker) has committed to the database."""
+        with self._lock:
+            return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def migrate_pickle(pkl_path: Path = LEGACY_PKL_PATH, index_path: Path = INDEX_PATH, meta_path: Path = META_PATH) -> int:
+    """
+    One-shot migration of a pickled LangChain FAISS store to the native index file
+    plus SQLite sidecar. The pickle is renamed to *.pkl.migrated afterwards.
+    Returns the number of migrated chunks.
+    """
+    import pickle  # Only needed for legacy files
+    import faiss
+
+    with open(pkl_path, "rb") as f:
+        vstore = pickle.load(f)
+
+    legacy_index = vstore.index
+    ntotal = legacy_index.ntotal
+    vectors = legacy_index.reconstruct_n(0, ntotal) if ntotal else np.zeros((0, legacy_index.d), dtype="float32")
+
+    chunks, metadatas = [], []
+    for i in range(ntotal):
+        doc = vstore.docstore.search(vstore.index_to_docstore_id[i])
+        chunks.append(doc.page_content)
+        metadatas.append(dict(doc.metadata))
+
+    meta = MetadataStore(meta_path)
+    start = meta.next_id()
+    ids = list(range(start, start + ntotal))
+    index = faiss.IndexIDMap2(faiss.IndexFlatL2(legacy_index.d))
+    if ntotal:
+        index.add_with_ids(vectors, np.asarray(ids, dtype="int64"))
+    meta.add(ids, chunks, metadatas)
+    meta.close()
+    _save_index(index, index_path)
+
+    os.replace(pkl_path, pkl_path.with_suffix(pkl_path.suffix + ".migrated"))
+    logger.info(f"📦  Migrated {ntotal} chunks from {pkl_path} → {index_path} + {meta_path}")
+    return ntotal
+
+
+class IndexManager:
+    """
+    Process-wide owner of the FAISS index.
+    Loads the index once, serves queries from memory and persists writes on a
+    debounced schedule.
+
+    Across processes there is a single writer: the holder of the writer file
+    lock. It publishes each persist as a new versioned snapshot. Other workers
+    are readers; they poll for new snapshots, load them in the background and
+    swap them in, so queries in flight keep using the snapshot they started on.
+
+    Searches run concurrently; writes that mutate the index in place wait for
+    in-flight searches to finish and hold off new ones (writer preference).
+    """
+
+    def __init__(
+        self,
+        index_path: Path = INDEX_PATH,
+        meta_path: Path = META_PATH,
+        persist_delay: float = PERSIST_DELAY,
+        lexical_path: Optional[Path] = None,
+    ):
+        self.path = index_path
+        self.meta_path = meta_path
+        # BM25 index over the same chunk ids, persisted alongside the FAISS file
+        self.lexical = LexicalIndex(lexical_path or index_path.with_suffix(".bm25"))
+        # Optional per-document indexes for queries scoped to a few documents
+        self.shards = ShardStore(index_path.with_suffix(".shards")) if FAISS_SHARDS else None
+        self._building_shards = False
+        self.persist_delay = persist_delay
+        self._lock = threading.RLock()
+        self._readers = 0
+        self._readers_done = threading.Condition(self._lock)
+        # Writers waiting for in-flight searches to drain; new searches queue behind them
+        self._writers_waiting = 0
+        self._writers_done = threading.Condition(self._lock)
+        # A flush serializing the index; writes wait for it like for any reader
+        self._persisting = False
+        self._persisted = threading.Condition(self._lock)
+        self._index: Optional["faiss.Index"] = None
+        self._mmapped = False
+        self._meta: Optional[MetadataStore] = None
+        self._loaded = False
+        self._dirty = False
+        # Published snapshot the in-memory index was loaded from (or last published as) and its file
+        self._snapshot = 0
+        self._index_file = index_path
+        self._writer_lock = FileLock(str(index_path.with_suffix(".writer.lock")), thread_local=False)
+        self.writer = False
+        self._next_poll = 0.0
+        self._data_version: Optional[int] = None
+        self._swapping = False
+        self._timer: Optional[threading.Timer] = None
+        self._retraining = False
+        # Bumped whenever search results may change; used to invalidate cached answers
+        self._version = 0
+        # Deleted vector ids still physically present in the index, excluded from every search
+        self._tombstones: set = set()
+        self._tombstone_batch = None
+        self._tombstone_sel = None
+        self._compact_timer: Optional[threading.Timer] = None
+        # (index, ntotal, sorted ids) of the last index checked by _has_ids
+        self._id_map_cache: Optional[Tuple] = None
+
+    @contextmanager
+    def _read(self):
+        """Register as a reader; the index may be searched without holding the lock."""
+        with self._lock:
+            while self._writers_waiting and not self._persisting:
+                self._writers_done.wait()
+            self._maybe_reload()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._readers_done.notify_all()
+
+    @contextmanager
+    def _write(self):
+        """
+        Exclusive access for in-place mutation of the index. Waits for in-flight
+        searches; searches arriving meanwhile wait for the writer (writer preference).
+        """
+        with self._lock:
+            if self._readers:
+                self._writers_waiting += 1
+                try:
+                    while self._readers:
+                        self._readers_done.wait()
+                finally:
+                    self._writers_waiting -= 1
+                    if not self._writers_waiting:
+                        self._writers_done.notify_all()
+            yield
 
-def _save_index(vstore: FAISS):
-    """Save FAISS index to disk."""
-    VDB_PATH.parent.mkdir(parents=True, exist_ok=True)
-    with open(VDB_PATH, "wb") as f:
-        pickle.dump(vstore, f)
-    logger.info(f"💾  FAISS index saved → {VDB_PATH}")
+    @property
+    def meta(self) -> MetadataStore:
+        if self._meta is None:
+            self._meta = MetadataStore(self.meta_path)
+        return self._meta
+
+    def acquire_writer(self, blocking: bool = False) -> bool:
+        """
+        Become the index writer by taking the cross-process writer lock. With
+        `blocking`, wait until the current writer exits. Returns whether this
+        process is now the writer.
+        """
+        if self.writer:
+            return True
+        if INDEX_ROLE == "reader":
+            return False
+        try:
+            self._writer_lock.acquire(timeout=-1 if blocking else 0, poll_interval=SNAPSHOT_POLL)
+        except Timeout:
+            return False
+        with self._lock:
+            self.writer = True
+            self._loaded = False  # Continue from the latest published snapshot
+        logger.info(f"✍️  This process is now the FAISS index writer (pid {os.getpid()})")
+        return True
+
+    def release_writer(self):
+        """Persist pending writes and hand the writer lock to the next process."""
+        if not self.writer:
+            return
+        self.flush()
+        with self._lock:
+            self.writer = False
+        self._writer_lock.release()
+
+    def _require_writer(self):
+        if not self.acquire_writer():
+            raise RuntimeError("The FAISS index is read-only in this process; another worker holds the writer lock")
+
+    def reload(self, mmap: bool = USE_MMAP):
+        """Reload the latest published snapshot, discarding the in-memory copy."""
+        with self._lock:
+            version, path = _read_current(self.path)
+            if version == 0 and not path.exists() and LEGACY_PKL_PATH.exists() and self.acquire_writer():
+                migrate_pickle(LEGACY_PKL_PATH, self.path, self.meta_path)
+            self._index, self._mmapped = _load_index(path, mmap=mmap)
+            self._snapshot, self._index_file = version, path
+            self._data_version = self.meta.data_version()
+            self._loaded = True
+            self._dirty = False
+            self._version += 1
+            self._set_tombstones(set(self.meta.tombstones()))
+            if self._tombstones and self.writer:
+                self._schedule_compaction()
+            if (
+                self.writer and self.shards is not None and not self.shards.exists()
+                and self._index is not None and not self._building_shards
+            ):
+                # Sharding was just enabled on an existing store
+                self._building_shards = True
+                threading.Thread(target=self.build_shards, name="faiss-shards", daemon=True).start()
+            self._reload_lexical()
+            if self._index is not None:
+                logger.info(f"📂  FAISS index loaded ← {path} ({self._index.ntotal} vectors, mmap={self._mmapped})")
+
+    def _reload_lexical(self):
+        """Load the BM25 index and index any chunks it missed (first run, or a crash before its flush)."""
+        self.lexical.reload()
+        self.lexical.delete(self._tombstones)
+        caught_up = 0
+        while True:
+            rows = self.meta.chunks_after(self.lexical.max_id)
+            if not rows:
+                break
+            self.lexical.add([r[0] for r in rows], [r[1] for r in rows])
+            caught_up += len(rows)
+        if caught_up:
+            logger.info(f"🔤  Indexed {caught_up} chunks missing from the lexical index")
+            if self.writer:
+                self.lexical.flush()
+
+    def _maybe_reload(self):
+        """
+        Reload hook: load on first use, then (at most every SNAPSHOT_POLL seconds)
+        apply deletes made by other workers and, in readers, start swapping in a
+        newly published snapshot.
+        """
+        if not self._loaded:
+            self.reload()
+            return
+        now = time.monotonic()
+        if now < self._next_poll:
+            return
+        self._next_poll = now + SNAPSHOT_POLL
+        if not self.writer and not self._swapping:
+            version, path = _read_current(self.path)
+            if version != self._snapshot:
+                self._swapping = True
+                threading.Thread(target=self._swap_in, args=(version, path), name="faiss-swap", daemon=True).start()
+        self._sync_tombstones()
+
+    def _swap_in(self, version: int, path: Path):
+        """Load a published snapshot without holding the lock, then make it the one new searches use."""
+        try:
+            index, mmapped = _load_index(path, mmap=USE_MMAP)
+            with self._lock:
+                if self.writer:
+                    return  # Promoted meanwhile; the writer reloads on its own
+                self._index, self._mmapped = index, mmapped
+                self._snapshot, self._index_file = version, path
+                self._version += 1
+                # Exact set: ids compacted out of this snapshot are no longer tombstoned
+                self._data_version = self.meta.data_version()
+                self._set_tombstones(set(self.meta.tombstones()))
+            # Outside the manager lock: dense searches continue while BM25 segments load
+            self._reload_lexical()
+            logger.info(f"🔁  Swapped in FAISS snapshot v{version} ({index.ntotal} vectors)")
+        except FileNotFoundError:
+            pass  # Superseded and pruned before we got to it; the next poll picks up the newer one
+        except Exception as e:
+            logger.error(f"❌  Loading FAISS snapshot v{version} failed: {e}")
+        finally:
+            self._swapping = False
+
+    def _sync_tombstones(self):
+        """Exclude vectors deleted by other workers from searches right away, before the next snapshot."""
+        data_version = self.meta.data_version()
+        if data_version == self._data_version:
+            return
+        self._data_version = data_version
+        added = set(self.meta.tombstones()) - self._tombstones
+        if added:
+            self._set_tombstones(self._tombstones | added)
+            self.lexical.delete(added)
+            self._version += 1
+            if self.writer:
+                self._schedule_compaction()
+
+    def get(self) -> Optional["faiss.Index"]:
+        """Return the in-memory index, loading it on first use."""
+        with self._lock:
+            self._maybe_reload()
+            return self._index
+
+    def search(
+        self,
+        query_vectors: np.ndarray,
+        k: int = 4,
+        ids: Optional[np.ndarray] = None,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Search the in-memory index; writers are held off for the duration.
+        When `ids` is given only those vectors are candidates, so k results come
+        from the allowed subset rather than being filtered out afterwards.
+        `nprobe` / `ef_search` override the IVF / HNSW defaults for this query.
+        """
+        with self._read():
+            # Capture references: a concurrent reload or delete swaps these, never mutates them
+            index, tombstones, tombstone_sel = self._index, self._tombstones, self._tombstone_sel
+            if index is None or index.ntotal == 0:
+                raise RuntimeError("No FAISS index found. Upload documents first.")
+            if ids is not None:
+                if len(ids) == 0:
+                    empty = np.full((len(query_vectors), k), -1, dtype="int64")
+                    return np.full((len(query_vectors), k), np.inf, dtype="float32"), empty
+                # Ids committed by the writer but not yet in this worker's snapshot cannot be
+                # reconstructed; the selector search below simply skips them
+                present = self._has_ids(index, ids)
+                if present and len(ids) == index.ntotal - len(tombstones):
+                    ids = None  # Every live vector is allowed (e.g. all documents selected)
+                elif present and len(ids) <= SUBSET_SCAN_MAX:
+                    # Small subsets are scanned exactly whatever the index type: an ANN search with a
+                    # selector only sees the allowed ids its probed lists / visited nodes happen to hold
+                    return self._subset_scan(index, query_vectors, k, ids)
+            sel = tombstone_sel
+            if ids is not None:
+                import faiss
+                sel = faiss.IDSelectorBatch(ids)
+            params = index_factory.search_params(index, sel=sel, nprobe=nprobe, ef_search=ef_search)
+            return index.search(query_vectors, k, params=params)
+
+    def _has_ids(self, index: "faiss.Index", ids: np.ndarray) -> bool:
+        """Whether every id is in the index's id map (sorted copy cached per index and size)."""
+        import faiss
+        cached = self._id_map_cache
+        if cached is None or cached[0] is not index or cached[1] != index.ntotal:
+            cached = (index, index.ntotal, np.sort(faiss.vector_to_array(index.id_map)))
+            self._id_map_cache = cached
+        present = cached[2]
+        if len(present) == 0:
+            return False
+        pos = np.minimum(np.searchsorted(present, ids), len(present) - 1)
+        return bool(np.all(present[pos] == ids))
+
+    @staticmethod
+    def _subset_scan(index: "faiss.Index", query_vectors: np.ndarray, k: int, ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Exact L2 scan over just the allowed vectors; cost scales with the subset."""
+        vectors = index.reconstruct_batch(ids)
+        distances = (
+            (query_vectors ** 2).sum(axis=1)[:, None]
+            - 2 * query_vectors @ vectors.T
+            + (vectors ** 2).sum(axis=1)[None, :]
+        )
+        top = min(k, len(ids))
+        order = np.argsort(distances, axis=1)[:, :top]
+        out_d = np.full((len(query_vectors), k), np.inf, dtype="float32")
+        out_i = np.full((len(query_vectors), k), -1, dtype="int64")
+        out_d[:, :top] = np.take_along_axis(distances, order, axis=1)
+        out_i[:, :top] = ids[order]
+        return out_d, out_i
+
+    def add(self, vectors: np.ndarray, chunks: List[str], metadatas: List[dict]) -> List[int]:
+        """Append vectors and their metadata rows, then schedule a persist. Writer only."""
+        self._require_writer()
+        with stage("index_add"), self._write():
+            self._maybe_reload()
+            logger.info("🔄  Appending to FAISS index")
+            # The BM25 index remembers ids of chunks deleted before the id sequence existed
+            start = max(self.meta.next_id(), self.lexical.max_id + 1)
+            ids = list(range(start, start + len(chunks)))
+            self._append(ids, vectors, metadatas)
+            self.meta.add(ids, chunks, metadatas)
+            self.lexical.add(ids, chunks)
+            return ids
+
+    def _append(self, ids: List[int], vectors: np.ndarray, metadatas: List[dict]):
+        """Add vectors under their ids (creating the index if needed) and schedule a persist. Call under _write()."""
+        if self._index is None:
+            # Trainable types start flat and migrate once there is enough data
+            index_type = index_factory.INDEX_TYPE
+            if index_factory.needs_training(index_type):
+                index_type = "flat"
+            logger.info(f"🆕  Creating new FAISS index ({index_type})")
+            self._index = index_factory.build_index(index_type, vectors.shape[1])
+        elif self._mmapped:
+            # The mapped file is read-only; take an owned copy before the first write
+            self._index, self._mmapped = _load_index(self._index_file, mmap=False)
+        self._index.add_with_ids(vectors, np.asarray(ids, dtype="int64"))
+        if self.shards is not None:
+            self._write_shards(ids, vectors, metadatas)
+        self._dirty = True
+        self._version += 1
+        self._schedule_persist()
+        self._maybe_schedule_retrain()
+
+    def unindexed_chunks(self) -> List[Tuple[int, str]]:
+        """
+        (id, content) of chunks whose rows were committed but whose vectors never
+        reached a persisted snapshot, e.g. because the writer crashed before its
+        debounced persist. Ids only grow, so these are the rows above the index's highest id.
+        """
+        import faiss
+
+        with self._lock:
+            self._maybe_reload()
+            present = faiss.vector_to_array(self._index.id_map) if self._index is not None else []
+            after = int(present.max()) if len(present) else -1
+        missing = []
+        while True:
+            rows = self.meta.chunks_after(after)
+            if not rows:
+                return missing
+            missing.extend(rows)
+            after = rows[-1][0]
+
+    def restore(self, ids: List[int], vectors: np.ndarray) -> int:
+        """
+        Re-add the vectors of existing chunks that are missing from the index (see
+        unindexed_chunks). Chunks deleted meanwhile are skipped. Writer only.
+        """
+        self._require_writer()
+        with self._write():
+            self._maybe_reload()
+            rows = self.meta.get(ids)
+            keep = [row for row, i in enumerate(ids) if i in rows]
+            if keep:
+                kept_ids = [ids[row] for row in keep]
+                self._append(kept_ids, vectors[keep], [rows[i]["metadata"] for i in kept_ids])
+        logger.info(f"🩹  Restored {len(keep)} vectors missing from the FAISS index")
+        return len(keep)
+
+    def _write_shards(self, ids: List[int], vectors: np.ndarray, metadatas: List[dict]):
+        rows_by_file: Dict[str, List[int]] = {}
+        for row, metadata in enumerate(metadatas):
+            rows_by_file.setdefault(metadata.get("filename"), []).append(row)
+        ids = np.asarray(ids, dtype="int64")
+        for filename, rows in rows_by_file.items():
+            self.shards.write(filename, ids[rows], vectors[rows])
+
+    def build_shards(self) -> int:
+        """(Re)build every per-document shard from the global index. Returns the number of shards."""
+        self._building_shards = True
+        try:
+            self._require_writer()
+            with self._write():
+                self._maybe_reload()
+                if self._index is None or self.shards is None:
+                    return 0
+                ids, vectors = index_factory.export_vectors(self._index)
+            order = np.argsort(ids)
+            sorted_ids = ids[order]
+            chunk_ids_by_file: Dict[str, List[int]] = {}
+            for chunk_id, filename in self.meta.chunk_filenames():
+                chunk_ids_by_file.setdefault(filename, []).append(chunk_id)
+            groups = {}
+            for filename, chunk_ids in chunk_ids_by_file.items():
+                chunk_ids = np.asarray(chunk_ids, dtype="int64")
+                pos = np.minimum(np.searchsorted(sorted_ids, chunk_ids), max(len(sorted_ids) - 1, 0))
+                found = sorted_ids[pos] == chunk_ids if len(sorted_ids) else np.zeros(len(chunk_ids), dtype=bool)
+                groups[filename] = (chunk_ids[found], vectors[order[pos[found]]])
+            self.shards.build(groups)
+            logger.info(f"🧩  Built {len(groups)} per-document FAISS shards")
+            return len(groups)
+        finally:
+            self._building_shards = False
+
+    def _set_tombstones(self, tombstones: set):
+        self._tombstones = tombstones
+        if tombstones:
+            import faiss
+            # Keep the inner selector referenced: IDSelectorNot does not own it
+            self._tombstone_batch = faiss.IDSelectorBatch(np.fromiter(tombstones, dtype="int64", count=len(tombstones)))
+            self._tombstone_sel = faiss.IDSelectorNot(self._tombstone_batch)
+        else:
+            self._tombstone_batch = None
+            self._tombstone_sel = None
+
+    def delete_document(self, filename: str) -> int:
+        """
+        Delete a document. Its chunks disappear from search results immediately
+        (in other workers within SNAPSHOT_POLL); the writer physically removes the
+        vectors in a background compaction. Returns the number of deleted chunks.
+        """
+        with self._lock:
+            self._maybe_reload()
+            ids = self.meta.delete_document(filename)
+            if ids:
+                self._set_tombstones(self._tombstones | set(ids))
+                self.lexical.delete(ids)
+                if self.shards is not None:
+                    self.shards.remove(filename)
+                self._version += 1
+                if self.writer:
+                    self._schedule_compaction()
+        logger.info(f"🗑️  Deleted {len(ids)} chunks of {filename}")
+        return len(ids)
+
+    def _schedule_compaction(self):
+        if self._compact_timer:
+            self._compact_timer.cancel()
+        self._compact_timer = threading.Timer(COMPACT_DELAY, self.compact)
+        self._compact_timer.daemon = True
+        self._compact_timer.start()
+
+    def compact(self):
+        """Physically remove tombstoned vectors from the index and persist it."""
+        with self._write():
+            self._compact_timer = None
+            if not self.writer or not self._tombstones or self._index is None:
+                return
+            if self._retraining:
+                # The index being trained was exported before these deletes and keeps them
+                # tombstoned when it is swapped in; compact that one instead
+                self._schedule_compaction()
+                return
+            kind = index_factory.index_kind(self._index)
+            if kind == "hnsw":
+                rebuild = True  # HNSW graphs cannot remove vectors; rebuild without them
+            else:
+                rebuild = False
+                doomed = np.fromiter(self._tombstones, dtype="int64", count=len(self._tombstones))
+                if self._mmapped:
+                    self._index, self._mmapped = _load_index(self._index_file, mmap=False)
+                if kind == "flat":
+                    import faiss
+                    removed = self._index.remove_ids(faiss.IDSelectorBatch(doomed))
+                else:
+                    # IDMap2.remove_ids assumes the wrapped index renumbers what is left, which IVF
+                    # lists do not; re-add the survivors to the emptied (still trained) index instead
+                    ids, vectors = index_factory.export_vectors(self._index)
+                    keep = ~np.isin(ids, doomed)
+                    self._index.reset()
+                    self._index.add_with_ids(vectors[keep], ids[keep])
+                    removed = int((~keep).sum())
+                self._set_tombstones(self._tombstones - set(doomed.tolist()))
+                self._dirty = True
+                self.flush()
+                self.meta.clear_tombstones(doomed.tolist())
+                logger.info(f"🧹  Compacted FAISS index: removed {removed} deleted vectors")
+        if rebuild:
+            self.retrain(index_factory.index_kind(self._index))
+
+    def version(self) -> int:
+        """Index version stamp; changes on every ingest, delete, migration or reload."""
+        with self._lock:
+            self._maybe_reload()
+            return self._version
+
+    def info(self) -> Dict:
+        with self._lock:
+            self._maybe_reload()
+            return {
+                "index_type": index_factory.index_kind(self._index) if self._index is not None else None,
+                "configured_type": index_factory.INDEX_TYPE,
+                "vectors": self._index.ntotal if self._index is not None else 0,
+                "mmap": self._mmapped,
+                "role": "writer" if self.writer else "reader",
+                "snapshot": self._snapshot,
+                "retraining": self._retraining,
+                "pending_deletes": len(self._tombstones),
+                "lexical": self.lexical.stats(),
+                "shards": self.shards.stats() if self.shards is not None else None,
+            }
+
+    def _maybe_schedule_retrain(self):
+        """Migrate to the configured index type in the background once it can be trained."""
+        target = index_factory.INDEX_TYPE
+        if (
+            self._retraining
+            or index_factory.index_kind(self._index) == target
+            or not index_factory.can_build(target, self._index.ntotal)
+        ):
+            return
+        self._retraining = True
+        threading.Thread(target=self.retrain, args=(target,), name="faiss-retrain", daemon=True).start()
+
+    def retrain(self, index_type: Optional[str] = None):
+        """
+        Online re-train/migrate: build a new index of `index_type` from the current
+        vectors without blocking queries, then swap it in. Vectors added while the
+        new index was training are copied over before the swap.
+        """
+        index_type = index_type or index_factory.INDEX_TYPE
+        self._require_writer()
+        self._retraining = True
+        try:
+            with self._write():
+                self._maybe_reload()
+                if self._index is None:
+                    return
+                ids, vectors = index_factory.export_vectors(self._index)
+                dim = self._index.d
+                dropped = set(self._tombstones)
+                keep = ~np.isin(ids, list(dropped))
+                ids, vectors = ids[keep], vectors[keep]
+
+            new_index = index_factory.build_index(index_type, dim, vectors)
+            new_index.add_with_ids(vectors, ids)
+
+            with self._write():
+                current_ids, current_vectors = index_factory.export_vectors(self._index)
+                # Not by id order: restored vectors can sit below ids added before them
+                newer = ~np.isin(current_ids, ids) & ~np.isin(current_ids, list(self._tombstones))
+                if newer.any():
+                    new_index.add_with_ids(current_vectors[newer], current_ids[newer])
+                # Ids deleted while training still sit in the new index; keep them tombstoned
+                remaining = self._tombstones - dropped
+                self._index, self._mmapped = new_index, False
+                self._set_tombstones(remaining)
+                self._dirty = True
+                self._version += 1
+                self.flush()
+                self.meta.clear_tombstones(list(dropped))
+            logger.info(f"✅  FAISS index migrated to {index_type} ({new_index.ntotal} vectors)")
+        except Exception as e:
+            logger.error(f"❌  FAISS index migration to {index_type} failed: {e}", exc_info=True)
+        finally:
+            self._retraining = False
+
+    def _schedule_persist(self):
+        if self.persist_delay <= 0:
+            self.flush()
+            return
+        if self._timer:
+            self._timer.cancel()
+        self._timer = threading.Timer(self.persist_delay, self.flush)
+        self._timer.daemon = True
+        self._timer.start()
+
+    def flush(self):
+        """
+        Persist pending writes immediately, as a newly published snapshot. The index
+        is serialized as a registered reader, so searches keep running meanwhile and
+        only writes wait for it.
+        """
+        with self._lock:
+            if self._timer:
+                self._timer.cancel()
+                self._timer = None
+            while self._persisting:
+                self._persisted.wait()
+            if not self._dirty or self._index is None:
+                return
+            index, version = self._index, self._snapshot + 1
+            self._readers += 1
+            self._persisting = True
+            # Searches queued behind a writer may run: that writer now waits for this persist anyway
+            self._writers_done.notify_all()
+        try:
+            with stage("persist"):
+                self.lexical.flush()
+                path = _publish_snapshot(index, self.path, version)
+        finally:
+            with self._lock:
+                self._persisting = False
+                self._persisted.notify_all()
+                self._readers -= 1
+                if self._readers == 0:
+                    self._readers_done.notify_all()
+        with self._lock:
+            self._index_file, self._snapshot = path, version
+            self._dirty = False
+
+
+_manager: Optional[IndexManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_index_manager() -> IndexManager:
+    """
+    Return the process-wide index manager. Created under a lock: startup threads
+    call this concurrently, and a second instance would hold its own writer lock.
+    """
+    global _manager
+    if _manager is None:
+        with _manager_lock:
+            if _manager is None:
+                manager = IndexManager()
+                atexit.register(manager.flush)
+                _manager = manager
+    return _manager
 
-def _load_index() -> Optional[FAISS]:
-    """Load FAISS index from disk, if available."""
-    if VDB_PATH.exists():
-        with open(VDB_PATH, "rb") as f:
-            return pickle.load(f)
-    return None
 
 def store_chunks(
     embedder: Embeddings,
     chunks: List[str],
     metadatas: List[dict],
+    embeddings: Optional[np.ndarray] = None,
 ):
     """
     Stores text chunks and metadata into a local FAISS vector store.
-    Appends if an index already exists.
+    Appends if an index already exists. Pass `embeddings` to skip re-embedding.
     """
-    docs = [Document(page_content=c, metadata=m) for c, m in zip(chunks, metadatas)]
+    if not chunks:
+        return []
+    if embeddings is None:
+        embeddings = embedder.embed_documents(chunks)
+    vectors = np.asarray(embeddings, dtype="float32")
+    return get_index_manager().add(vectors, chunks, metadatas)
 
-    index = _load_index()
-    if index:
-        logger.info("🔄  Appending to existing FAISS index")
-        index.add_documents(docs)
-    else:
-        logger.info("🆕  Creating new FAISS index")
-        index = FAISS.from_documents(docs, embedder)
+def store_pages(filename: str, pages: List[dict]):
+    """Persist a document's extracted page records next to its chunks."""
+    get_index_manager().meta.put_pages(filename, pages)
 
-    _save_index(index)
+def load_pages(filename: str, page_numbers: Optional[List[int]] = None) -> List[dict]:
+    """Load previously extracted page records, e.g. to re-chunk without re-running OCR."""
+    return get_index_manager().meta.get_pages(filename, page_numbers)
+
+def record_document(filename: str, sha256: str, size: int, chunk_count: int):
+    """Remember a fully indexed document by content hash."""
+    get_index_manager().meta.put_document(filename, sha256, size, chunk_count)
+
+def delete_document(filename: str) -> int:
+    """Remove a document from the store; returns the number of deleted chunks."""
+    return get_index_manager().delete_document(filename)
+
+def document_exists(filename: str) -> bool:
+    return get_index_manager().meta.has_document(filename)
+
+def find_document_by_hash(sha256: str) -> Optional[str]:
+    """Filename of an already indexed document with identical bytes, if any."""
+    return get_index_manager().meta.find_document_by_hash(sha256)
+
+def _lexical_search(manager: IndexManager, question: str, k: int, allowed_ids: Optional[np.ndarray]):
+    with stage("lexical_search"):
+        return manager.lexical.search(question, k, allowed_ids)
 
 def query_chunks(
     embedder: Embeddings,
     question: str,
     k: int = 4,
-    filters: Optional[Dict] = None
+    filters: Optional[Dict] = None,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+    query_vector: Optional[List[float]] = None,
+    mode: Optional[str] = None,
+    collapse_duplicates: Optional[bool] = None
 ):
     """
-    Queries the FAISS index and optionally filters results by metadata.
-    Returns top-k most similar chunks.
+    Queries the index and optionally filters results by metadata.
+    Returns top-k most relevant chunks. In hybrid mode the BM25 index is searched
+    concurrently with FAISS and the two rankings are merged by reciprocal-rank
+    fusion. Pass `query_vector` if the question has already been embedded.
+    Near-duplicate results are folded into the best-ranked copy unless DEDUP_MODE
+    is off (or `collapse_duplicates` is False); more candidates are fetched until
+    k distinct chunks remain or the index is exhausted.
     """
-    index = _load_index()
-    if not index:
-        raise RuntimeError("No FAISS index found. Upload documents first.")
+    mode = mode or RETRIEVAL_MODE
+    if mode not in RETRIEVAL_MODES:
+        raise ValueError(f"Unknown retrieval mode '{mode}', expected one of {RETRIEVAL_MODES}")
+    if collapse_duplicates is None:
+        collapse_duplicates = dedup.DEDUP_MODE != "off"
+    manager = get_index_manager()
+    allowed_ids = None
+    shard_names = None
+    if filters and "filename" in filters:
+        filenames = filters["filename"]["$in"]
+        allowed_ids = manager.meta.ids_for_filenames(filenames)
+        logger.info(f"📎 Searching {len(allowed_ids)} chunks from {len(filenames)} selected documents")
+        if len(allowed_ids) and len(allowed_ids) == manager.meta.count():
+            # Every document selected (the UI default): search unfiltered, batched with other queries
+            allowed_ids = None
+        elif manager.shards is not None and len(allowed_ids) and len(filenames) <= SHARD_MAX_FANOUT:
+            shard_names = filenames
 
-    docs_and_scores = index.similarity_search_with_score(question, k=k)
+    if not collapse_duplicates:
+        results, _ = _search_candidates(
+            manager, embedder, question, k, k, mode, allowed_ids, shard_names, nprobe, ef_search, query_vector
+        )
+        return results
 
-    if filters and "filename" in filters:
-        allowed = set(filters["filename"]["$in"])
-        original_count = len(docs_and_scores)
-        docs_and_scores = [
-            (doc, score)
-            for doc, score in docs_and_scores
-            if doc.metadata.get("filename") in allowed
-        ]
-        logger.info(f"📎 Filtered results by filename: {len(docs_and_scores)} / {original_count} retained")
+    # Over-fetch so k distinct chunks usually remain after collapsing; double until they do
+    limit = k * dedup.DEDUP_OVERFETCH
+    while True:
+        results, exhausted = _search_candidates(
+            manager, embedder, question, k, limit, mode, allowed_ids, shard_names, nprobe, ef_search, query_vector
+        )
+        with stage("dedup"):
+            distinct = dedup.collapse(results, k)
+        if len(distinct) >= k or exhausted:
+            dedup.record_query(sum(len(r.get("duplicates", ())) for r in distinct))
+            return distinct
+        limit *= 2
+        if query_vector is None and mode != "lexical":
+            # Embed once for the follow-up searches instead of on every round
+            with stage("query_embed"):
+                query_vector = embed_query(embedder, question)
+
+
+def _search_candidates(
+    manager: IndexManager,
+    embedder: Embeddings,
+    question: str,
+    k: int,
+    limit: int,
+    mode: str,
+    allowed_ids: Optional[np.ndarray],
+    shard_names: Optional[List[str]],
+    nprobe: Optional[int],
+    ef_search: Optional[int],
+    query_vector: Optional[List[float]],
+) -> Tuple[List[Dict], bool]:
+    """Up to `limit` ranked chunks, and whether fewer matched (nothing more to fetch)."""
+    fetch = max(k * HYBRID_CANDIDATES, limit) if mode == "hybrid" else limit
+    lexical_future = None
+    if mode != "dense":
+        manager.get()  # picks up a newer index (and its BM25 segments) from disk
+        lexical_future = get_lexical_executor().submit(
+            contextvars.copy_context().run, _lexical_search, manager, question, fetch, allowed_ids
+        )
+
+    dense_hits: List[Tuple[int, float]] = []
+    if mode != "lexical":
+        if QUERY_BATCHING and allowed_ids is None:
+            # Embedded and searched together with concurrent queries; filtered queries
+            # (e.g. scoped to the selected documents) share only the embedding pass
+            with stage("dense_batched"):
+                distances, ids = get_query_batcher().search(
+                    embedder, question, fetch, query_vector=query_vector, nprobe=nprobe, ef_search=ef_search
+                )
+        else:
+            if query_vector is None:
+                with stage("query_embed"):
+                    query_vector = embed_query(embedder, question)
+            query_vector = np.asarray([query_vector], dtype="float32")
+            sharded = None
+            if shard_names:
+                with stage("shard_search"):
+                    sharded = manager.shards.search(shard_names, query_vector, fetch, expected=len(allowed_ids))
+            if sharded is not None:
+                distances, ids = sharded
+            else:
+                with stage("search"):
+                    distances, ids = manager.search(query_vector, fetch, ids=allowed_ids, nprobe=nprobe, ef_search=ef_search)
+        dense_hits = [(int(i), float(d)) for i, d in zip(ids[0], distances[0]) if i != -1]
+
+    lexical_hits: List[Tuple[int, float]] = []
+    if lexical_future is not None:
+        lexical_ids, lexical_scores = lexical_future.result()
+        lexical_hits = [(int(i), float(s)) for i, s in zip(lexical_ids, lexical_scores)]
 
-    return [
+    if mode == "hybrid":
+        hits = reciprocal_rank_fusion([[i for i, _ in dense_hits], [i for i, _ in lexical_hits]])[:limit]
+    else:
+        hits = dense_hits or lexical_hits
+
+    rows = manager.meta.get([i for i, _ in hits])
+    docs_and_scores = [(rows[i], score) for i, score in hits if i in rows]
+
+    results = [
         {
-            "content": doc.page_content,
-            "metadata": doc.metadata,
-            "score": float(score)  # Ensure JSON serialization
+            "content": row["content"],
+            "metadata": row["metadata"],
+            "score": score  # L2 distance (dense), BM25 (lexical) or fused RRF score (hybrid)
         }
-        for doc, score in docs_and_scores
+        for row, score in docs_and_scores
     ]
+    return results, len(hits) < limit
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="FAISS store maintenance")
+    parser.add_argument("--migrate", action="store_true", help="Migrate a legacy .pkl store to .faiss + .sqlite")
+    parser.add_argument("--pkl", type=Path, default=LEGACY_PKL_PATH)
+    parser.add_argument("--retrain", choices=index_factory.INDEX_TYPES, help="Rebuild the index as the given type")
+    parser.add_argument("--build-shards", action="store_true", help="Rebuild the per-document shards (FAISS_SHARDS=1)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if (args.migrate or args.retrain or args.build_shards) and not get_index_manager().acquire_writer():
+        parser.exit(1, "Another process holds the FAISS index writer lock; stop it and retry.\n")
+    if args.migrate:
+        migrate_pickle(args.pkl)
+    if args.retrain:
+        get_index_manager().retrain(args.retrain)
+    if args.build_shards:
+        if get_index_manager().shards is None:
+            parser.exit(1, "Set FAISS_SHARDS=1 to use per-document shards.\n")
+        get_index_manager().build_shards()
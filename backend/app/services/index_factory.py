@@ -0,0 +1,157 @@
+from typing import Optional, Tuple
+import math
+import os
+import logging
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# faiss is imported inside the functions that use it, so importing the app stays cheap;
+# annotations name its types as strings for the same reason
+
+# Index layout for this deployment: flat | hnsw | ivf_flat | ivf_pq | ivf_sq8
+INDEX_TYPE = os.getenv("FAISS_INDEX_TYPE", "flat").strip().lower()
+INDEX_TYPES = ("flat", "hnsw", "ivf_flat", "ivf_pq", "ivf_sq8")
+# Build-time parameters (0 = derive from the corpus size)
+NLIST = int(os.getenv("FAISS_NLIST", "0"))
+PQ_M = int(os.getenv("FAISS_PQ_M", "0"))
+HNSW_M = int(os.getenv("FAISS_HNSW_M", "32"))
+TRAIN_SAMPLE = int(os.getenv("FAISS_TRAIN_SAMPLE", "100000"))
+# Search-time parameters, overridable per query
+NPROBE = int(os.getenv("FAISS_NPROBE", "16"))
+EF_SEARCH = int(os.getenv("FAISS_EF_SEARCH", "64"))
+
+# FAISS wants ~39 training points per IVF centroid; below this we stay flat
+MIN_POINTS_PER_LIST = 39
+MIN_NLIST = 16
+# Bits per PQ code ("PQ{m}" factory strings use 8); each sub-quantizer trains
+# 2**bits centroids, so PQ needs ~39 * 256 points regardless of nlist
+PQ_NBITS = 8
+MIN_PQ_POINTS = MIN_POINTS_PER_LIST * 2 ** PQ_NBITS
+
+
+def needs_training(index_type: str) -> bool:
+    return index_type.startswith("ivf")
+
+def _nlist_for(n: int) -> int:
+    if NLIST:
+        return NLIST
+    return int(min(max(MIN_NLIST, 4 * math.sqrt(n)), n // MIN_POINTS_PER_LIST, 65536))
+
+def _pq_m_for(dim: int) -> int:
+    if PQ_M:
+        return PQ_M
+    # Largest sub-quantizer count <= dim/8 that divides the dimension (384 → 48)
+    for m in range(max(1, dim // 8), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+def can_build(index_type: str, n: int) -> bool:
+    """Whether there are enough vectors to train the requested index type."""
+    if not needs_training(index_type):
+        return True
+    if index_type == "ivf_pq" and n < MIN_PQ_POINTS:
+        return False
+    return _nlist_for(n) >= MIN_NLIST
+
+def factory_string(index_type: str, dim: int, n: int) -> str:
+    if index_type == "flat":
+        return "IDMap2,Flat"
+    if index_type == "hnsw":
+        return f"IDMap2,HNSW{HNSW_M},Flat"
+    nlist = _nlist_for(n)
+    if index_type == "ivf_flat":
+        return f"IDMap2,IVF{nlist},Flat"
+    if index_type == "ivf_pq":
+        return f"IDMap2,IVF{nlist},PQ{_pq_m_for(dim)}"
+    if index_type == "ivf_sq8":
+        return f"IDMap2,IVF{nlist},SQ8"
+    raise ValueError(f"Unknown FAISS index type '{index_type}', expected one of {INDEX_TYPES}")
+
+def build_index(index_type: str, dim: int, train_vectors: Optional[np.ndarray] = None) -> "faiss.Index":
+    """
+    Create an empty index of the requested type. Trainable types are trained on a
+    random sample of `train_vectors` (at most FAISS_TRAIN_SAMPLE rows).
+    """
+    import faiss
+
+    n = 0 if train_vectors is None else len(train_vectors)
+    spec = factory_string(index_type, dim, n)
+    index = faiss.index_factory(dim, spec, faiss.METRIC_L2)
+    if not index.is_trained:
+        if n == 0:
+            raise ValueError(f"Index type '{index_type}' needs training vectors")
+        sample = train_vectors
+        if n > TRAIN_SAMPLE:
+            rng = np.random.default_rng(0)
+            sample = train_vectors[rng.choice(n, TRAIN_SAMPLE, replace=False)]
+        logger.info(f"🏋️ Training {spec} on {len(sample)} vectors")
+        index.train(np.ascontiguousarray(sample, dtype="float32"))
+    return enable_reconstruct(index)
+
+def enable_reconstruct(index: "faiss.Index") -> "faiss.Index":
+    """
+    Make vectors of an IVF index reconstructable by id, as flat and HNSW ones
+    always are, by keeping a direct map (8 bytes per vector, saved with the index).
+    """
+    import faiss
+
+    sub = faiss.downcast_index(index.index)
+    if isinstance(sub, faiss.IndexIVF) and sub.direct_map.type == faiss.DirectMap.NoMap:
+        sub.make_direct_map()
+    return index
+
+def index_kind(index: "faiss.Index") -> str:
+    """Map an (IDMap-wrapped) index back to its INDEX_TYPES name."""
+    import faiss
+
+    sub = faiss.downcast_index(index.index) if hasattr(index, "id_map") else faiss.downcast_index(index)
+    if isinstance(sub, faiss.IndexFlat):
+        return "flat"
+    if isinstance(sub, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(sub, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(sub, faiss.IndexIVFScalarQuantizer):
+        return "ivf_sq8"
+    if isinstance(sub, faiss.IndexIVFFlat):
+        return "ivf_flat"
+    return type(sub).__name__
+
+def search_params(
+    index: "faiss.Index",
+    sel: Optional["faiss.IDSelector"] = None,
+    nprobe: Optional[int] = None,
+    ef_search: Optional[int] = None,
+) -> "faiss.SearchParameters":
+    """Search parameters matching the wrapped index type, with an optional id selector."""
+    import faiss
+
+    sub = faiss.downcast_index(index.index)
+    if isinstance(sub, faiss.IndexIVF):
+        params = faiss.SearchParametersIVF()
+        params.nprobe = nprobe or NPROBE
+    elif isinstance(sub, faiss.IndexHNSW):
+        params = faiss.SearchParametersHNSW()
+        params.efSearch = ef_search or EF_SEARCH
+    else:
+        params = faiss.SearchParameters()
+    if sel is not None:
+        params.sel = sel
+    return params
+
+def export_vectors(index: "faiss.Index") -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Return (ids, vectors) for every vector in an IDMap2-wrapped index.
+    Exact for flat, HNSW, IVF-Flat and SQ8 (up to quantization); lossy for PQ.
+    """
+    import faiss
+
+    ids = faiss.vector_to_array(index.id_map).astype("int64")
+    if len(ids) == 0:
+        return ids, np.zeros((0, index.d), dtype="float32")
+    enable_reconstruct(index)
+    sub = faiss.downcast_index(index.index)
+    return ids, sub.reconstruct_n(0, sub.ntotal)
@@ -0,0 +1,149 @@
+from typing import Callable, Optional
+from pathlib import Path
+import logging
+
+import numpy as np
+
+from . import dedup
+from .embedder import get_embedder
+from .faiss_store import (
+    store_chunks, store_pages, record_document, delete_document, document_exists, get_index_manager
+)
+from .metrics import stage
+
+logger = logging.getLogger(__name__)
+
+# Chunks embedded per call so the embed stage can report progress
+EMBED_BATCH_SIZE = 256
+
+
+def _noop_progress(stage: str, fraction: float):
+    pass
+
+def process_document(
+    file_path: Path,
+    content_type: str,
+    filename: str,
+    chunk_size: int,
+    chunk_overlap: int,
+    sha256: Optional[str] = None,
+    progress: Optional[Callable[[str, float], None]] = None,
+):
+    """
+    Extract → chunk → embed → index a single document.
+    Raises on failure so the job queue can record the error and retry.
+    """
+    # Deferred so importing the app does not pull in pytesseract, pdf2image and the text splitter
+    from . import ocr, pdf_ocr, chunker
+
+    progress = progress or _noop_progress
+    file_path = Path(file_path)
+    logger.info(f"🔄 Started processing {filename}")
+
+    progress("extract", 0.0)
+    with stage("extract"):
+        if content_type.startswith("image/"):
+            logger.info("🧠 Running OCR on image...")
+            text = ocr.extract_text_from_image(file_path) or ""
+            pages = [{"page_number": 1, "text": text, "method": "ocr"}]
+        else:
+            logger.info("🧠 Extracting PDF text (text layer first, OCR fallback)...")
+            pages = pdf_ocr.extract_pdf_pages(
+                file_path, on_progress=lambda done, total: progress("extract", done / max(total, 1))
+            )
+
+    if not any(p["text"].strip() for p in pages):
+        logger.warning(f"⚠️ No text extracted from {filename}")
+        return
+
+    progress("chunk", 0.0)
+    logger.info("✂️ Chunking text...")
+    with stage("chunk"):
+        page_chunks = chunker.chunk_pages(pages, chunk_size, chunk_overlap)
+    logger.info(f"📦 Chunked into {len(page_chunks)} chunks across {len(pages)} pages")
+    metadatas = [
+        {
+            "filename": filename,
+            "chunk_num": i,
+            "page_number": c["page_start"],
+            "page_end": c["page_end"],
+            "char_start": c["char_start"],
+            "char_end": c["char_end"]
+        }
+        for i, c in enumerate(page_chunks)
+    ]
+
+    seen = len(page_chunks)
+    if dedup.DEDUP_MODE == "index":
+        # Repeated headers, footers and disclaimers are embedded and stored once; the
+        # kept copy lists the pages of the others (chunk_num keeps its original value)
+        with stage("dedup"):
+            canonical = dedup.canonical_positions([c["text"] for c in page_chunks])
+        for i, first in enumerate(canonical):
+            if first != i:
+                pages_seen = metadatas[first].setdefault("duplicate_pages", [])
+                if page_chunks[i]["page_start"] not in pages_seen:
+                    pages_seen.append(page_chunks[i]["page_start"])
+        kept = [i for i, first in enumerate(canonical) if first == i]
+        page_chunks = [page_chunks[i] for i in kept]
+        metadatas = [metadatas[i] for i in kept]
+        if len(kept) < seen:
+            logger.info(f"🧹 Skipped {seen - len(kept)} near-duplicate chunks")
+    chunks = [c["text"] for c in page_chunks]
+
+    progress("embed", 0.0)
+    logger.info("🧬 Embedding chunks...")
+    embedder_instance = get_embedder()
+    embeddings = []
+    for start in range(0, len(chunks), EMBED_BATCH_SIZE):
+        with stage("embed"):
+            embeddings.extend(embedder_instance.embed_documents(chunks[start:start + EMBED_BATCH_SIZE]))
+        progress("embed", min(start + EMBED_BATCH_SIZE, len(chunks)) / len(chunks))
+    logger.info("✅ Embeddings created")
+
+    progress("index", 0.0)
+    logger.info("📚 Storing in FAISS vector store...")
+
+    if document_exists(filename):
+        # Re-upload under the same name: replace the old version (it stays searchable until now)
+        logger.info(f"♻️ Replacing previously indexed version of {filename}")
+        delete_document(filename)
+    store_pages(filename, pages)
+    store_chunks(embedder_instance, chunks, metadatas, embeddings=embeddings)
+    dedup.record_ingest(seen, seen - len(chunks), len(embeddings[0]) * 4 if embeddings else 0)
+    if sha256:
+        record_document(filename, sha256, file_path.stat().st_size, len(chunks))
+    progress("index", 1.0)
+    logger.info(f"✅ Successfully processed and stored {filename} in FAISS")
+
+def recover_index():
+    """
+    Re-add vectors lost when the writer stopped before persisting them. Their rows
+    (and document hashes) were already committed, so without this the chunks
+    would never be found and re-uploads would be rejected as duplicates.
+    Embeddings are normally served from the embedding cache.
+    """
+    manager = get_index_manager()
+    missing = manager.unindexed_chunks()
+    if not missing:
+        return
+    logger.info(f"🩹 {len(missing)} chunks have no vector in the FAISS index; re-embedding them")
+    embedder_instance = get_embedder()
+    for start in range(0, len(missing), EMBED_BATCH_SIZE):
+        batch = missing[start:start + EMBED_BATCH_SIZE]
+        vectors = np.asarray(embedder_instance.embed_documents([text for _, text in batch]), dtype="float32")
+        manager.restore([chunk_id for chunk_id, _ in batch], vectors)
+    manager.flush()
+
+def run_job(job: dict, progress: Callable[[str, float], None]):
+    """Job queue handler: process the document described by a job row."""
+    options = job["options"]
+    process_document(
+        Path(job["file_path"]),
+        job["content_type"],
+        job["filename"],
+        options.get("chunk_size", 500),
+        options.get("chunk_overlap", 100),
+        sha256=job["sha256"],
+        progress=progress,
+    )
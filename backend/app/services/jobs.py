@@ -0,0 +1,281 @@
+from typing import Callable, Dict, List, Optional
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Persistent ingestion job table and worker pool settings
+JOBS_DB_PATH = Path(os.getenv("JOBS_DB_PATH", "vector_store/jobs.sqlite"))
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", "2"))
+INGEST_MAX_ATTEMPTS = int(os.getenv("INGEST_MAX_ATTEMPTS", "3"))
+INGEST_RETRY_DELAY = float(os.getenv("INGEST_RETRY_DELAY", "5"))
+# Seconds between checks for jobs queued by other workers (only the index writer runs jobs)
+INGEST_POLL_INTERVAL = float(os.getenv("INGEST_POLL_INTERVAL", "1.0"))
+
+STAGES = ["extract", "chunk", "embed", "index"]
+ACTIVE_STATUSES = ("queued", "running", "retrying")
+
+# handler(job, progress) where progress(stage, fraction_of_stage_done)
+JobHandler = Callable[[Dict, Callable[[str, float], None]], None]
+
+
+class JobStore:
+    """SQLite table of ingestion jobs; survives restarts so unfinished work can resume."""
+
+    COLUMNS = (
+        "id", "filename", "file_path", "content_type", "sha256", "options", "status",
+        "stage", "progress", "attempts", "error", "created_at", "updated_at",
+    )
+
+    def __init__(self, path: Path = JOBS_DB_PATH):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                filename TEXT NOT NULL,
+                file_path TEXT NOT NULL,
+                content_type TEXT NOT NULL,
+                sha256 TEXT,
+                options TEXT NOT NULL,
+                status TEXT NOT NULL,
+                stage TEXT,
+                progress REAL NOT NULL DEFAULT 0,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                created_at REAL NOT NULL,
+                updated_at REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status)")
+        self._conn.commit()
+
+    def _row(self, row) -> Dict:
+        job = dict(zip(self.COLUMNS, row))
+        job["options"] = json.loads(job["options"])
+        return job
+
+    def create(self, filename: str, file_path: str, content_type: str, sha256: Optional[str], options: Dict) -> Dict:
+        now = time.time()
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute(
+                "INSERT INTO jobs (id, filename, file_path, content_type, sha256, options, status, created_at, updated_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, 'queued', ?, ?)",
+                (job_id, filename, str(file_path), content_type, sha256, json.dumps(options), now, now),
+            )
+            self._conn.commit()
+        return self.get(job_id)
+
+    def update(self, job_id: str, **fields):
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{k} = ?" for k in fields)
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", [*fields.values(), job_id])
+            self._conn.commit()
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(f"SELECT {', '.join(self.COLUMNS)} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row(row) if row else None
+
+    def list(self, status: Optional[str] = None, limit: int = 100) -> List[Dict]:
+        query = f"SELECT {', '.join(self.COLUMNS)} FROM jobs"
+        params: list = []
+        if status:
+            query += " WHERE status = ?"
+            params.append(status)
+        query += " ORDER BY created_at DESC LIMIT ?"
+        params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [self._row(r) for r in rows]
+
+    def claim(self, job_id: str) -> Optional[Dict]:
+        """Atomically mark a queued or retrying job as running; None if it is already taken or finished."""
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = attempts + 1, error = NULL, updated_at = ?"
+                " WHERE id = ? AND status IN ('queued', 'retrying')",
+                (time.time(), job_id),
+            )
+            self._conn.commit()
+        return self.get(job_id) if cursor.rowcount else None
+
+    def cancel_pending(self, filename: str) -> Optional[int]:
+        """
+        Cancel the queued or retrying jobs for a document, so they cannot re-index it
+        after it is deleted. Returns how many were cancelled, or None (cancelling
+        nothing) while a job for it is running.
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'cancelled', updated_at = ?"
+                " WHERE filename = ? AND status IN ('queued', 'retrying')"
+                " AND NOT EXISTS (SELECT 1 FROM jobs WHERE filename = ? AND status = 'running')",
+                (time.time(), filename, filename),
+            )
+            self._conn.commit()
+            if cursor.rowcount:
+                return cursor.rowcount
+            running = self._conn.execute(
+                "SELECT 1 FROM jobs WHERE filename = ? AND status = 'running' LIMIT 1", (filename,)
+            ).fetchone()
+        return None if running else 0
+
+    def queued(self) -> List[str]:
+        """Ids of jobs waiting to be picked up, oldest first."""
+        with self._lock:
+            return [r[0] for r in self._conn.execute("SELECT id FROM jobs WHERE status = 'queued' ORDER BY created_at")]
+
+    def find_active(self, sha256: str) -> Optional[Dict]:
+        """A queued or running job for the same file content, if any."""
+        placeholders = ",".join("?" * len(ACTIVE_STATUSES))
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM jobs WHERE sha256 = ? AND status IN ({placeholders}) LIMIT 1",
+                (sha256, *ACTIVE_STATUSES),
+            ).fetchone()
+        return self._row(row) if row else None
+
+    def unfinished(self) -> List[Dict]:
+        placeholders = ",".join("?" * len(ACTIVE_STATUSES))
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(self.COLUMNS)} FROM jobs WHERE status IN ({placeholders}) ORDER BY created_at",
+                ACTIVE_STATUSES,
+            ).fetchall()
+        return [self._row(r) for r in rows]
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return dict(rows)
+
+
+class JobQueue:
+    """
+    Runs ingestion jobs on a bounded thread pool, off the API event loop.
+    Failed jobs are retried with backoff up to INGEST_MAX_ATTEMPTS; jobs left
+    queued or running by a previous process are resumed on start().
+
+    Only a started queue runs jobs. Workers that never start theirs (index
+    readers) just record jobs in the shared table, and the started queue
+    picks them up by polling.
+    """
+
+    def __init__(
+        self,
+        store: JobStore,
+        handler: JobHandler,
+        workers: int = INGEST_WORKERS,
+        max_attempts: int = INGEST_MAX_ATTEMPTS,
+    ):
+        self.store = store
+        self.handler = handler
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # Jobs handed to the pool and not finished yet, so polling does not submit them twice
+        self._submitted: set = set()
+        self._stopped = threading.Event()
+
+    @property
+    def started(self) -> bool:
+        return self._executor is not None
+
+    def start(self):
+        # Only one started queue exists at a time, so anything left running belongs to a dead process
+        unfinished = self.store.unfinished()
+        for job in unfinished:
+            self.store.update(job["id"], status="queued")
+        self._stopped.clear()
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ingest")
+        for job in unfinished:
+            self._submit(job["id"])
+        threading.Thread(target=self._poll, name="ingest-poll", daemon=True).start()
+        logger.info(f"🏭 Ingestion queue started with {self.workers} workers, resumed {len(unfinished)} jobs")
+
+    def shutdown(self):
+        self._stopped.set()
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def enqueue(self, filename: str, file_path: Path, content_type: str, sha256: Optional[str], options: Dict) -> Dict:
+        job = self.store.create(filename, str(file_path), content_type, sha256, options)
+        self._submit(job["id"])
+        return job
+
+    def retry(self, job_id: str) -> Optional[Dict]:
+        job = self.store.get(job_id)
+        if not job or job["status"] in ACTIVE_STATUSES:
+            return job
+        self.store.update(job_id, status="queued", attempts=0, error=None, stage=None, progress=0.0)
+        self._submit(job_id)
+        return self.store.get(job_id)
+
+    def _submit(self, job_id: str):
+        executor = self._executor
+        if executor is None or job_id in self._submitted:
+            return  # Not the ingesting worker: the job waits in the table
+        self._submitted.add(job_id)
+        try:
+            executor.submit(self._run, job_id)
+        except RuntimeError:  # Shut down meanwhile
+            self._submitted.discard(job_id)
+
+    def _poll(self):
+        """Pick up jobs queued by other workers."""
+        while not self._stopped.wait(INGEST_POLL_INTERVAL):
+            try:
+                for job_id in self.store.queued():
+                    self._submit(job_id)
+            except Exception as e:
+                logger.error(f"❌ Polling for ingestion jobs failed: {e}")
+
+    def _progress(self, job_id: str) -> Callable[[str, float], None]:
+        def report(stage: str, fraction: float):
+            fraction = min(max(fraction, 0.0), 1.0)
+            overall = (STAGES.index(stage) + fraction) / len(STAGES)
+            self.store.update(job_id, stage=stage, progress=round(overall, 4))
+        return report
+
+    def _run(self, job_id: str):
+        try:
+            job = self.store.claim(job_id)
+            if job:
+                self._execute(job)
+        finally:
+            self._submitted.discard(job_id)
+
+    def _execute(self, job: Dict):
+        job_id, attempts = job["id"], job["attempts"]
+        try:
+            self.handler(job, self._progress(job_id))
+        except Exception as e:
+            logger.error(f"❌ Ingestion job {job_id} ({job['filename']}) failed on attempt {attempts}: {e}", exc_info=True)
+            if attempts < self.max_attempts and self._executor:
+                delay = INGEST_RETRY_DELAY * 2 ** (attempts - 1)
+                self.store.update(job_id, status="retrying", error=str(e))
+                timer = threading.Timer(delay, self._resubmit, args=(job_id,))
+                timer.daemon = True
+                timer.start()
+            else:
+                self.store.update(job_id, status="failed", error=str(e))
+            return
+        self.store.update(job_id, status="done", progress=1.0)
+
+    def _resubmit(self, job_id: str):
+        self._submit(job_id)
@@ -0,0 +1,316 @@
+from array import array
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+import math
+import os
+import re
+import threading
+import logging
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# BM25 parameters
+BM25_K1 = float(os.getenv("BM25_K1", "1.2"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+# Postings buffered in the delta segment before it is merged into the base segment
+LEXICAL_MERGE_POSTINGS = int(os.getenv("LEXICAL_MERGE_POSTINGS", "2000000"))
+# Reciprocal-rank fusion constant (60 in the original RRF paper)
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+# Terms are stored as fixed-width UTF-8 bytes; longer tokens are truncated
+MAX_TOKEN_BYTES = 32
+# Keeps case numbers, citations and dotted/dashed identifiers ("12-cv-3456", "u.s.c", "1983") whole
+TOKEN_RE = re.compile(r"[^\W_]+(?:[./:\-][^\W_]+)*")
+PART_RE = re.compile(r"[./:\-]")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were will with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Lower-cased word tokens. Compound tokens are kept whole and also split into
+    their parts, so "12-cv-3456" matches both the full case number and "3456".
+    """
+    tokens = []
+    for token in TOKEN_RE.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        tokens.append(token)
+        if PART_RE.search(token):
+            tokens.extend(part for part in PART_RE.split(token) if part and part not in STOPWORDS)
+    return tokens
+
+def _term_key(term: str) -> bytes:
+    return term.encode("utf-8")[:MAX_TOKEN_BYTES]
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[int]], k: int = RRF_K) -> List[Tuple[int, float]]:
+    """Fuse several ranked id lists; returns (id, score) pairs, best first."""
+    scores: Dict[int, float] = {}
+    for ranking in rankings:
+        for rank, doc_id in enumerate(ranking):
+            scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (k + rank + 1)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class _Segment:
+    """
+    Immutable inverted index segment in CSR layout: a sorted term array, and one
+    contiguous array each of doc ids and term frequencies sliced by `offsets`.
+    """
+
+    def __init__(
+        self,
+        terms: Optional[np.ndarray] = None,
+        offsets: Optional[np.ndarray] = None,
+        doc_ids: Optional[np.ndarray] = None,
+        tfs: Optional[np.ndarray] = None,
+    ):
+        self.terms = terms if terms is not None else np.zeros(0, dtype=f"S{MAX_TOKEN_BYTES}")
+        self.offsets = offsets if offsets is not None else np.zeros(1, dtype="int64")
+        self.doc_ids = doc_ids if doc_ids is not None else np.zeros(0, dtype="int64")
+        self.tfs = tfs if tfs is not None else np.zeros(0, dtype="uint16")
+
+    @property
+    def postings(self) -> int:
+        return len(self.doc_ids)
+
+    def lookup(self, key: bytes) -> Tuple[np.ndarray, np.ndarray]:
+        i = int(np.searchsorted(self.terms, key))
+        if i < len(self.terms) and self.terms[i] == key:
+            start, end = self.offsets[i], self.offsets[i + 1]
+            return self.doc_ids[start:end], self.tfs[start:end]
+        return self.doc_ids[:0], self.tfs[:0]
+
+    @classmethod
+    def from_buffer(cls, buffer: Dict[bytes, Tuple[array, array]]) -> "_Segment":
+        keys = sorted(buffer)
+        counts = np.fromiter((len(buffer[key][0]) for key in keys), dtype="int64", count=len(keys))
+        offsets = np.zeros(len(keys) + 1, dtype="int64")
+        np.cumsum(counts, out=offsets[1:])
+        doc_ids = np.concatenate([np.frombuffer(buffer[key][0], dtype="int64") for key in keys]) if keys else None
+        tfs = np.concatenate([np.frombuffer(buffer[key][1], dtype="uint16") for key in keys]) if keys else None
+        return cls(np.array(keys, dtype=f"S{MAX_TOKEN_BYTES}"), offsets, doc_ids, tfs)
+
+    @classmethod
+    def merge(cls, segments: List["_Segment"], doc_len: np.ndarray) -> "_Segment":
+        """Merge segments into one, dropping postings of deleted documents (doc_len 0)."""
+        terms = np.unique(np.concatenate([s.terms for s in segments]))
+        term_idx, doc_ids, tfs = [], [], []
+        for s in segments:
+            per_term = np.diff(s.offsets)
+            term_idx.append(np.repeat(np.searchsorted(terms, s.terms), per_term))
+            doc_ids.append(s.doc_ids)
+            tfs.append(s.tfs)
+        term_idx, doc_ids, tfs = np.concatenate(term_idx), np.concatenate(doc_ids), np.concatenate(tfs)
+
+        live = doc_len[doc_ids] > 0 if len(doc_ids) else np.zeros(0, dtype=bool)
+        term_idx, doc_ids, tfs = term_idx[live], doc_ids[live], tfs[live]
+        order = np.lexsort((doc_ids, term_idx))
+        term_idx, doc_ids, tfs = term_idx[order], doc_ids[order], tfs[order]
+
+        counts = np.bincount(term_idx, minlength=len(terms))
+        used = counts > 0
+        offsets = np.zeros(int(used.sum()) + 1, dtype="int64")
+        np.cumsum(counts[used], out=offsets[1:])
+        return cls(terms[used], offsets, doc_ids, tfs)
+
+
+class LexicalIndex:
+    """
+    BM25 inverted index over chunk text, keyed by the same ids as the FAISS store.
+
+    Postings live in numpy arrays: a large base segment, a small delta segment
+    and an append buffer for chunks added since the last flush. Flushing folds
+    the buffer into the delta; once the delta passes LEXICAL_MERGE_POSTINGS it is
+    merged into the base, so the large base file is rewritten only rarely.
+    Deletes zero the document length and are dropped at the next merge.
+    """
+
+    def __init__(self, path: Path, k1: float = BM25_K1, b: float = BM25_B):
+        self.path = path
+        self.base_path = Path(f"{path}.npz")
+        self.delta_path = Path(f"{path}.delta.npz")
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self._base = _Segment()
+        self._delta = _Segment()
+        self._buffer: Dict[bytes, Tuple[array, array]] = {}
+        self._buffered = 0
+        self._generation = 0
+        # Token count per document id (0 = absent or deleted); ids are dense SQLite rowids
+        self._doc_len = np.zeros(1024, dtype="uint32")
+        self._max_id = -1
+        self._docs = 0
+        self._total_len = 0
+        self._dirty = False
+
+    @property
+    def max_id(self) -> int:
+        return self._max_id
+
+    def _ensure_capacity(self, max_id: int):
+        if max_id < len(self._doc_len):
+            return
+        grown = np.zeros(max(max_id + 1, 2 * len(self._doc_len)), dtype="uint32")
+        grown[:len(self._doc_len)] = self._doc_len
+        self._doc_len = grown
+
+    def add(self, ids: Iterable[int], texts: Iterable[str]):
+        """Index new chunks; searchable immediately, persisted on the next flush."""
+        analysed = [(int(i), Counter(_term_key(t) for t in tokenize(text))) for i, text in zip(ids, texts)]
+        if not analysed:
+            return
+        with self._lock:
+            self._ensure_capacity(max(i for i, _ in analysed))
+            for doc_id, counts in analysed:
+                length = sum(counts.values())
+                for key, tf in counts.items():
+                    postings = self._buffer.get(key)
+                    if postings is None:
+                        postings = self._buffer[key] = (array("q"), array("H"))
+                    postings[0].append(doc_id)
+                    postings[1].append(min(tf, 65535))
+                self._buffered += len(counts)
+                self._doc_len[doc_id] = max(length, 1)
+                self._docs += 1
+                self._total_len += length
+                self._max_id = max(self._max_id, doc_id)
+            self._dirty = True
+
+    def delete(self, ids: Iterable[int]):
+        with self._lock:
+            for doc_id in ids:
+                doc_id = int(doc_id)
+                if 0 <= doc_id < len(self._doc_len) and self._doc_len[doc_id]:
+                    self._total_len -= int(self._doc_len[doc_id])
+                    self._docs -= 1
+                    self._doc_len[doc_id] = 0
+                    self._dirty = True
+
+    def search(self, query: str, k: int = 10, allowed_ids: Optional[np.ndarray] = None) -> Tuple[np.ndarray, np.ndarray]:
+        """Top-k (ids, BM25 scores), best first, optionally restricted to `allowed_ids`."""
+        keys = {_term_key(t) for t in tokenize(query)}
+        empty = (np.zeros(0, dtype="int64"), np.zeros(0, dtype="float32"))
+        if not keys:
+            return empty
+
+        # Gather postings under the lock; segments are immutable, so scoring runs without it
+        with self._lock:
+            if not self._docs:
+                return empty
+            doc_len, docs, avgdl = self._doc_len, self._docs, self._total_len / self._docs
+            postings = []
+            for key in keys:
+                parts = [self._base.lookup(key), self._delta.lookup(key)]
+                buffered = self._buffer.get(key)
+                if buffered is not None:
+                    parts.append((np.frombuffer(buffered[0], dtype="int64").copy(), np.frombuffer(buffered[1], dtype="uint16").copy()))
+                postings.append(parts)
+
+        all_ids, all_scores = [], []
+        for parts in postings:
+            ids = np.concatenate([p[0] for p in parts])
+            tfs = np.concatenate([p[1] for p in parts]).astype("float32")
+            lengths = doc_len[ids].astype("float32")
+            live = lengths > 0
+            ids, tfs, lengths = ids[live], tfs[live], lengths[live]
+            if not len(ids):
+                continue
+            idf = math.log(1 + (docs - len(ids) + 0.5) / (len(ids) + 0.5))
+            all_ids.append(ids)
+            all_scores.append(idf * tfs * (self.k1 + 1) / (tfs + self.k1 * (1 - self.b + self.b * lengths / avgdl)))
+        if not all_ids:
+            return empty
+
+        ids, inverse = np.unique(np.concatenate(all_ids), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(all_scores)).astype("float32")
+        if allowed_ids is not None:
+            keep = np.isin(ids, allowed_ids)
+            ids, scores = ids[keep], scores[keep]
+        if len(ids) > k:
+            top = np.argpartition(-scores, k)[:k]
+            ids, scores = ids[top], scores[top]
+        order = np.argsort(-scores, kind="stable")
+        return ids[order], scores[order]
+
+    def flush(self):
+        """Fold buffered postings into the delta segment (and the delta into the base when large) and persist."""
+        with self._lock:
+            if not self._dirty:
+                return
+            doc_len = self._doc_len
+            delta = self._delta
+            if self._buffer:
+                delta = _Segment.merge([delta, _Segment.from_buffer(self._buffer)], doc_len)
+            if delta.postings >= LEXICAL_MERGE_POSTINGS:
+                self._base = _Segment.merge([self._base, delta], doc_len)
+                self._generation += 1
+                self._save(self.base_path, self._base)
+                delta = _Segment()
+                logger.info(f"🗜️ Merged lexical index into base segment ({self._base.postings} postings)")
+            self._delta = delta
+            self._buffer = {}
+            self._buffered = 0
+            self._save(self.delta_path, delta)
+            self._dirty = False
+
+    def _save(self, path: Path, segment: _Segment):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(path.name + ".tmp")
+        with open(tmp, "wb") as f:
+            np.savez(
+                f,
+                terms=segment.terms,
+                offsets=segment.offsets,
+                doc_ids=segment.doc_ids,
+                tfs=segment.tfs,
+                doc_len=self._doc_len[:self._max_id + 1],
+                generation=np.int64(self._generation),
+            )
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _load(path: Path) -> Optional[Tuple[_Segment, np.ndarray, int]]:
+        if not path.exists():
+            return None
+        with np.load(path, allow_pickle=False) as data:
+            segment = _Segment(data["terms"], data["offsets"], data["doc_ids"], data["tfs"])
+            return segment, data["doc_len"], int(data["generation"])
+
+    def reload(self):
+        """Load the persisted segments, discarding unflushed in-memory postings."""
+        with self._lock:
+            self._reset()
+            base = self._load(self.base_path)
+            delta = self._load(self.delta_path)
+            if base is not None:
+                self._base, doc_len, self._generation = base
+            else:
+                doc_len = np.zeros(0, dtype="uint32")
+            # A delta written against an older base was already merged into it
+            if delta is not None and delta[2] == self._generation:
+                self._delta, doc_len = delta[0], delta[1]
+            self._ensure_capacity(len(doc_len))
+            self._doc_len[:len(doc_len)] = doc_len
+            self._max_id = len(doc_len) - 1
+            self._docs = int(np.count_nonzero(doc_len))
+            self._total_len = int(doc_len.sum(dtype="int64"))
+            if self._docs:
+                logger.info(f"📂 Lexical index loaded ← {self.path} ({self._docs} chunks, {self.stats()['terms']} terms)")
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "chunks": self._docs,
+                "terms": len(self._base.terms) + len(self._delta.terms),
+                "postings": self._base.postings + self._delta.postings + self._buffered,
+                "delta_postings": self._delta.postings + self._buffered,
+            }
@@ -1,26 +1,58 @@
 # backend/app/services/llm.py
 import os
-from groq import Groq
-from typing import List, Dict
+import httpx
+from groq import AsyncGroq
+from typing import List, Dict, AsyncIterator
+import time
 
-client = Groq(api_key=os.getenv("GROQ_API_KEY"))
-model = os.getenv("GROQ_MODEL", "llama3-70b-8192")
-if not client:
-    raise ValueError("GROQ API key is not set. Please set the GROQ_API_KEY environment variable.")
-
-def generate_structured_answer(question: str, docs: List[Dict], style: str = "detailed", include_sources: bool = True, length: str = "long") -> str:
-    """
-    Accepts a user question and retrieved document chunks with metadata.
-    Returns a structured LLM response with document-level answers and thematic synthesis in Markdown format.
-    """
-
-    formatted_chunks = ""
-    for i, doc in enumerate(docs):
-        doc_id = f"DOC{i + 1:03}"
-        content = doc["content"].replace("\n", " ").strip()
-        citation = doc["citation"]
-        formatted_chunks += f"{doc_id}:\n{content}\nCitation: {citation}\n\n"
+from .metrics import observe_stage
 
+model = os.getenv("GROQ_MODEL", "llama3-70b-8192")
+# Shared connection pool and request policy for every Groq call
+GROQ_TIMEOUT = float(os.getenv("GROQ_TIMEOUT", "60"))
+GROQ_CONNECT_TIMEOUT = float(os.getenv("GROQ_CONNECT_TIMEOUT", "5"))
+GROQ_MAX_RETRIES = int(os.getenv("GROQ_MAX_RETRIES", "3"))
+GROQ_MAX_CONNECTIONS = int(os.getenv("GROQ_MAX_CONNECTIONS", "20"))
+
+_client = None
+
+def get_client() -> AsyncGroq:
+    """Process-wide async Groq client over a pooled, keep-alive HTTP connection."""
+    global _client
+    if _client is None:
+        api_key = os.getenv("GROQ_API_KEY")
+        if not api_key:
+            raise ValueError("GROQ API key is not set. Please set the GROQ_API_KEY environment variable.")
+        timeout = httpx.Timeout(GROQ_TIMEOUT, connect=GROQ_CONNECT_TIMEOUT)
+        _client = AsyncGroq(
+            api_key=api_key,
+            timeout=timeout,
+            max_retries=GROQ_MAX_RETRIES,
+            http_client=httpx.AsyncClient(
+                timeout=timeout,
+                limits=httpx.Limits(
+                    max_connections=GROQ_MAX_CONNECTIONS,
+                    max_keepalive_connections=GROQ_MAX_CONNECTIONS
+                )
+            )
+        )
+    return _client
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+def format_doc(i: int, doc: Dict) -> str:
+    """Render one retrieved chunk as a DOCxxx block for the prompt."""
+    doc_id = f"DOC{i + 1:03}"
+    content = doc["content"].replace("\n", " ").strip()
+    citation = doc["citation"]
+    return f"{doc_id}:\n{content}\nCitation: {citation}\n\n"
+
+def build_instructions(style: str = "detailed", include_sources: bool = True, length: str = "long") -> str:
+    """Style / citation / length instructions shared by every synthesis prompt."""
     prompt_instructions = ""
     if style == "detailed":
         prompt_instructions += "Provide a detailed and comprehensive answer.\n"
@@ -37,6 +69,13 @@ def generate_structured_answer(question: str, docs: List[Dict], style: str = "de
     elif length == "short":
         prompt_instructions += "Keep the answer brief.\n"
 
+    return prompt_instructions
+
+def build_prompt(question: str, docs: List[Dict], style: str = "detailed", include_sources: bool = True, length: str = "long") -> str:
+    """Build the structured-answer prompt from the retrieved chunks and output options."""
+    formatted_chunks = "".join(format_doc(i, doc) for i, doc in enumerate(docs))
+    prompt_instructions = build_instructions(style, include_sources, length)
+
     prompt = f"""
 You are an expert legal/technical summarizer. Do the following:
 
@@ -67,16 +106,60 @@ You are an expert legal/technical summarizer. Do the following:
 Write clearly and concisely.
 """
 
-    response = client.chat.completions.create(
+    return prompt
+
+async def complete(prompt: str, max_tokens: int = 2048, temperature: float = 0.7) -> str:
+    """Single chat completion for a user prompt."""
+    started = time.perf_counter()
+    response = await get_client().chat.completions.create(
         model=model,
         messages=[{
             "role": "user",
             "content": prompt
         }],
-        temperature=0.7,
-        max_tokens=2048
+        temperature=temperature,
+        max_tokens=max_tokens
+    )
+    observe_stage("llm_total", time.perf_counter() - started)
+    return response.choices[0].message.content
+
+async def stream_completion(prompt: str, max_tokens: int = 2048, temperature: float = 0.7) -> AsyncIterator[str]:
+    """Chat completion for a user prompt, yielded as text deltas while Groq generates them."""
+    started = time.perf_counter()
+    first = True
+    stream = await get_client().chat.completions.create(
+        model=model,
+        messages=[{
+            "role": "user",
+            "content": prompt
+        }],
+        temperature=temperature,
+        max_tokens=max_tokens,
+        stream=True
     )
 
-    llm_response = response.choices[0].message.content
+    async for chunk in stream:
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            if first:
+                observe_stage("llm_ttft", time.perf_counter() - started)
+                first = False
+            yield delta
+    observe_stage("llm_total", time.perf_counter() - started)
+
+async def generate_structured_answer(question: str, docs: List[Dict], style: str = "detailed", include_sources: bool = True, length: str = "long") -> str:
+    """
+    Accepts a user question and retrieved document chunks with metadata.
+    Returns a structured LLM response with document-level answers and thematic synthesis in Markdown format.
+    """
+    return await complete(build_prompt(question, docs, style, include_sources, length))
 
-    return llm_response
\ No newline at end of file
+async def stream_structured_answer(question: str, docs: List[Dict], style: str = "detailed", include_sources: bool = True, length: str = "long") -> AsyncIterator[str]:
+    """
+    Same answer as generate_structured_answer, yielded as text deltas while Groq
+    generates them.
+    """
+    async for delta in stream_completion(build_prompt(question, docs, style, include_sources, length)):
+        yield delta
@@ -3,8 +3,13 @@ import pytesseract
 from PIL import Image
 import os
 import logging
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 from typing import Union
 
+from .metrics import stage
+
 logger = logging.getLogger(__name__)
 
 # Configure Tesseract path
@@ -14,18 +19,42 @@ if tesseract_path:
 elif os.name == 'nt':
     pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
 
+# Tesseract worker processes shared by PDF pages and image uploads
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", "0")) or (os.cpu_count() or 1)
+
+def _init_worker():
+    # Each worker already owns a core; stop Tesseract from spawning its own threads
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+
+@lru_cache(maxsize=1)
+def get_ocr_pool() -> ProcessPoolExecutor:
+    """
+    Process pool of Tesseract workers sized to the available cores. Workers are
+    spawned, not forked: the pool starts lazily inside a threaded server, and a
+    fork could copy a lock held by another thread (torch, FAISS, SQLite, httpx).
+    """
+    logger.info(f"🧵 Starting OCR pool with {OCR_WORKERS} workers")
+    return ProcessPoolExecutor(
+        max_workers=OCR_WORKERS, initializer=_init_worker, mp_context=multiprocessing.get_context("spawn")
+    )
+
 def preprocess_image(img):
     """Enhance OCR accuracy"""
     img = img.convert('L')  # Grayscale
     return img.point(lambda x: 0 if x < 140 else 255)  # Basic threshold
 
+def _ocr_image_file(file_path: str) -> str:
+    """Runs inside an OCR worker process."""
+    with Image.open(file_path) as img:
+        processed = preprocess_image(img)
+        return pytesseract.image_to_string(processed, timeout=30)
+
 def extract_text_from_image(file_path: str) -> Union[str, None]:
     """Robust OCR with preprocessing"""
     try:
-        with Image.open(file_path) as img:
-            processed = preprocess_image(img)
-            text = pytesseract.image_to_string(processed, timeout=30)
-            return text.strip() if text else None
+        with stage("ocr_image"):
+            text = get_ocr_pool().submit(_ocr_image_file, str(file_path)).result()
+        return text.strip() if text else None
     except Exception as e:
         logger.error(f"OCR failed for {file_path}: {str(e)}")
         return None
\ No newline at end of file
@@ -0,0 +1,230 @@
+from typing import Dict, List, Optional
+import json
+import os
+import logging
+from pathlib import Path
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+# Where exported (and quantized) ONNX models are kept, one directory per model
+ONNX_MODEL_DIR = Path(os.getenv("ONNX_MODEL_DIR", "vector_store/onnx"))
+# Dynamic int8 quantization of the exported model's weights
+ONNX_QUANTIZE = os.getenv("ONNX_QUANTIZE", "1") == "1"
+ONNX_THREADS = int(os.getenv("ONNX_THREADS", "0"))
+# Batches are capped by padded token count rather than a fixed number of texts
+ONNX_MAX_BATCH_TOKENS = int(os.getenv("ONNX_MAX_BATCH_TOKENS", "8192"))
+ONNX_MAX_BATCH_SIZE = int(os.getenv("ONNX_MAX_BATCH_SIZE", "128"))
+# Sequence lengths are padded up to a multiple of this, so similar lengths share a shape
+LENGTH_BUCKET = 16
+ONNX_OPSET = 17
+
+
+def _model_dir(model_name: str) -> Path:
+    return ONNX_MODEL_DIR / model_name.replace("/", "__")
+
+def _st_config(snapshot: Path) -> Dict:
+    """Pooling, normalization and max length from the sentence-transformers module config."""
+    config = {"pooling": "mean", "normalize": False, "max_length": 512}
+    modules_file = snapshot / "modules.json"
+    if modules_file.exists():
+        for module in json.loads(modules_file.read_text()):
+            if module["type"].endswith("Normalize"):
+                config["normalize"] = True
+            if module["type"].endswith("Pooling"):
+                pooling = json.loads((snapshot / module["path"] / "config.json").read_text())
+                if pooling.get("pooling_mode_cls_token"):
+                    config["pooling"] = "cls"
+    st_file = snapshot / "sentence_bert_config.json"
+    if st_file.exists():
+        config["max_length"] = json.loads(st_file.read_text()).get("max_seq_length", config["max_length"])
+    return config
+
+def export_model(model_name: str, quantize: bool = ONNX_QUANTIZE) -> Path:
+    """
+    Export a sentence-transformers model's transformer to ONNX (and an int8
+    copy when `quantize`), next to its tokenizer and pooling config.
+    Returns the model directory. Torch is only needed here, not at inference.
+    """
+    import torch
+    from huggingface_hub import snapshot_download
+    from transformers import AutoModel, AutoTokenizer
+
+    out_dir = _model_dir(model_name)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    snapshot = Path(snapshot_download(model_name))
+    config = _st_config(snapshot)
+
+    tokenizer = AutoTokenizer.from_pretrained(model_name)
+    tokenizer.save_pretrained(out_dir)
+    model = AutoModel.from_pretrained(model_name).eval()
+    input_names = list(tokenizer.model_input_names)
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    dynamic = {"batch": 0, "sequence": 1}
+
+    logger.info(f"📦 Exporting {model_name} to ONNX → {out_dir}")
+    with torch.no_grad():
+        torch.onnx.export(
+            model,
+            tuple(sample[name] for name in input_names),
+            str(out_dir / "model.onnx"),
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes={**{name: dynamic for name in input_names}, "last_hidden_state": dynamic},
+            opset_version=ONNX_OPSET,
+        )
+    if quantize:
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+        logger.info("🗜️ Quantizing ONNX model to int8")
+        quantize_dynamic(str(out_dir / "model.onnx"), str(out_dir / "model.int8.onnx"), weight_type=QuantType.QInt8)
+    (out_dir / "embedder.json").write_text(json.dumps({**config, "model_name": model_name, "inputs": input_names}))
+    return out_dir
+
+
+class OnnxEmbeddings(Embeddings):
+    """
+    Sentence-transformer embeddings on onnxruntime (CPU), fp32 or int8.
+
+    Texts are tokenized once, sorted by length and grouped so each batch is
+    padded only to its own bucketed maximum and stays under
+    ONNX_MAX_BATCH_TOKENS; outputs are returned in the caller's order.
+    """
+
+    def __init__(self, model_name: str, quantized: bool = ONNX_QUANTIZE, threads: int = ONNX_THREADS):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        model_dir = _model_dir(model_name)
+        model_file = model_dir / ("model.int8.onnx" if quantized else "model.onnx")
+        if not model_file.exists():
+            export_model(model_name, quantize=quantized)
+
+        config = json.loads((model_dir / "embedder.json").read_text())
+        self.model_name = model_name
+        self.quantized = quantized
+        self.pooling = config["pooling"]
+        self.normalize = config["normalize"]
+        self.max_length = config["max_length"]
+        self.inputs = config["inputs"]
+
+        self.tokenizer = Tokenizer.from_file(str(model_dir / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=self.max_length)
+        self.tokenizer.no_padding()
+        self.pad_id = self.tokenizer.token_to_id("[PAD]") or 0
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(str(model_file), options, providers=["CPUExecutionProvider"])
+        logger.info(f"🔍 Loaded ONNX embedding model: {model_file} ({'int8' if quantized else 'fp32'})")
+
+    def _batches(self, lengths: np.ndarray) -> List[np.ndarray]:
+        """Group text indices by length so padding stays small and batches fit the token cap."""
+        order = np.argsort(-lengths, kind="stable")
+        batches, current, padded = [], [], 0
+        for i in order:
+            if not current:
+                padded = -(-int(lengths[i]) // LENGTH_BUCKET) * LENGTH_BUCKET
+            if current and (len(current) + 1 > ONNX_MAX_BATCH_SIZE or (len(current) + 1) * padded > ONNX_MAX_BATCH_TOKENS):
+                batches.append(np.asarray(current))
+                current = []
+                padded = -(-int(lengths[i]) // LENGTH_BUCKET) * LENGTH_BUCKET
+            current.append(i)
+        if current:
+            batches.append(np.asarray(current))
+        return batches
+
+    def _run(self, encodings: list) -> np.ndarray:
+        width = -(-max(len(e.ids) for e in encodings) // LENGTH_BUCKET) * LENGTH_BUCKET
+        input_ids = np.full((len(encodings), width), self.pad_id, dtype="int64")
+        attention = np.zeros((len(encodings), width), dtype="int64")
+        type_ids = np.zeros((len(encodings), width), dtype="int64")
+        for row, e in enumerate(encodings):
+            n = len(e.ids)
+            input_ids[row, :n] = e.ids
+            attention[row, :n] = 1
+            type_ids[row, :n] = e.type_ids
+        feeds = {"input_ids": input_ids, "attention_mask": attention, "token_type_ids": type_ids}
+        hidden = self.session.run(None, {name: feeds[name] for name in self.inputs})[0]
+
+        if self.pooling == "cls":
+            pooled = hidden[:, 0]
+        else:
+            mask = attention[:, :, None].astype("float32")
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        if self.normalize:
+            pooled = pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.astype("float32")
+
+    def embed_array(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype="float32")
+        encodings = self.tokenizer.encode_batch(texts)
+        lengths = np.fromiter((len(e.ids) for e in encodings), dtype="int64", count=len(encodings))
+        out: Optional[np.ndarray] = None
+        for batch in self._batches(lengths):
+            vectors = self._run([encodings[i] for i in batch])
+            if out is None:
+                out = np.empty((len(texts), vectors.shape[1]), dtype="float32")
+            out[batch] = vectors
+        return out
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed_array(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_array([text])[0].tolist()
+
+
+def verify_against_torch(model_name: str, texts: List[str], quantized: bool = ONNX_QUANTIZE) -> Dict:
+    """Compare ONNX embeddings with the torch backend on `texts`; returns cosine and abs-diff stats."""
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    reference = np.asarray(
+        HuggingFaceEmbeddings(model_name=model_name, model_kwargs={"device": "cpu"}).embed_documents(texts),
+        dtype="float32",
+    )
+    candidate = OnnxEmbeddings(model_name, quantized=quantized).embed_array(texts)
+    cosine = (reference * candidate).sum(axis=1) / (
+        np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1)
+    )
+    return {
+        "texts": len(texts),
+        "quantized": quantized,
+        "min_cosine": float(cosine.min()),
+        "mean_cosine": float(cosine.mean()),
+        "max_abs_diff": float(np.abs(reference - candidate).max()),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Export and check the ONNX embedding backend")
+    parser.add_argument("--model", default=os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L12-v2"))
+    parser.add_argument("--export", action="store_true", help="(Re-)export the model to ONNX")
+    parser.add_argument("--no-quantize", action="store_true", help="Check the fp32 model instead of int8")
+    parser.add_argument("--verify", action="store_true", help="Compare against the torch backend")
+    parser.add_argument("--min-cosine", type=float, default=None, help="Fail below this cosine (default 0.9999 fp32, 0.99 int8)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    quantized = not args.no_quantize
+    if args.export:
+        export_model(args.model, quantize=quantized)
+    if args.verify:
+        samples = [
+            "The contractor shall deliver the goods within thirty days of the order.",
+            "Case no. 12-cv-3456: the appeal is dismissed with costs.",
+            "Under 42 U.S.C. § 1983 the plaintiff seeks damages for the alleged violation.",
+            "Short text",
+            " ".join(["A much longer passage that exceeds the model's maximum sequence length."] * 40),
+        ]
+        report = verify_against_torch(args.model, samples, quantized=quantized)
+        print(json.dumps(report, indent=2))
+        threshold = args.min_cosine or (0.99 if quantized else 0.9999)
+        if report["min_cosine"] < threshold:
+            raise SystemExit(f"ONNX embeddings deviate from torch: min cosine {report['min_cosine']:.5f} < {threshold}")
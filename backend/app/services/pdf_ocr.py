@@ -1,25 +1,139 @@
 from ..config import TESSERACT_PATH
-from pdf2image import convert_from_path
+from pdf2image import convert_from_path, pdfinfo_from_path
+import pypdfium2 as pdfium
 import pytesseract, os
+import logging
+import threading
+import time
+from collections import deque
+from typing import Callable, List, Dict, Iterable, Iterator, Optional, Tuple
 
-pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+from . import ocr  # configures pytesseract.tesseract_cmd and owns the worker pool
+from .metrics import observe_stage, stage
 
-def ocr_pdf(file_path: str, poppler_path: str = None) -> str:
+logger = logging.getLogger(__name__)
+
+# Pages whose text layer has fewer usable characters than this are OCRed instead
+PDF_MIN_TEXT_CHARS = int(os.getenv("PDF_MIN_TEXT_CHARS", "25"))
+# Pages rendered/OCRed concurrently per document; bounds peak memory regardless of page count
+OCR_WINDOW_PAGES = int(os.getenv("OCR_WINDOW_PAGES", "0")) or 2 * ocr.OCR_WORKERS
+
+# PDFium is not thread-safe, even across separate documents; ingest workers and
+# background tasks take turns reading text layers
+_pdfium_lock = threading.Lock()
+
+def _usable_chars(text: str) -> int:
+    return sum(1 for ch in text if ch.isalnum())
+
+def _read_text_layer(file_path: str) -> List[str]:
+    """Return the embedded text of every page (empty string for image-only pages)."""
+    with _pdfium_lock:
+        pdf = pdfium.PdfDocument(str(file_path))
+        try:
+            texts = []
+            for i in range(len(pdf)):
+                page = pdf[i]
+                textpage = page.get_textpage()
+                try:
+                    texts.append(textpage.get_text_range() or "")
+                finally:
+                    textpage.close()
+                    page.close()
+            return texts
+        finally:
+            pdf.close()
+
+def _ocr_page(file_path: str, page_number: int, poppler_path: str = None) -> Tuple[str, float, float]:
+    """
+    Runs inside an OCR worker: render a single page and OCR it.
+    Returns (text, render seconds, OCR seconds); metrics are recorded by the parent.
+    """
+    started = time.perf_counter()
+    try:
+        images = convert_from_path(
+            file_path, dpi=300, poppler_path=poppler_path,
+            first_page=page_number, last_page=page_number
+        )
+    except Exception as e:
+        raise RuntimeError(f"PDF to image conversion failed: {e}")
+
+    rendered = time.perf_counter()
+    try:
+        text = "".join(pytesseract.image_to_string(img) for img in images)
+        return text, rendered - started, time.perf_counter() - rendered
+    except Exception as e:
+        raise RuntimeError(f"Tesseract OCR failed: {e}")
+
+def ocr_pages(
+    file_path: str,
+    page_numbers: Iterable[int],
+    poppler_path: str = None,
+    window: int = OCR_WINDOW_PAGES,
+) -> Iterator[Tuple[int, str]]:
+    """
+    Stream OCR results for the given pages in order. At most `window` pages are
+    rendered or OCRed at a time, spread across the OCR worker pool.
+    """
+    pool = ocr.get_ocr_pool()
+    numbers = iter(page_numbers)
+    pending = deque()
+
+    def submit_next():
+        page_number = next(numbers, None)
+        if page_number is not None:
+            pending.append((page_number, pool.submit(_ocr_page, str(file_path), page_number, poppler_path)))
+
+    for _ in range(max(1, window)):
+        submit_next()
+    while pending:
+        page_number, future = pending.popleft()
+        text, render_seconds, ocr_seconds = future.result()
+        observe_stage("pdf_render", render_seconds)
+        observe_stage("ocr_page", ocr_seconds)
+        submit_next()
+        yield page_number, text
+
+def extract_pdf_pages(
+    file_path: str,
+    poppler_path: str = None,
+    min_chars: int = PDF_MIN_TEXT_CHARS,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+) -> List[Dict]:
+    """
+    Hybrid extraction: read each page's native text layer and fall back to OCR
+    only for pages with no usable text. Each record reports which path was taken:
+    {"page_number": 1, "text": "...", "method": "text" | "ocr"}
+    `on_progress(pages_done, total_pages)` is called as pages complete.
+    """
     if not poppler_path:
         poppler_path = os.getenv("POPPLER_PATH")
 
     try:
-        pages = convert_from_path(file_path, dpi=300, poppler_path=poppler_path)
+        with stage("pdf_text_layer"):
+            layer = _read_text_layer(file_path)
     except Exception as e:
-        raise RuntimeError(f"PDF to image conversion failed: {e}")
+        logger.warning(f"⚠️ Could not read PDF text layer, OCRing every page: {e}")
+        page_count = pdfinfo_from_path(file_path, poppler_path=poppler_path)["Pages"]
+        layer = [""] * page_count
 
-    text = ""
-    for page in pages:
-        try:
-            page_text = pytesseract.image_to_string(page)
-            text += page_text + "\n\n"
-        except Exception as e:
-            raise RuntimeError(f"Tesseract OCR failed: {e}")
+    pages = [
+        {"page_number": i + 1, "text": text.strip(), "method": "text"}
+        for i, text in enumerate(layer)
+    ]
+    needs_ocr = [p["page_number"] for p in pages if _usable_chars(p["text"]) < min_chars]
+    done = len(pages) - len(needs_ocr)
+    if on_progress:
+        on_progress(done, len(pages))
+    for page_number, text in ocr_pages(file_path, needs_ocr, poppler_path):
+        pages[page_number - 1].update(text=text.strip(), method="ocr")
+        done += 1
+        if on_progress:
+            on_progress(done, len(pages))
 
-    return text.strip()
+    ocr_count = sum(1 for p in pages if p["method"] == "ocr")
+    logger.info(f"📑 {file_path}: {len(pages) - ocr_count} pages from text layer, {ocr_count} pages OCRed")
+    return pages
 
+def ocr_pdf(file_path: str, poppler_path: str = None) -> str:
+    pages = extract_pdf_pages(file_path, poppler_path)
+    return "\n\n".join(p["text"] for p in pages).strip()
@@ -0,0 +1,170 @@
+from concurrent.futures import Future
+from typing import Dict, List, Optional, Tuple
+import os
+import queue
+import threading
+import time
+import logging
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from .metrics import stage
+
+logger = logging.getLogger(__name__)
+
+# Micro-batching of concurrent query embeddings and their FAISS searches
+QUERY_BATCHING = os.getenv("QUERY_BATCHING", "1") == "1"
+QUERY_BATCH_MAX = int(os.getenv("QUERY_BATCH_MAX", "32"))
+# How long a batch waits for more queries; only applied while queries are arriving concurrently
+QUERY_BATCH_WAIT_MS = float(os.getenv("QUERY_BATCH_WAIT_MS", "2"))
+
+
+class _Request:
+    # k is None for requests that only need the question embedded
+    __slots__ = ("embedder", "question", "vector", "k", "nprobe", "ef_search", "future")
+
+    def __init__(self, embedder, question, vector, k, nprobe, ef_search):
+        self.embedder = embedder
+        self.question = question
+        self.vector = vector
+        self.k = k
+        self.nprobe = nprobe
+        self.ef_search = ef_search
+        self.future: Future = Future()
+
+
+def embed_queries(embedder: Embeddings, questions: List[str]) -> np.ndarray:
+    """Embed several questions in one forward pass when the embedder supports it."""
+    if hasattr(embedder, "embed_queries"):
+        return np.asarray(embedder.embed_queries(questions), dtype="float32")
+    return np.asarray([embedder.embed_query(q) for q in questions], dtype="float32")
+
+
+class QueryBatcher:
+    """
+    Collects queries arriving within a few milliseconds of each other, embeds the
+    questions in one forward pass and searches FAISS once per group of identical
+    search parameters, then resolves each caller's future with its own rows.
+    Queries with a per-request filter only join the embedding pass (see embed()).
+
+    When queries arrive one at a time the batch is processed immediately, so an
+    idle server does not pay the batching window.
+    """
+
+    def __init__(self, manager, max_batch: int = QUERY_BATCH_MAX, wait_ms: float = QUERY_BATCH_WAIT_MS):
+        self.manager = manager
+        self.max_batch = max_batch
+        self.wait = wait_ms / 1000
+        self.batches = 0
+        self.requests = 0
+        self._queue: "queue.Queue[_Request]" = queue.Queue()
+        self._last_batch = 1
+        self._thread = threading.Thread(target=self._loop, name="query-batcher", daemon=True)
+        self._thread.start()
+
+    def search(
+        self,
+        embedder: Embeddings,
+        question: str,
+        k: int,
+        query_vector: Optional[List[float]] = None,
+        nprobe: Optional[int] = None,
+        ef_search: Optional[int] = None,
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Embed (unless `query_vector` is given) and search; blocks until the batch containing it is done."""
+        vector = None if query_vector is None else np.asarray(query_vector, dtype="float32")
+        request = _Request(embedder, question, vector, k, nprobe, ef_search)
+        self._queue.put(request)
+        return request.future.result()
+
+    def embed(self, embedder: Embeddings, question: str) -> np.ndarray:
+        """Embed a question in the next batch without searching; blocks until it is embedded."""
+        request = _Request(embedder, question, None, None, None, None)
+        self._queue.put(request)
+        return request.future.result()
+
+    def _collect(self) -> List[_Request]:
+        batch = [self._queue.get()]
+        # Under load, give concurrent callers a moment to join; otherwise go right away
+        deadline = time.monotonic() + (self.wait if self._last_batch > 1 else 0)
+        while len(batch) < self.max_batch:
+            try:
+                remaining = deadline - time.monotonic()
+                batch.append(self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _loop(self):
+        while True:
+            batch = self._collect()
+            self._last_batch = len(batch)
+            self.batches += 1
+            self.requests += len(batch)
+            try:
+                self._process(batch)
+            except Exception as e:
+                for request in batch:
+                    if not request.future.done():
+                        request.future.set_exception(e)
+
+    def _process(self, batch: List[_Request]):
+        by_embedder: Dict[int, List[_Request]] = {}
+        for request in batch:
+            if request.vector is None:
+                by_embedder.setdefault(id(request.embedder), []).append(request)
+        for requests in by_embedder.values():
+            with stage("query_embed"):
+                vectors = embed_queries(requests[0].embedder, [r.question for r in requests])
+            for request, vector in zip(requests, vectors):
+                request.vector = vector
+
+        groups: Dict[tuple, List[_Request]] = {}
+        for request in batch:
+            if request.k is None:
+                request.future.set_result(request.vector)
+                continue
+            groups.setdefault((request.nprobe, request.ef_search, len(request.vector)), []).append(request)
+        for (nprobe, ef_search, _), requests in groups.items():
+            k = max(r.k for r in requests)
+            try:
+                with stage("search"):
+                    distances, ids = self.manager.search(
+                        np.stack([r.vector for r in requests]), k, nprobe=nprobe, ef_search=ef_search
+                    )
+            except Exception as e:
+                for request in requests:
+                    request.future.set_exception(e)
+                continue
+            for row, request in enumerate(requests):
+                request.future.set_result((distances[row:row + 1, :request.k], ids[row:row + 1, :request.k]))
+
+    def stats(self) -> Dict:
+        return {
+            "batches": self.batches,
+            "requests": self.requests,
+            "mean_batch_size": (self.requests / self.batches) if self.batches else 0.0,
+        }
+
+
+_batcher: Optional[QueryBatcher] = None
+_batcher_lock = threading.Lock()
+
+
+def get_query_batcher() -> QueryBatcher:
+    """The process-wide batcher; created under a lock so concurrent first queries share one thread and one set of stats."""
+    global _batcher
+    if _batcher is None:
+        with _batcher_lock:
+            if _batcher is None:
+                from .faiss_store import get_index_manager
+                _batcher = QueryBatcher(get_index_manager())
+    return _batcher
+
+
+def embed_query(embedder: Embeddings, question: str) -> List[float]:
+    """Embed one question, in a batch with concurrent queries when QUERY_BATCHING is on."""
+    if QUERY_BATCHING:
+        return get_query_batcher().embed(embedder, question).tolist()
+    return embedder.embed_query(question)
@@ -0,0 +1,121 @@
+from typing import Dict, List, Optional, Tuple
+import os
+import threading
+import time
+import logging
+
+from .metrics import stage
+
+logger = logging.getLogger(__name__)
+
+# Second-stage re-ranking of retrieved chunks with a CPU cross-encoder
+RERANK_ENABLED = os.getenv("RERANK_ENABLED", "0") == "1"
+RERANK_MODEL = os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2")
+# First-stage candidates scored per query
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "50"))
+RERANK_BATCH_SIZE = int(os.getenv("RERANK_BATCH_SIZE", "16"))
+RERANK_MAX_LENGTH = int(os.getenv("RERANK_MAX_LENGTH", "256"))
+# Hard wall-clock budget for scoring; candidates that do not fit keep their first-stage order
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", "200"))
+RERANK_THREADS = int(os.getenv("RERANK_THREADS", "0"))
+
+# Smoothing of the measured per-pair cost used to size the candidate set up front
+COST_SMOOTHING = 0.2
+
+
+_reranker = None
+_reranker_lock = threading.Lock()
+
+
+def get_reranker():
+    """
+    Process-wide cross-encoder, loaded on CPU on first use. Created under a lock:
+    warm-up and the first query may ask for it at the same time.
+    """
+    global _reranker
+    if _reranker is None:
+        with _reranker_lock:
+            if _reranker is None:
+                from sentence_transformers import CrossEncoder
+                import torch
+
+                if RERANK_THREADS:
+                    torch.set_num_threads(RERANK_THREADS)
+                logger.info(f"🔍 Loading re-ranking model: {RERANK_MODEL} on device: cpu")
+                _reranker = CrossEncoder(RERANK_MODEL, max_length=RERANK_MAX_LENGTH, device="cpu")
+    return _reranker
+
+
+class _CostModel:
+    """Running estimate of milliseconds per scored (question, chunk) pair."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.ms_per_pair: Optional[float] = None
+
+    def observe(self, pairs: int, elapsed_ms: float):
+        sample = elapsed_ms / pairs
+        with self._lock:
+            if self.ms_per_pair is None:
+                self.ms_per_pair = sample
+            else:
+                self.ms_per_pair += COST_SMOOTHING * (sample - self.ms_per_pair)
+
+    def affordable(self, budget_ms: float) -> Optional[int]:
+        with self._lock:
+            if self.ms_per_pair is None:
+                return None
+            return int(budget_ms / self.ms_per_pair)
+
+
+_cost = _CostModel()
+
+
+def rerank(
+    question: str,
+    candidates: List[Dict],
+    k: int,
+    budget_ms: float = RERANK_BUDGET_MS,
+    batch_size: int = RERANK_BATCH_SIZE,
+) -> Tuple[List[Dict], Dict]:
+    """
+    Re-order first-stage candidates (best first) by cross-encoder score and keep k.
+
+    Scoring stops before a batch that would overrun `budget_ms`; the candidate
+    set is also truncated up front to what the measured per-pair cost allows.
+    If fewer than k candidates can be scored, re-ranking is skipped and the
+    first-stage order is kept. Returns (chunks, info about what was done).
+    """
+    started = time.perf_counter()
+    info = {"candidates": len(candidates), "scored": 0, "skipped": None, "ms": 0.0}
+    if len(candidates) <= 1:
+        info["skipped"] = "too_few_candidates"
+        return candidates[:k], info
+
+    affordable = _cost.affordable(budget_ms)
+    if affordable is not None:
+        if affordable < min(k, len(candidates)):
+            info["skipped"] = "budget"
+            return candidates[:k], info
+        candidates = candidates[:max(affordable, k)]
+
+    model = get_reranker()
+    scores: List[float] = []
+    with stage("rerank"):
+        for start in range(0, len(candidates), batch_size):
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            batch = candidates[start:start + batch_size]
+            if scores and _cost.ms_per_pair is not None and elapsed_ms + len(batch) * _cost.ms_per_pair > budget_ms:
+                break
+            t0 = time.perf_counter()
+            scores.extend(float(s) for s in model.predict([(question, c["content"]) for c in batch], batch_size=batch_size))
+            _cost.observe(len(batch), (time.perf_counter() - t0) * 1000)
+
+    scored = sorted(
+        ({**c, "rerank_score": s} for c, s in zip(candidates, scores)),
+        key=lambda c: c["rerank_score"],
+        reverse=True,
+    )
+    info["scored"] = len(scores)
+    info["ms"] = round((time.perf_counter() - started) * 1000, 2)
+    return (scored + candidates[len(scores):])[:k], info
@@ -0,0 +1,173 @@
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Dict, Iterable, List, Optional, Tuple
+import contextvars
+import hashlib
+import heapq
+import os
+import threading
+import logging
+from pathlib import Path
+
+import numpy as np
+
+from .executors import get_shard_executor
+
+logger = logging.getLogger(__name__)
+
+# Optional per-document shards: small exact indexes searched instead of the global index
+# when a query is scoped to a few selected documents
+FAISS_SHARDS = os.getenv("FAISS_SHARDS", "0") == "1"
+# Scoped queries over more documents than this use the global index with an id filter instead
+SHARD_MAX_FANOUT = int(os.getenv("FAISS_SHARD_MAX_FANOUT", "64"))
+# Memory for loaded shards; the least recently used are evicted beyond it
+SHARD_CACHE_MB = float(os.getenv("FAISS_SHARD_CACHE_MB", "512"))
+
+
+class ShardStore:
+    """
+    One flat (exact) FAISS index per document, stored as <dir>/<key>.faiss with the
+    same vector ids as the global index. The index writer adds to a document's shard
+    when its chunks are indexed and removes it when the document is deleted.
+
+    Any worker loads shards on demand into an LRU bounded by bytes of vectors held;
+    a cached shard is revalidated against its file on every use, so shards rewritten
+    by the writer are picked up by the next query.
+    """
+
+    def __init__(self, directory: Path, cache_mb: float = SHARD_CACHE_MB):
+        self.dir = directory
+        self.cache_bytes = int(cache_mb * 1024 * 1024)
+        self._lock = threading.Lock()
+        # filename -> (index, (mtime_ns, size) of the file it was read from, bytes held)
+        self._cache: "OrderedDict[str, Tuple[object, Tuple[int, int], int]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _path(self, filename: str) -> Path:
+        return self.dir / f"{hashlib.sha1(filename.encode('utf-8')).hexdigest()[:24]}.faiss"
+
+    def exists(self) -> bool:
+        return self.dir.exists()
+
+    def write(self, filename: str, ids: np.ndarray, vectors: np.ndarray):
+        """Append vectors to a document's shard (creating it); the file is replaced atomically."""
+        import faiss
+
+        path = self._path(filename)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if path.exists():
+            index = faiss.read_index(str(path))
+        else:
+            index = faiss.IndexIDMap2(faiss.IndexFlatL2(vectors.shape[1]))
+        index.add_with_ids(np.ascontiguousarray(vectors, dtype="float32"), np.asarray(ids, dtype="int64"))
+        tmp_path = path.with_suffix(".faiss.tmp")
+        faiss.write_index(index, str(tmp_path))
+        os.replace(tmp_path, path)
+        self._drop(filename)
+
+    def remove(self, filename: str):
+        try:
+            self._path(filename).unlink()
+        except FileNotFoundError:
+            pass
+        self._drop(filename)
+
+    def _drop(self, filename: str):
+        with self._lock:
+            entry = self._cache.pop(filename, None)
+            if entry is not None:
+                self._bytes -= entry[2]
+
+    def _get(self, filename: str):
+        """The loaded shard of a document, or None if it has none."""
+        path = self._path(filename)
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            self._drop(filename)
+            return None
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            entry = self._cache.get(filename)
+            if entry is not None and entry[1] == stamp:
+                self._cache.move_to_end(filename)
+                self.hits += 1
+                return entry[0]
+
+        import faiss
+        try:
+            index = faiss.read_index(str(path))
+        except RuntimeError:
+            return None  # Removed between stat and read
+        size = index.ntotal * (index.d * 4 + 8)
+        with self._lock:
+            self.misses += 1
+            old = self._cache.pop(filename, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._cache[filename] = (index, stamp, size)
+            self._bytes += size
+            while self._bytes > self.cache_bytes and len(self._cache) > 1:
+                _, (_, _, evicted) = self._cache.popitem(last=False)
+                self._bytes -= evicted
+                self.evictions += 1
+        return index
+
+    def _search_one(self, filename: str, query_vectors: np.ndarray, k: int):
+        index = self._get(filename)
+        if index is None or index.ntotal == 0:
+            return 0, None, None
+        distances, ids = index.search(query_vectors, min(k, index.ntotal))
+        return index.ntotal, distances, ids
+
+    def search(
+        self, filenames: Iterable[str], query_vectors: np.ndarray, k: int, expected: int
+    ) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+        """
+        Search the shards of `filenames` in parallel and merge their top-k per query
+        with a heap. Returns None when the shards do not hold exactly `expected`
+        vectors (a shard is missing or mid-update), so the caller can fall back to
+        the global index.
+        """
+        filenames = list(filenames)
+        executor = get_shard_executor()
+        futures: List[Future] = [
+            executor.submit(contextvars.copy_context().run, self._search_one, f, query_vectors, k)
+            for f in filenames[1:]
+        ]
+        # The calling thread searches one shard itself instead of idling
+        results = [self._search_one(filenames[0], query_vectors, k)] + [f.result() for f in futures]
+        if sum(r[0] for r in results) != expected:
+            return None
+
+        out_d = np.full((len(query_vectors), k), np.inf, dtype="float32")
+        out_i = np.full((len(query_vectors), k), -1, dtype="int64")
+        for row in range(len(query_vectors)):
+            merged = heapq.nsmallest(k, (
+                (float(d), int(i))
+                for _, distances, ids in results if distances is not None
+                for d, i in zip(distances[row], ids[row]) if i != -1
+            ))
+            for col, (d, i) in enumerate(merged):
+                out_d[row, col], out_i[row, col] = d, i
+        return out_d, out_i
+
+    def build(self, groups: Dict[str, Tuple[np.ndarray, np.ndarray]]):
+        """(Re)create shards from {filename: (ids, vectors)}."""
+        for filename, (ids, vectors) in groups.items():
+            self.remove(filename)
+            self.write(filename, ids, vectors)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "loaded": len(self._cache),
+                "loaded_mb": round(self._bytes / 1024 / 1024, 2),
+                "cache_mb": round(self.cache_bytes / 1024 / 1024, 2),
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,187 @@
+from typing import AsyncIterator, Dict, List
+from functools import lru_cache
+import asyncio
+import math
+import os
+import random
+import logging
+
+from groq import RateLimitError
+
+from . import llm
+
+logger = logging.getLogger(__name__)
+
+# Prompt tokens allowed per LLM call (llama3-70b-8192: 8192 context - 2048 completion)
+SYNTH_PROMPT_TOKEN_BUDGET = int(os.getenv("SYNTH_PROMPT_TOKEN_BUDGET", "6000"))
+# Concurrent "map" calls, kept under the Groq rate limit
+SYNTH_MAP_CONCURRENCY = int(os.getenv("SYNTH_MAP_CONCURRENCY", "4"))
+SYNTH_MAP_MAX_TOKENS = int(os.getenv("SYNTH_MAP_MAX_TOKENS", "1024"))
+SYNTH_RATE_LIMIT_RETRIES = int(os.getenv("SYNTH_RATE_LIMIT_RETRIES", "4"))
+# Optional HuggingFace tokenizer matching the Groq model; otherwise tokens are estimated
+LLM_TOKENIZER = os.getenv("LLM_TOKENIZER", "")
+CHARS_PER_TOKEN = 3.5
+
+DOC_ANSWERS_HEADER = "📄 Document-Level Answers:"
+THEMES_HEADER = "💬 Synthesized Themes:"
+
+
+@lru_cache(maxsize=1)
+def _tokenizer():
+    if not LLM_TOKENIZER:
+        return None
+    try:
+        from tokenizers import Tokenizer
+        return Tokenizer.from_pretrained(LLM_TOKENIZER)
+    except Exception as e:
+        logger.warning(f"⚠️ Could not load tokenizer {LLM_TOKENIZER}, estimating token counts: {e}")
+        return None
+
+def count_tokens(text: str) -> int:
+    """Prompt tokens for `text`; a conservative character-based estimate without a tokenizer."""
+    tokenizer = _tokenizer()
+    if tokenizer is not None:
+        return len(tokenizer.encode(text).ids)
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+def _truncate_to_tokens(text: str, max_tokens: int) -> str:
+    if count_tokens(text) <= max_tokens:
+        return text
+    return text[:int(max_tokens * CHARS_PER_TOKEN)].rsplit(" ", 1)[0] + " …"
+
+def pack_batches(docs: List[Dict], budget: int) -> List[List[int]]:
+    """
+    Greedily pack document indices into batches whose formatted blocks fit the
+    token budget. A single oversized document gets a batch of its own (and is
+    truncated when the prompt is built).
+    """
+    batches, current, used = [], [], 0
+    for i, doc in enumerate(docs):
+        cost = count_tokens(llm.format_doc(i, doc))
+        if current and used + cost > budget:
+            batches.append(current)
+            current, used = [], 0
+        current.append(i)
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
+
+def _map_prompt(question: str, docs: List[Dict], indices: List[int], budget: int) -> str:
+    per_doc = max(64, budget // max(len(indices), 1))
+    blocks = "".join(
+        llm.format_doc(i, {**docs[i], "content": _truncate_to_tokens(docs[i]["content"], per_doc)})
+        for i in indices
+    )
+    return f"""
+You are an expert legal/technical summarizer.
+
+Question: {question}
+
+For EACH document below, extract a short answer to the question from that document only.
+Output exactly one line per document, in this format and nothing else:
+[DOC001]: [Extracted Answer] ([Citation])
+If a document does not address the question, write: [DOCxxx]: No relevant information ([Citation])
+
+### Documents:
+{blocks}
+"""
+
+def _reduce_prompt(question: str, doc_answers: str, instructions: str) -> str:
+    return f"""
+You are an expert legal/technical summarizer.
+
+Question: {question}
+
+Below are short answers extracted from individual documents, each tagged with its DOCXXX ID.
+Synthesize a few high-level themes, group the answers under these themes, and cite the documents using the 'DOCXXX' IDs where relevant.
+Output only the themes, strictly in this format:
+
+**Theme 1 – [Theme Title]**
+[Summary of this theme. Mention DOC001, DOC004 as support.]
+
+**Theme 2 – [Another Theme]**
+...
+
+### Document-Level Answers:
+{doc_answers}
+
+{instructions}
+
+Write clearly and concisely.
+"""
+
+async def _call_with_backoff(prompt: str, semaphore: asyncio.Semaphore, max_tokens: int) -> str:
+    """Completion under the shared semaphore, backing off further when Groq rate-limits us."""
+    for attempt in range(SYNTH_RATE_LIMIT_RETRIES + 1):
+        async with semaphore:
+            try:
+                return await llm.complete(prompt, max_tokens=max_tokens, temperature=0.3)
+            except RateLimitError as e:
+                if attempt == SYNTH_RATE_LIMIT_RETRIES:
+                    raise
+                retry_after = e.response.headers.get("retry-after") if e.response is not None else None
+                delay = float(retry_after) if retry_after else 2 ** attempt
+        logger.warning(f"⏳ Groq rate limit hit, retrying map call in {delay:.1f}s")
+        await asyncio.sleep(delay + random.uniform(0, 0.5))
+    raise RuntimeError("unreachable")
+
+def fits_single_prompt(question: str, docs: List[Dict], style: str, include_sources: bool, length: str) -> bool:
+    return count_tokens(llm.build_prompt(question, docs, style, include_sources, length)) <= SYNTH_PROMPT_TOKEN_BUDGET
+
+async def map_documents(question: str, docs: List[Dict]) -> str:
+    """Run the per-document extraction ("map") calls concurrently; returns the answer lines in DOC order."""
+    # Leave room for the instructions around the documents
+    doc_budget = SYNTH_PROMPT_TOKEN_BUDGET - count_tokens(_map_prompt(question, [], [], 0)) - 64
+    batches = pack_batches(docs, doc_budget)
+    logger.info(f"🗺️ Map-reduce synthesis: {len(docs)} documents in {len(batches)} map batches")
+
+    semaphore = asyncio.Semaphore(SYNTH_MAP_CONCURRENCY)
+    outputs = await asyncio.gather(*(
+        _call_with_backoff(_map_prompt(question, docs, batch, doc_budget), semaphore, SYNTH_MAP_MAX_TOKENS)
+        for batch in batches
+    ))
+
+    lines = []
+    for output in outputs:
+        lines.extend(line.strip() for line in output.splitlines() if line.strip().startswith("[DOC"))
+    lines.sort(key=lambda line: line[:8])
+    return "\n".join(lines)
+
+def _reduce_input(question: str, doc_answers: str, instructions: str) -> str:
+    overhead = count_tokens(_reduce_prompt(question, "", instructions))
+    return _truncate_to_tokens(doc_answers, SYNTH_PROMPT_TOKEN_BUDGET - overhead)
+
+async def synthesize(question: str, docs: List[Dict], style: str = "detailed", include_sources: bool = True, length: str = "long") -> str:
+    """
+    Structured answer for any number of retrieved chunks. Small sets use the
+    single-prompt path; larger ones are mapped in token-budgeted batches and
+    reduced into themes, with the same "📄 Document-Level Answers /
+    💬 Synthesized Themes" layout.
+    """
+    if fits_single_prompt(question, docs, style, include_sources, length):
+        return await llm.generate_structured_answer(question, docs, style, include_sources, length)
+
+    doc_answers = await map_documents(question, docs)
+    instructions = llm.build_instructions(style, include_sources, length)
+    themes = await llm.complete(_reduce_prompt(question, _reduce_input(question, doc_answers, instructions), instructions))
+    return f"{DOC_ANSWERS_HEADER}\n{doc_answers}\n\n{THEMES_HEADER}\n\n{_strip_header(themes)}"
+
+async def stream_synthesize(question: str, docs: List[Dict], style: str = "detailed", include_sources: bool = True, length: str = "long") -> AsyncIterator[str]:
+    """Streaming variant of synthesize: document-level answers arrive once mapped, themes stream token by token."""
+    if fits_single_prompt(question, docs, style, include_sources, length):
+        async for delta in llm.stream_structured_answer(question, docs, style, include_sources, length):
+            yield delta
+        return
+
+    doc_answers = await map_documents(question, docs)
+    yield f"{DOC_ANSWERS_HEADER}\n{doc_answers}\n\n{THEMES_HEADER}\n\n"
+    instructions = llm.build_instructions(style, include_sources, length)
+    async for delta in llm.stream_completion(_reduce_prompt(question, _reduce_input(question, doc_answers, instructions), instructions)):
+        yield delta
+
+def _strip_header(themes: str) -> str:
+    themes = themes.strip()
+    if themes.startswith(THEMES_HEADER):
+        themes = themes[len(THEMES_HEADER):].lstrip()
+    return themes
@@ -0,0 +1,73 @@
+from typing import Callable, Dict, List, Tuple
+import os
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Load the index and models in the background at startup instead of on the first request
+WARMUP_ENABLED = os.getenv("WARMUP_ENABLED", "1") == "1"
+
+_lock = threading.Lock()
+_state: Dict = {"status": "pending", "steps": {}, "error": None}
+_thread = None
+
+
+def _steps() -> List[Tuple[str, Callable[[], object]]]:
+    # Imported here: these modules are exactly what warm-up loads off the startup path
+    from .embedder import get_embedder
+    from .faiss_store import get_index_manager
+    from .reranker import RERANK_ENABLED, get_reranker
+
+    steps = [
+        ("index", lambda: get_index_manager().get()),
+        # A real forward pass, so lazy kernel/graph initialisation happens now too
+        ("embedder", lambda: get_embedder().embed_query("warm-up")),
+    ]
+    if RERANK_ENABLED:
+        steps.append(("reranker", lambda: get_reranker().predict([("warm-up", "warm-up")])))
+    return steps
+
+
+def _run():
+    started = time.perf_counter()
+    try:
+        for name, step in _steps():
+            t0 = time.perf_counter()
+            step()
+            with _lock:
+                _state["steps"][name] = round(time.perf_counter() - t0, 3)
+            logger.info(f"🔥 Warmed up {name} in {time.perf_counter() - t0:.2f}s")
+    except Exception as e:
+        logger.error(f"❌ Warm-up failed: {e}")
+        with _lock:
+            _state.update(status="failed", error=str(e))
+        return
+    with _lock:
+        _state.update(status="ready", seconds=round(time.perf_counter() - started, 3))
+    logger.info(f"✅ Ready after {time.perf_counter() - started:.2f}s of warm-up")
+
+
+def start():
+    """Start warm-up in a background thread (once); the server accepts requests meanwhile."""
+    global _thread
+    with _lock:
+        if _thread is not None:
+            return
+        if not WARMUP_ENABLED:
+            _state["status"] = "ready"
+            return
+        _state["status"] = "warming"
+        _thread = threading.Thread(target=_run, name="warmup", daemon=True)
+        _thread.start()
+
+
+def is_ready() -> bool:
+    with _lock:
+        return _state["status"] == "ready"
+
+
+def status() -> Dict:
+    with _lock:
+        return {**_state, "steps": dict(_state["steps"])}
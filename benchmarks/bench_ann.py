@@ -0,0 +1,99 @@
+"""
+Recall@k vs. latency of the approximate index types against the flat baseline.
+
+    python -m benchmarks.bench_ann --k 10 --queries 500
+
+Vectors come from the deployment's own index (FAISS_PATH) when it exists, so the
+numbers reflect our corpus; otherwise a synthetic corpus of --synthetic vectors
+is used. Queries are stored vectors with a little noise added.
+"""
+import argparse
+import json
+import time
+
+import faiss
+import numpy as np
+
+from backend.app.services import index_factory
+from backend.app.services.faiss_store import INDEX_PATH, _load_index, _read_current
+
+SWEEPS = {
+    "flat": [None],
+    "hnsw": [16, 32, 64, 128, 256],
+    "ivf_flat": [1, 4, 16, 64],
+    "ivf_pq": [1, 4, 16, 64],
+    "ivf_sq8": [1, 4, 16, 64],
+}
+
+
+def corpus(synthetic: int) -> np.ndarray:
+    _, path = _read_current(INDEX_PATH)
+    index, _ = _load_index(path, mmap=False)
+    if index is not None and index.ntotal:
+        _, vectors = index_factory.export_vectors(index)
+        print(f"Using {len(vectors)} vectors from {path}")
+        return vectors
+    print(f"No index at {INDEX_PATH}; using {synthetic} synthetic vectors")
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((256, 384)).astype("float32")
+    return (centers[rng.integers(0, 256, synthetic)] + 0.3 * rng.standard_normal((synthetic, 384))).astype("float32")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--synthetic", type=int, default=200_000)
+    parser.add_argument("--types", nargs="+", default=list(SWEEPS))
+    parser.add_argument("--out", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    vectors = corpus(args.synthetic)
+    ids = np.arange(len(vectors), dtype="int64")
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.choice(len(vectors), min(args.queries, len(vectors)), replace=False)]
+    queries = (queries + 0.05 * rng.standard_normal(queries.shape)).astype("float32")
+
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    _, truth = exact.search(queries, args.k)
+
+    results = []
+    for index_type in args.types:
+        if not index_factory.can_build(index_type, len(vectors)):
+            print(f"{index_type:<9} skipped: not enough vectors to train")
+            continue
+        t0 = time.perf_counter()
+        index = index_factory.build_index(index_type, vectors.shape[1], vectors)
+        index.add_with_ids(vectors, ids)
+        build_s = time.perf_counter() - t0
+
+        for value in SWEEPS[index_type]:
+            params = index_factory.search_params(index, nprobe=value, ef_search=value)
+            latencies = []
+            found = np.empty_like(truth)
+            for i, q in enumerate(queries):
+                start = time.perf_counter()
+                _, found[i:i + 1] = index.search(q[None, :], args.k, params=params)
+                latencies.append(time.perf_counter() - start)
+            recall = np.mean([len(set(f) & set(t)) / args.k for f, t in zip(found, truth)])
+            ms = np.asarray(latencies) * 1000
+            row = {
+                "index_type": index_type,
+                "param": value,
+                f"recall@{args.k}": round(float(recall), 4),
+                "p50_ms": round(float(np.percentile(ms, 50)), 3),
+                "p95_ms": round(float(np.percentile(ms, 95)), 3),
+                "build_s": round(build_s, 2),
+            }
+            results.append(row)
+            print(f"{index_type:<9} param={str(value):<5} recall@{args.k}={row[f'recall@{args.k}']:.3f} "
+                  f"p50={row['p50_ms']:.3f}ms p95={row['p95_ms']:.3f}ms build={build_s:.1f}s")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,179 @@
+"""
+Near-duplicate chunks: index size with and without ingest-time dedup (DEDUP_MODE=index),
+and retrieval diversity with and without query-time collapsing (DEDUP_MODE=query).
+
+    python -m benchmarks.bench_dedup --docs 200 --pages 10 --boilerplate 0.3
+    python -m benchmarks.bench_dedup --docs 200 --threshold 0.6 --out dedup.json
+
+Builds a synthetic corpus in a temporary directory: every page has unique body chunks
+plus, with probability --boilerplate per slot, one of a few shared disclaimers/footers
+that vary by document name and page number. Chunks are embedded with a seeded
+bag-of-words hash projection, so near-identical texts get near-identical vectors as
+with a real model, without loading one. Queries mix a boilerplate template with a
+body chunk, so the copies compete with distinct content for the top-k.
+"""
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+
+def _vocabulary(rng: np.random.Generator, size: int):
+    letters = np.array(list("abcdefghijklmnopqrstuvwxyz"))
+    return ["".join(rng.choice(letters, rng.integers(3, 10))) for _ in range(size)]
+
+
+class HashEmbedder:
+    """Sum of one seeded random vector per token, L2-normalised."""
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self._vectors = {}
+
+    def _token(self, token: str) -> np.ndarray:
+        vector = self._vectors.get(token)
+        if vector is None:
+            seed = int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest(), "little")
+            vector = self._vectors[token] = np.random.default_rng(seed).standard_normal(self.dim).astype("float32")
+        return vector
+
+    def embed(self, texts):
+        out = np.zeros((len(texts), self.dim), dtype="float32")
+        for row, text in enumerate(texts):
+            for token in text.split():
+                out[row] += self._token(token)
+            out[row] /= max(float(np.linalg.norm(out[row])), 1e-6)
+        return out
+
+
+def build_corpus(args, rng):
+    """[(filename, [(text, metadata)])]; metadata["group"] is the ground-truth near-duplicate group."""
+    vocab = _vocabulary(rng, 5000)
+    templates = [" ".join(rng.choice(vocab, args.chunk_words)) for _ in range(args.templates)]
+    corpus, body_id = [], 0
+    for doc in range(args.docs):
+        filename = f"doc_{doc:05d}.pdf"
+        chunks = []
+        for page in range(1, args.pages + 1):
+            for _ in range(args.chunks_per_page):
+                if rng.random() < args.boilerplate:
+                    t = int(rng.integers(len(templates)))
+                    text = f"{templates[t]} {filename} page {page} of {args.pages}"
+                    group = f"template_{t}"
+                else:
+                    text = " ".join(rng.choice(vocab, args.chunk_words))
+                    group = f"body_{body_id}"
+                    body_id += 1
+                chunks.append((text, {"filename": filename, "chunk_num": len(chunks), "page_number": page, "group": group}))
+        corpus.append((filename, chunks))
+    return corpus, templates
+
+
+def index_corpus(manager, embedder, corpus, dedup_ingest: bool):
+    from backend.app.services import dedup
+
+    stored, seconds = 0, 0.0
+    for filename, chunks in corpus:
+        if dedup_ingest:
+            t0 = time.perf_counter()
+            canonical = dedup.canonical_positions([text for text, _ in chunks])
+            seconds += time.perf_counter() - t0
+            chunks = [chunk for i, chunk in enumerate(chunks) if canonical[i] == i]
+        texts = [text for text, _ in chunks]
+        manager.add(embedder.embed(texts), texts, [dict(m) for _, m in chunks])
+        stored += len(chunks)
+    manager.flush()
+    return stored, seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=200)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--chunks-per-page", type=int, default=4)
+    parser.add_argument("--chunk-words", type=int, default=80)
+    parser.add_argument("--boilerplate", type=float, default=0.3, help="Fraction of chunks that are shared boilerplate")
+    parser.add_argument("--templates", type=int, default=8, help="Distinct boilerplate texts")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=8)
+    parser.add_argument("--threshold", type=float, help="DEDUP_THRESHOLD override")
+    parser.add_argument("--out", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="bench_dedup_"))
+    os.environ["FAISS_PATH"] = str(workdir / "faiss_index")
+    os.environ["QUERY_BATCHING"] = "0"
+    if args.threshold is not None:
+        os.environ["DEDUP_THRESHOLD"] = str(args.threshold)
+    # Imported after the environment is settled; the store reads it at import time
+    from backend.app.services import faiss_store, dedup
+
+    rng = np.random.default_rng(0)
+    embedder = HashEmbedder(args.dim)
+    corpus, templates = build_corpus(args, rng)
+    total = sum(len(chunks) for _, chunks in corpus)
+    print(f"Corpus: {args.docs} documents, {total} chunks, ~{args.boilerplate:.0%} boilerplate from {args.templates} templates")
+
+    # Index size: every chunk vs. chunks left after per-document near-duplicate removal
+    full = faiss_store.get_index_manager()
+    full_vectors, _ = index_corpus(full, embedder, corpus, dedup_ingest=False)
+    deduped = faiss_store.IndexManager(workdir / "dedup_index.faiss", workdir / "dedup_index.sqlite")
+    dedup_vectors, dedup_seconds = index_corpus(deduped, embedder, corpus, dedup_ingest=True)
+    full_bytes = faiss_store._read_current(full.path)[1].stat().st_size
+    dedup_bytes = faiss_store._read_current(deduped.path)[1].stat().st_size
+    result = {
+        "chunks": total,
+        "threshold": dedup.DEDUP_THRESHOLD,
+        "index.vectors_full": full_vectors,
+        "index.vectors_dedup": dedup_vectors,
+        "index.bytes_full": full_bytes,
+        "index.bytes_dedup": dedup_bytes,
+        "index.size_reduction": round(1 - dedup_bytes / full_bytes, 4),
+        "index.dedup_us_per_chunk": round(dedup_seconds / total * 1e6, 1),
+    }
+    print(f"Index: {full_vectors} vectors / {full_bytes / 1e6:.1f} MB → {dedup_vectors} vectors / {dedup_bytes / 1e6:.1f} MB "
+          f"({result['index.size_reduction']:.1%} smaller); dedup {result['index.dedup_us_per_chunk']:.0f} µs/chunk")
+
+    # Retrieval diversity on the full index: top-k with and without query-time collapsing
+    bodies = [text for _, chunks in corpus for text, m in chunks if m["group"].startswith("body_")]
+    questions = [
+        f"{templates[int(rng.integers(len(templates)))]} {bodies[int(rng.integers(len(bodies)))]}"
+        for _ in range(args.queries)
+    ]
+    vectors = embedder.embed(questions)
+    for name, collapse in (("off", False), ("collapse", True)):
+        returned, groups, duplicates, prompt_chars, latencies = [], [], [], [], []
+        for question, vector in zip(questions, vectors):
+            start = time.perf_counter()
+            hits = faiss_store.query_chunks(
+                None, question, k=args.k, query_vector=vector.tolist(), mode="dense", collapse_duplicates=collapse
+            )
+            latencies.append(time.perf_counter() - start)
+            distinct = len({h["metadata"]["group"] for h in hits})
+            returned.append(len(hits))
+            groups.append(distinct)
+            duplicates.append(len(hits) - distinct)
+            prompt_chars.append(sum(len(h["content"]) for h in hits))
+        ms = np.asarray(latencies) * 1000
+        result[f"query_{name}.returned"] = round(float(np.mean(returned)), 3)
+        result[f"query_{name}.distinct_groups"] = round(float(np.mean(groups)), 3)
+        result[f"query_{name}.duplicate_results"] = round(float(np.mean(duplicates)), 3)
+        result[f"query_{name}.prompt_chars"] = round(float(np.mean(prompt_chars)), 1)
+        result[f"query_{name}.p50_ms"] = round(float(np.percentile(ms, 50)), 3)
+        print(f"Query ({name:>8}): {result[f'query_{name}.returned']:.2f} returned, "
+              f"{result[f'query_{name}.distinct_groups']:.2f} distinct of k={args.k}, "
+              f"{result[f'query_{name}.duplicate_results']:.2f} duplicates, p50 {result[f'query_{name}.p50_ms']:.2f} ms")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
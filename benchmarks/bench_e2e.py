@@ -0,0 +1,357 @@
+"""
+End-to-end benchmark: ingest a synthetic corpus, then query it, both by calling the
+services directly and through the FastAPI app in-process (no network, no server).
+
+    python -m benchmarks.bench_e2e --size small --out e2e.json
+    python -m benchmarks.bench_e2e --size medium --baseline e2e.json
+
+Reports ingest pages/sec and chunks/sec per document kind, index load time (with and
+without mmap), peak RSS, and query QPS and p50/p95/p99 at several concurrency levels.
+Everything runs in a temporary directory (FAISS_PATH, JOBS_DB_PATH, EMBED_CACHE_PATH,
+uploads), so the deployment's own store is never touched. The Groq client is replaced
+by a local stub with a fixed time-to-first-token and token rate, so synthesis numbers
+measure this service rather than the LLM provider.
+
+Results are written as flat "section.metric" keys; --baseline compares against an
+earlier run and flags metrics that got worse by more than --tolerance percent.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import re
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Dict, List
+
+import numpy as np
+
+from .synthetic_corpus import generate, page_lines
+
+SIZES = {
+    "small": {"digital": 4, "scanned": 1, "images": 2, "pages": 5},
+    "medium": {"digital": 20, "scanned": 4, "images": 8, "pages": 10},
+    "large": {"digital": 100, "scanned": 10, "images": 20, "pages": 20},
+}
+# Metrics where a larger value is an improvement; everything else is a latency/size
+HIGHER_IS_BETTER = ("_per_sec", ".qps")
+
+
+class StubCompletions:
+    """Stands in for `AsyncGroq().chat.completions` with a deterministic answer."""
+
+    def __init__(self, ttft_ms: float, tokens_per_sec: float, answer_tokens: int):
+        self.ttft = ttft_ms / 1000
+        self.token_delay = 1 / tokens_per_sec
+        self.answer_tokens = answer_tokens
+        self.calls = 0
+
+    def _tokens(self, prompt: str) -> List[str]:
+        doc_ids = sorted(set(re.findall(r"DOC\d{3}", prompt))) or ["DOC001"]
+        lines = [f"[{d}]: The document addresses the question (Page 1, Chunk 0)\n" for d in doc_ids]
+        lines.append("**Theme 1 – Contractual obligations**\n")
+        words = " ".join(lines).split(" ")
+        filler = ["Supported", "by", "the", "cited", "documents."]
+        while len(words) < self.answer_tokens:
+            words.extend(filler)
+        return [w + " " for w in words[:max(self.answer_tokens, len(doc_ids))]]
+
+    async def create(self, messages, stream: bool = False, **kwargs):
+        self.calls += 1
+        tokens = self._tokens(messages[-1]["content"])
+        await asyncio.sleep(self.ttft)
+        if stream:
+            return self._stream(tokens)
+        await asyncio.sleep(self.token_delay * len(tokens))
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content="".join(tokens)))])
+
+    async def _stream(self, tokens: List[str]):
+        for token in tokens:
+            yield SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=token))])
+            await asyncio.sleep(self.token_delay)
+
+
+class StubGroq:
+    def __init__(self, ttft_ms: float, tokens_per_sec: float, answer_tokens: int):
+        self.chat = SimpleNamespace(completions=StubCompletions(ttft_ms, tokens_per_sec, answer_tokens))
+
+    async def close(self):
+        pass
+
+
+def peak_rss_mb() -> Dict[str, float]:
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    scale = 1 / 1024 / 1024 if sys.platform == "darwin" else 1 / 1024
+    return {
+        "self_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale, 1),
+        "children_mb": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * scale, 1),
+    }
+
+
+def latency_stats(latencies: List[float], elapsed: float) -> Dict[str, float]:
+    ms = np.asarray(latencies) * 1000
+    return {
+        "qps": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(float(np.percentile(ms, 50)), 2),
+        "p95_ms": round(float(np.percentile(ms, 95)), 2),
+        "p99_ms": round(float(np.percentile(ms, 99)), 2),
+    }
+
+
+def make_questions(count: int, seed: int) -> List[str]:
+    """Unique questions drawn from the corpus vocabulary, so no two hit the answer cache."""
+    rng = np.random.default_rng(seed + 1)
+    lines = page_lines(rng, lines=max(count, 1) * 2)
+    return [f"{line.rstrip('.')} (q{i})" for i, line in enumerate(lines[:count])]
+
+
+def ingest_direct(manifest: List[Dict]) -> Dict[str, float]:
+    from backend.app.services.faiss_store import get_index_manager
+    from backend.app.services.ingest import process_document
+
+    manager = get_index_manager()
+    per_kind: Dict[str, Dict[str, float]] = {}
+    started = time.perf_counter()
+    for entry in manifest:
+        before = manager.meta.count()
+        t0 = time.perf_counter()
+        path = Path(entry["path"])
+        process_document(path, entry["content_type"], path.name, chunk_size=500, chunk_overlap=100)
+        kind = per_kind.setdefault(entry["kind"], {"seconds": 0.0, "pages": 0, "chunks": 0})
+        kind["seconds"] += time.perf_counter() - t0
+        kind["pages"] += entry["pages"]
+        kind["chunks"] += manager.meta.count() - before
+    t0 = time.perf_counter()
+    manager.flush()
+    persist = time.perf_counter() - t0
+    elapsed = time.perf_counter() - started
+
+    results = {
+        "ingest.seconds": round(elapsed, 3),
+        "ingest.persist_s": round(persist, 3),
+        "ingest.pages_per_sec": round(sum(k["pages"] for k in per_kind.values()) / elapsed, 3),
+        "ingest.chunks_per_sec": round(sum(k["chunks"] for k in per_kind.values()) / elapsed, 3),
+        "ingest.chunks": sum(k["chunks"] for k in per_kind.values()),
+    }
+    for name, kind in per_kind.items():
+        results[f"ingest.{name}.pages_per_sec"] = round(kind["pages"] / kind["seconds"], 3)
+        results[f"ingest.{name}.chunks_per_sec"] = round(kind["chunks"] / kind["seconds"], 3)
+    return results
+
+
+def index_load() -> Dict[str, float]:
+    from backend.app.services.faiss_store import INDEX_PATH, META_PATH, IndexManager
+
+    results = {}
+    for mmap in (True, False):
+        t0 = time.perf_counter()
+        IndexManager(INDEX_PATH, META_PATH).reload(mmap=mmap)
+        results[f"index_load.{'mmap' if mmap else 'read'}_ms"] = round((time.perf_counter() - t0) * 1000, 2)
+    return results
+
+
+def query_direct(questions: List[str], levels: List[int], k: int) -> Dict[str, float]:
+    from backend.app.services.embedder import get_embedder
+    from backend.app.services.faiss_store import query_chunks
+
+    embedder = get_embedder()
+    query_chunks(embedder, "warm-up question", k=k)
+    results = {}
+    for concurrency in levels:
+        latencies = []
+
+        def one(question: str):
+            t0 = time.perf_counter()
+            query_chunks(embedder, question, k=k)
+            latencies.append(time.perf_counter() - t0)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(concurrency) as pool:
+            list(pool.map(one, [f"{q} c{concurrency}" for q in questions]))
+        for name, value in latency_stats(latencies, time.perf_counter() - started).items():
+            results[f"query_direct.c{concurrency}.{name}"] = value
+    return results
+
+
+async def query_api_level(client, questions: List[str], concurrency: int, k: int) -> Dict[str, float]:
+    latencies = []
+    errors = 0
+    pending = iter(questions)
+
+    async def worker():
+        nonlocal errors
+        for question in pending:
+            t0 = time.perf_counter()
+            resp = await client.get("/query", params={"q": question, "k": k})
+            latencies.append(time.perf_counter() - t0)
+            errors += resp.status_code != 200
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return {**latency_stats(latencies, time.perf_counter() - started), "errors": errors}
+
+
+async def run_api(args, manifest: List[Dict], questions: List[str], workdir: Path) -> Dict[str, float]:
+    import httpx
+    from backend.app import main as app_main
+    from backend.app.services.jobs import ACTIVE_STATUSES
+
+    app_main.UPLOAD_DIR = workdir / "uploads"
+    app_main.INCOMING_DIR = app_main.UPLOAD_DIR / ".incoming"
+    app_main.INCOMING_DIR.mkdir(parents=True, exist_ok=True)
+
+    results = {}
+    transport = httpx.ASGITransport(app=app_main.app)
+    async with app_main.app.router.lifespan_context(app_main.app):
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=600) as client:
+            if args.api_ingest:
+                # Re-ingests the corpus under new names through upload → job queue → worker
+                started = time.perf_counter()
+                for start in range(0, len(manifest), 8):
+                    files = [
+                        ("files", (f"api_{Path(m['path']).name}", Path(m["path"]).read_bytes(), m["content_type"]))
+                        for m in manifest[start:start + 8]
+                    ]
+                    resp = await client.post("/upload/batch", files=files)
+                    resp.raise_for_status()
+                while True:
+                    counts = (await client.get("/jobs", params={"limit": 1})).json()["counts"]
+                    # Retrying jobs are still pending; only done/failed/cancelled are final
+                    if not any(counts.get(status) for status in ACTIVE_STATUSES):
+                        break
+                    await asyncio.sleep(0.2)
+                elapsed = time.perf_counter() - started
+                results["api_ingest.seconds"] = round(elapsed, 3)
+                results["api_ingest.pages_per_sec"] = round(sum(m["pages"] for m in manifest) / elapsed, 3)
+                results["api_ingest.failed"] = counts.get("failed", 0)
+
+            pending = iter(questions[args.queries:])
+            for concurrency in args.concurrency:
+                level = await query_api_level(client, [next(pending) for _ in range(args.queries)], concurrency, args.k)
+                for name, value in level.items():
+                    results[f"query_api.c{concurrency}.{name}"] = value
+
+            resp = await client.get("/query", params={"q": questions[0], "k": args.k})
+            hits = resp.json().get("results", [])
+            latencies, ttfts = [], []
+            for i in range(args.synth_requests):
+                payload = {"question": f"{questions[0]} (synth {i})", "results": hits}
+                t0 = time.perf_counter()
+                (await client.post("/synthesize", json=payload)).raise_for_status()
+                latencies.append(time.perf_counter() - t0)
+
+                t0 = time.perf_counter()
+                async with client.stream("POST", "/synthesize/stream", json={**payload, "question": payload["question"] + " s"}) as stream:
+                    first = None
+                    async for line in stream.aiter_lines():
+                        if first is None and line.startswith("data:") and '"token"' in line:
+                            first = time.perf_counter() - t0
+                ttfts.append(first if first is not None else time.perf_counter() - t0)
+            if latencies:
+                ms, ttft_ms = np.asarray(latencies) * 1000, np.asarray(ttfts) * 1000
+                results["synthesize.p50_ms"] = round(float(np.percentile(ms, 50)), 2)
+                results["synthesize.p95_ms"] = round(float(np.percentile(ms, 95)), 2)
+                results["synthesize_stream.ttft_p50_ms"] = round(float(np.percentile(ttft_ms, 50)), 2)
+    return results
+
+
+def compare(current: Dict[str, float], baseline: Dict[str, float], tolerance: float) -> List[str]:
+    """Print a per-metric diff against a baseline; return the metrics that regressed."""
+    regressions = []
+    print(f"\n{'metric':<44} {'baseline':>12} {'current':>12} {'change':>9}")
+    for name in sorted(set(current) & set(baseline)):
+        old, new = baseline[name], current[name]
+        if not isinstance(old, (int, float)) or not isinstance(new, (int, float)) or not old:
+            continue
+        change = (new - old) / abs(old) * 100
+        better = change >= 0 if name.endswith(HIGHER_IS_BETTER) else change <= 0
+        flag = "" if better or abs(change) <= tolerance else "  REGRESSION"
+        if flag:
+            regressions.append(name)
+        print(f"{name:<44} {old:>12g} {new:>12g} {change:>+8.1f}%{flag}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", choices=sorted(SIZES), default="small")
+    parser.add_argument("--digital", type=int, help="Override the size preset")
+    parser.add_argument("--scanned", type=int, help="Override the size preset")
+    parser.add_argument("--images", type=int, help="Override the size preset")
+    parser.add_argument("--pages", type=int, help="Override the size preset")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=100, help="Queries per concurrency level")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--skip-api", action="store_true", help="Only drive the services directly")
+    parser.add_argument("--api-ingest", action="store_true", help="Also ingest the corpus through /upload/batch")
+    parser.add_argument("--synth-requests", type=int, default=10)
+    parser.add_argument("--llm-ttft-ms", type=float, default=150, help="Stub LLM time to first token")
+    parser.add_argument("--llm-tokens-per-sec", type=float, default=500, help="Stub LLM generation rate")
+    parser.add_argument("--llm-answer-tokens", type=int, default=200)
+    parser.add_argument("--workdir", type=Path, help="Keep the corpus and store here instead of a temp dir")
+    parser.add_argument("--out", help="Write results as JSON to this path")
+    parser.add_argument("--baseline", help="Earlier --out file to compare against")
+    parser.add_argument("--tolerance", type=float, default=10.0, help="Percent change allowed before flagging")
+    args = parser.parse_args()
+
+    sizes = {key: getattr(args, key) if getattr(args, key) is not None else value for key, value in SIZES[args.size].items()}
+    workdir = args.workdir or Path(tempfile.mkdtemp(prefix="bench_e2e_"))
+    os.environ["FAISS_PATH"] = str(workdir / "store" / "faiss_index")
+    os.environ["JOBS_DB_PATH"] = str(workdir / "store" / "jobs.sqlite")
+    os.environ["EMBED_CACHE_PATH"] = str(workdir / "store" / "embed_cache.sqlite")
+    (workdir / "store").mkdir(parents=True, exist_ok=True)
+
+    t0 = time.perf_counter()
+    manifest = generate(workdir / "corpus", seed=args.seed, **sizes)
+    print(f"Generated {len(manifest)} files ({sum(m['pages'] for m in manifest)} pages) in {time.perf_counter() - t0:.1f}s → {workdir}")
+
+    # Backend modules read their paths at import time, so import only after the env is set
+    from backend.app.services import llm
+    llm._client = StubGroq(args.llm_ttft_ms, args.llm_tokens_per_sec, args.llm_answer_tokens)
+
+    metrics: Dict[str, float] = {}
+    metrics.update(ingest_direct(manifest))
+    metrics.update({f"ingest.peak_rss_{k}": v for k, v in peak_rss_mb().items()})
+    print(f"Ingest: {metrics['ingest.pages_per_sec']} pages/s, {metrics['ingest.chunks_per_sec']} chunks/s")
+    metrics.update(index_load())
+
+    questions = make_questions(args.queries * (len(args.concurrency) + 1), args.seed)
+    metrics.update(query_direct(questions[:args.queries], args.concurrency, args.k))
+    if not args.skip_api:
+        metrics.update(asyncio.run(run_api(args, manifest, questions, workdir)))
+    metrics.update({f"peak_rss_{k}": v for k, v in peak_rss_mb().items()})
+
+    for name, value in metrics.items():
+        print(f"{name:<44} {value}")
+
+    if args.out:
+        report = {
+            "config": {**sizes, "size": args.size, "seed": args.seed, "k": args.k, "queries": args.queries,
+                       "concurrency": args.concurrency, "llm_ttft_ms": args.llm_ttft_ms,
+                       "llm_tokens_per_sec": args.llm_tokens_per_sec},
+            "environment": {"python": platform.python_version(), "platform": platform.platform(),
+                            "cpus": os.cpu_count(),
+                            "env": {k: v for k, v in os.environ.items() if k.startswith(("EMBEDDING_", "FAISS_", "QUERY_", "RETRIEVAL_", "RERANK_", "OCR_"))}},
+            "metrics": metrics,
+        }
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(metrics, baseline.get("metrics", baseline), args.tolerance)
+        if regressions:
+            print(f"\n{len(regressions)} metric(s) regressed by more than {args.tolerance:g}%")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
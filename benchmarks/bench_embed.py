@@ -0,0 +1,72 @@
+"""
+Ingest embedding throughput (chunks/sec) of the torch and ONNX (fp32 / int8) backends.
+
+    python -m backend.app.services.onnx_embedder --export        # once, exports fp32 + int8
+    python -m benchmarks.bench_embed --chunks 2000
+
+Chunk texts come from the deployment's own store (FAISS_PATH) when it has chunks,
+otherwise synthetic ~500-character chunks of varied length are used. The
+embedding cache is bypassed so every chunk is actually embedded.
+"""
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+WORDS = (
+    "agreement party contractor liability clause termination notice payment schedule warranty "
+    "court appeal plaintiff defendant judgment statute section damages breach remedy arbitration"
+).split()
+
+
+def load_chunks(n: int) -> list:
+    from backend.app.services.faiss_store import get_index_manager
+    rows = get_index_manager().meta.chunks_after(-1, limit=n)
+    if rows:
+        print(f"Using {len(rows)} chunks from the FAISS store")
+        return [text for _, text in rows]
+    rng = np.random.default_rng(0)
+    print(f"Using {n} synthetic chunks")
+    return [" ".join(rng.choice(WORDS, rng.integers(20, 100))) for _ in range(n)]
+
+
+def backends(names: list, model_name: str):
+    for name in names:
+        if name == "torch":
+            from backend.app.services.embedder import _load_model
+            yield name, _load_model(model_name)
+        else:
+            from backend.app.services.onnx_embedder import OnnxEmbeddings
+            yield name, OnnxEmbeddings(model_name, quantized=name == "onnx-int8")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--batch", type=int, default=256, help="Chunks per embed_documents call, as in ingest")
+    parser.add_argument("--backends", nargs="+", default=["torch", "onnx-fp32", "onnx-int8"])
+    parser.add_argument("--model", default=os.getenv("EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L12-v2"))
+    parser.add_argument("--out", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    chunks = load_chunks(args.chunks)
+    results = []
+    for name, model in backends(args.backends, args.model):
+        model.embed_documents(chunks[:32])  # warm-up
+        start = time.perf_counter()
+        for i in range(0, len(chunks), args.batch):
+            model.embed_documents(chunks[i:i + args.batch])
+        elapsed = time.perf_counter() - start
+        row = {"backend": name, "chunks": len(chunks), "seconds": round(elapsed, 3), "chunks_per_sec": round(len(chunks) / elapsed, 1)}
+        results.append(row)
+        print(f"{name:<10} {row['chunks_per_sec']:>8.1f} chunks/s ({elapsed:.2f}s)")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Latency and exact-token recall of hybrid (BM25 + FAISS, RRF) vs. dense-only retrieval.
+
+    python -m benchmarks.bench_hybrid --k 4 --queries 300
+    python -m benchmarks.bench_hybrid --synthetic 200000
+
+Uses the deployment's own store (FAISS_PATH) unless --synthetic is given, in which
+case a corpus of chunks carrying case numbers and statute citations is generated
+with random vectors in a temporary directory (dense recall is then meaningless,
+latency is not). Each query names an identifier from one chunk plus a few of its
+words; recall@k is the fraction of queries whose source chunk is returned.
+Query embedding is done up front and excluded, since it is identical for both modes.
+"""
+import argparse
+import json
+import os
+import re
+import tempfile
+import time
+
+import numpy as np
+
+WORDS = (
+    "agreement party contractor liability clause termination notice payment schedule warranty "
+    "court appeal plaintiff defendant judgment statute section damages breach remedy arbitration "
+    "jurisdiction evidence hearing order motion counsel claim dispute obligation delivery penalty"
+).split()
+
+
+def synthetic_chunks(n: int, rng: np.random.Generator) -> list:
+    chunks = []
+    for i in range(n):
+        words = " ".join(rng.choice(WORDS, 60))
+        case_no = f"{rng.integers(1, 25)}-cv-{i:06d}"
+        citation = f"{rng.integers(1, 50)} U.S.C. § {rng.integers(100, 9999)}"
+        chunks.append(f"In case no. {case_no}, under {citation}, the {words}.")
+    return chunks
+
+
+def make_queries(rows: list, count: int, rng: np.random.Generator) -> list:
+    """(source id, query text) pairs built around the most identifier-like token of a chunk."""
+    queries = []
+    for i in rng.choice(len(rows), min(count, len(rows)), replace=False):
+        doc_id, text = rows[i]
+        tokens = re.findall(r"[^\W_]+(?:[./:\-][^\W_]+)*", text)
+        if not tokens:
+            continue
+        ident = max(tokens, key=lambda t: (any(c.isdigit() for c in t), len(t)))
+        words = [t for t in tokens if t.isalpha()][:3]
+        queries.append((doc_id, f"{' '.join(words)} {ident}"))
+    return queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--synthetic", type=int, default=0, help="Generate this many chunks instead of using FAISS_PATH")
+    parser.add_argument("--modes", nargs="+", default=["dense", "lexical", "hybrid"])
+    parser.add_argument("--out", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    if args.synthetic:
+        os.environ["FAISS_PATH"] = os.path.join(tempfile.mkdtemp(prefix="bench_hybrid_"), "faiss_index")
+        os.environ["FAISS_PERSIST_DELAY"] = "0"
+
+    # Imported after FAISS_PATH is settled; the store reads it at import time
+    from backend.app.services import faiss_store
+
+    manager = faiss_store.get_index_manager()
+    if args.synthetic:
+        chunks = synthetic_chunks(args.synthetic, rng)
+        vectors = rng.standard_normal((len(chunks), 384)).astype("float32")
+        t0 = time.perf_counter()
+        for start in range(0, len(chunks), 10000):
+            batch = slice(start, start + 10000)
+            manager.add(vectors[batch], chunks[batch], [{"filename": "synthetic.pdf", "chunk_num": i} for i in range(start, start + len(chunks[batch]))])
+        manager.flush()
+        print(f"Indexed {len(chunks)} synthetic chunks in {time.perf_counter() - t0:.1f}s")
+        embed = lambda text: rng.standard_normal(384).astype("float32")
+    else:
+        from backend.app.services.embedder import get_embedder
+        embed = get_embedder().embed_query
+        print(f"Using {manager.meta.count()} chunks from {faiss_store.INDEX_PATH}")
+
+    rows = manager.meta.chunks_after(-1, limit=max(args.synthetic, 200_000))
+    texts = dict(rows)
+    queries = make_queries(rows, args.queries, rng)
+    vectors = [embed(text) for _, text in queries]
+    print(f"Lexical index: {manager.lexical.stats()}")
+
+    results = []
+    for mode in args.modes:
+        latencies, found = [], 0
+        for (source_id, text), vector in zip(queries, vectors):
+            start = time.perf_counter()
+            hits = faiss_store.query_chunks(None, text, k=args.k, query_vector=vector, mode=mode)
+            latencies.append(time.perf_counter() - start)
+            found += any(hit["content"] == texts[source_id] for hit in hits)
+        ms = np.asarray(latencies) * 1000
+        row = {
+            "mode": mode,
+            f"recall@{args.k}": round(found / max(len(queries), 1), 4),
+            "p50_ms": round(float(np.percentile(ms, 50)), 3),
+            "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        }
+        results.append(row)
+        print(f"{mode:<8} recall@{args.k}={row[f'recall@{args.k}']:.3f} p50={row['p50_ms']:.3f}ms p95={row['p95_ms']:.3f}ms")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""
+Compare cold-load time and RSS of the legacy pickled LangChain store against the
+native FAISS index file + SQLite sidecar.
+
+    python -m benchmarks.bench_index_store --sizes 10000 100000 1000000
+
+Each load is measured in a fresh subprocess so RSS numbers are not polluted by
+the builder process.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+DIM = 384
+CHUNK_TEXT = "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 8
+
+
+def _rss_mb() -> float:
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return 0.0
+
+
+def _vectors(n: int) -> np.ndarray:
+    rng = np.random.default_rng(0)
+    return rng.standard_normal((n, DIM), dtype=np.float32)
+
+
+def build_pickle(n: int, base: Path):
+    import pickle
+    import faiss
+    from langchain_community.docstore.in_memory import InMemoryDocstore
+    from langchain_community.vectorstores import FAISS
+    from langchain.docstore.document import Document
+
+    index = faiss.IndexFlatL2(DIM)
+    index.add(_vectors(n))
+    docs = {
+        str(i): Document(page_content=f"{i} {CHUNK_TEXT}", metadata={"filename": f"doc{i % 100}.pdf", "chunk_num": i, "page_number": i + 1})
+        for i in range(n)
+    }
+    vstore = FAISS(embedding_function=None, index=index, docstore=InMemoryDocstore(docs), index_to_docstore_id={i: str(i) for i in range(n)})
+    with open(base.with_suffix(".pkl"), "wb") as f:
+        pickle.dump(vstore, f)
+
+
+def build_native(n: int, base: Path):
+    import faiss
+    from backend.app.services.faiss_store import MetadataStore, _save_index
+
+    index = faiss.IndexIDMap2(faiss.IndexFlatL2(DIM))
+    ids = np.arange(n, dtype="int64")
+    index.add_with_ids(_vectors(n), ids)
+    _save_index(index, base.with_suffix(".faiss"))
+    meta = MetadataStore(base.with_suffix(".sqlite"))
+    batch = 50_000
+    for start in range(0, n, batch):
+        stop = min(n, start + batch)
+        meta.add(
+            list(range(start, stop)),
+            [f"{i} {CHUNK_TEXT}" for i in range(start, stop)],
+            [{"filename": f"doc{i % 100}.pdf", "chunk_num": i, "page_number": i + 1} for i in range(start, stop)],
+        )
+    meta.close()
+
+
+def load(kind: str, base: Path) -> dict:
+    """Runs inside the child process: load the store and answer one top-4 query."""
+    rss_before = _rss_mb()
+    query = _vectors(1)
+    t0 = time.perf_counter()
+    if kind == "pickle":
+        import pickle
+        with open(base.with_suffix(".pkl"), "rb") as f:
+            vstore = pickle.load(f)
+        load_s = time.perf_counter() - t0
+        _, idx = vstore.index.search(query, 4)
+        [vstore.docstore.search(vstore.index_to_docstore_id[i]) for i in idx[0]]
+    else:
+        from backend.app.services.faiss_store import MetadataStore, _load_index
+        index, _ = _load_index(base.with_suffix(".faiss"))
+        meta = MetadataStore(base.with_suffix(".sqlite"))
+        load_s = time.perf_counter() - t0
+        _, idx = index.search(query, 4)
+        meta.get([int(i) for i in idx[0]])
+    first_query_s = time.perf_counter() - t0
+    return {"load_s": load_s, "load_plus_first_query_s": first_query_s, "rss_mb": _rss_mb() - rss_before}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--child", choices=["pickle", "native"], help=argparse.SUPPRESS)
+    parser.add_argument("--base", type=Path, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(load(args.child, args.base)))
+        return
+
+    results = []
+    for n in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            base = Path(tmp) / "faiss_index"
+            build_pickle(n, base)
+            build_native(n, base)
+            for kind in ("pickle", "native"):
+                out = subprocess.run(
+                    [sys.executable, "-m", "benchmarks.bench_index_store", "--child", kind, "--base", str(base)],
+                    check=True, capture_output=True, text=True, env=os.environ.copy(),
+                )
+                row = {"chunks": n, "store": kind, **json.loads(out.stdout.strip().splitlines()[-1])}
+                results.append(row)
+                print(f"{n:>9} {kind:<7} load={row['load_s']:.3f}s first_query={row['load_plus_first_query_s']:.3f}s rss=+{row['rss_mb']:.1f}MB")
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Added latency of cross-encoder re-ranking on top of first-stage retrieval.
+
+    python -m benchmarks.bench_rerank --candidates 10 25 50 --budget-ms 200
+
+Candidates come from the deployment's own store (FAISS_PATH) when it has chunks;
+otherwise synthetic ~500-character passages are scored, which is what the
+cross-encoder cost depends on. Reports p50/p95 of the first stage and of the
+re-ranking step, and how often the budget truncated or skipped re-ranking.
+"""
+import argparse
+import json
+import time
+
+import numpy as np
+
+from backend.app.services import reranker
+
+QUESTIONS = [
+    "What are the obligations of the contractor?",
+    "Summarize the termination clause",
+    "Which penalties apply for late delivery?",
+    "Who are the parties to the agreement?",
+    "What is the governing law?",
+    "Describe the payment schedule",
+    "What warranties are given?",
+    "How are disputes resolved?",
+]
+
+
+def first_stage(question: str, n: int, use_store: bool, rng: np.random.Generator) -> list:
+    if use_store:
+        from backend.app.services.embedder import get_embedder
+        from backend.app.services.faiss_store import query_chunks
+        return query_chunks(get_embedder(), question, k=n)
+    words = question.lower().split() + "the court held that party shall notice payment within days".split()
+    return [{"content": " ".join(rng.choice(words, 90)), "metadata": {}} for _ in range(n)]
+
+
+def pct(values: list, q: int) -> float:
+    return round(float(np.percentile(np.asarray(values) * 1000, q)), 2) if values else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--candidates", type=int, nargs="+", default=[10, 25, 50])
+    parser.add_argument("--budget-ms", type=float, default=reranker.RERANK_BUDGET_MS)
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--out", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    from backend.app.services.faiss_store import get_index_manager
+    use_store = get_index_manager().meta.count() > 0
+    print(f"Candidates from {'the FAISS store' if use_store else 'synthetic passages'}; budget {args.budget_ms:.0f} ms")
+
+    rng = np.random.default_rng(0)
+    reranker.rerank(QUESTIONS[0], first_stage(QUESTIONS[0], 8, use_store, rng), args.k, budget_ms=1e9)  # load + warm up
+
+    results = []
+    for n in args.candidates:
+        retrieval, rerank_times, truncated, skipped = [], [], 0, 0
+        for i in range(args.queries):
+            question = QUESTIONS[i % len(QUESTIONS)]
+            start = time.perf_counter()
+            candidates = first_stage(question, n, use_store, rng)
+            retrieval.append(time.perf_counter() - start)
+
+            start = time.perf_counter()
+            _, info = reranker.rerank(question, candidates, args.k, budget_ms=args.budget_ms)
+            rerank_times.append(time.perf_counter() - start)
+            skipped += info["skipped"] == "budget"
+            truncated += 0 < info["scored"] < info["candidates"]
+
+        row = {
+            "candidates": n,
+            "budget_ms": args.budget_ms,
+            "first_stage_p50_ms": pct(retrieval, 50),
+            "first_stage_p95_ms": pct(retrieval, 95),
+            "rerank_p50_ms": pct(rerank_times, 50),
+            "rerank_p95_ms": pct(rerank_times, 95),
+            "truncated": truncated / args.queries,
+            "skipped": skipped / args.queries,
+        }
+        results.append(row)
+        print(f"candidates={n:<4} first stage p50={row['first_stage_p50_ms']}ms p95={row['first_stage_p95_ms']}ms | "
+              f"+rerank p50={row['rerank_p50_ms']}ms p95={row['rerank_p95_ms']}ms "
+              f"truncated={row['truncated']:.0%} skipped={row['skipped']:.0%}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
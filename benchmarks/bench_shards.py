@@ -0,0 +1,80 @@
+"""
+Scoped-query latency: per-document shards (FAISS_SHARDS=1) vs. the global index with
+an id filter, for queries restricted to a few selected documents.
+
+    python -m benchmarks.bench_shards --docs 1000 --chunks-per-doc 100 --selected 1 4 16
+    FAISS_INDEX_TYPE=hnsw python -m benchmarks.bench_shards --docs 1000 --selected 4
+
+Builds a synthetic store of random vectors in a temporary directory. Queries pick
+random documents; the first pass over the shards loads them from disk (cold), the
+second hits the LRU (warm). Query embedding is excluded.
+"""
+import argparse
+import json
+import os
+import tempfile
+import time
+
+import numpy as np
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=1000)
+    parser.add_argument("--chunks-per-doc", type=int, default=100)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--selected", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=20)
+    parser.add_argument("--out", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    os.environ["FAISS_PATH"] = os.path.join(tempfile.mkdtemp(prefix="bench_shards_"), "faiss_index")
+    os.environ["FAISS_SHARDS"] = "1"
+    # Imported after the environment is settled; the store reads it at import time
+    from backend.app.services import faiss_store
+
+    rng = np.random.default_rng(0)
+    manager = faiss_store.get_index_manager()
+    t0 = time.perf_counter()
+    for doc in range(args.docs):
+        vectors = rng.standard_normal((args.chunks_per_doc, args.dim)).astype("float32")
+        filename = f"doc_{doc:05d}.pdf"
+        manager.add(vectors, [f"{filename} chunk {i}" for i in range(len(vectors))],
+                    [{"filename": filename, "chunk_num": i} for i in range(len(vectors))])
+    manager.flush()
+    print(f"Indexed {args.docs} documents × {args.chunks_per_doc} chunks in {time.perf_counter() - t0:.1f}s")
+
+    results = []
+    for selected in args.selected:
+        picks = [[f"doc_{d:05d}.pdf" for d in rng.choice(args.docs, selected, replace=False)] for _ in range(args.queries)]
+        vectors = rng.standard_normal((args.queries, 1, args.dim)).astype("float32")
+        allowed = [manager.meta.ids_for_filenames(names) for names in picks]
+        row = {"selected": selected}
+        for name, search in (
+            ("global", lambda i: manager.search(vectors[i], args.k, ids=allowed[i])),
+            ("shards_cold", lambda i: manager.shards.search(picks[i], vectors[i], args.k, expected=len(allowed[i]))),
+            ("shards_warm", lambda i: manager.shards.search(picks[i], vectors[i], args.k, expected=len(allowed[i]))),
+        ):
+            latencies = []
+            for i in range(args.queries):
+                start = time.perf_counter()
+                search(i)
+                latencies.append(time.perf_counter() - start)
+            ms = np.asarray(latencies) * 1000
+            row[f"{name}_p50_ms"] = round(float(np.percentile(ms, 50)), 3)
+            row[f"{name}_p95_ms"] = round(float(np.percentile(ms, 95)), 3)
+        results.append(row)
+        print(
+            f"{selected:>3} docs: global p50={row['global_p50_ms']:.3f}ms  "
+            f"shards cold p50={row['shards_cold_p50_ms']:.3f}ms  warm p50={row['shards_warm_p50_ms']:.3f}ms"
+        )
+    print(f"Shard cache: {manager.shards.stats()}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
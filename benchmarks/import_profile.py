@@ -0,0 +1,111 @@
+"""
+Import-time profile of the backend: how long `import backend.app.main` takes in a fresh
+interpreter, which top-level packages dominate it (from `python -X importtime`), and
+which heavy dependencies were pulled in at import rather than on first use.
+
+    python -m benchmarks.import_profile --out import_after.json
+    python -m benchmarks.import_profile --baseline import_before.json
+
+For a "before" profile, run it on a checkout of an earlier commit with --out.
+"""
+import argparse
+import json
+import re
+import statistics
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+ROOT = Path(__file__).resolve().parent.parent
+# Dependencies that should only be imported when first needed (model load, ingestion, index load)
+HEAVY = (
+    "torch", "sentence_transformers", "transformers", "langchain", "langchain_huggingface",
+    "langchain_text_splitters", "faiss", "onnxruntime", "pytesseract", "pdf2image", "pypdfium2",
+)
+LINE = re.compile(r"^import time:\s+(\d+) \|\s+\d+ \| +(\S+)")
+
+
+def profile_once(module: str) -> Tuple[float, List[str], str]:
+    """Import `module` in a new interpreter; returns (wall seconds, heavy modules loaded, importtime log)."""
+    code = (
+        "import json, sys, time\n"
+        "t0 = time.perf_counter()\n"
+        f"import {module}\n"
+        "elapsed = time.perf_counter() - t0\n"
+        f"print(json.dumps([elapsed, sorted(m for m in {HEAVY!r} if m in sys.modules)]))\n"
+    )
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", code], capture_output=True, text=True, cwd=ROOT)
+    if proc.returncode:
+        sys.exit(f"Importing {module} failed:\n{proc.stderr[-3000:]}")
+    elapsed, heavy = json.loads(proc.stdout.strip().splitlines()[-1])
+    return elapsed, heavy, proc.stderr
+
+
+def parse_importtime(log: str) -> Tuple[Dict[str, float], List[Tuple[str, float]]]:
+    """ms per top-level package (sum of its modules' self times), and (module, self ms) for every import."""
+    packages: Dict[str, float] = {}
+    modules = []
+    for line in log.splitlines():
+        match = LINE.match(line)
+        if not match:
+            continue
+        self_us, name = int(match[1]), match[2]
+        modules.append((name, self_us / 1000))
+        # Self times never overlap, so they add up per package without double counting
+        root = name.split(".")[0]
+        packages[root] = packages.get(root, 0.0) + self_us / 1000
+    return packages, modules
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="backend.app.main")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters; the median wall time is reported")
+    parser.add_argument("--top", type=int, default=20)
+    parser.add_argument("--out", help="Write results as JSON to this path")
+    parser.add_argument("--baseline", help="Earlier --out file to compare against")
+    args = parser.parse_args()
+
+    walls, profiles = [], []
+    for _ in range(args.runs):
+        elapsed, heavy, log = profile_once(args.module)
+        walls.append(elapsed)
+        profiles.append(parse_importtime(log))
+    # Report the per-package breakdown of the median run
+    median_run = sorted(range(args.runs), key=lambda i: walls[i])[args.runs // 2]
+    packages, modules = profiles[median_run]
+
+    result = {
+        "module": args.module,
+        "python": sys.version.split()[0],
+        "wall_s": round(statistics.median(walls), 4),
+        "wall_s_runs": [round(w, 4) for w in walls],
+        "heavy_imported": heavy,
+        "packages_ms": {name: round(ms, 1) for name, ms in sorted(packages.items(), key=lambda kv: -kv[1])[:args.top]},
+        "slowest_modules_self_ms": {name: round(ms, 1) for name, ms in sorted(modules, key=lambda m: -m[1])[:args.top]},
+    }
+
+    print(f"import {args.module}: {result['wall_s'] * 1000:.0f} ms (median of {args.runs})")
+    print(f"heavy dependencies imported eagerly: {', '.join(heavy) or 'none'}")
+    print(f"\n{'package':<32} {'self ms':>14}")
+    for name, ms in result["packages_ms"].items():
+        print(f"{name:<32} {ms:>14.1f}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        print(f"\nwall: {baseline['wall_s'] * 1000:.0f} ms → {result['wall_s'] * 1000:.0f} ms")
+        print(f"heavy: {', '.join(baseline['heavy_imported']) or 'none'} → {', '.join(heavy) or 'none'}")
+        print(f"\n{'package':<32} {'baseline ms':>12} {'current ms':>12}")
+        for name in sorted(set(baseline["packages_ms"]) | set(result["packages_ms"]),
+                           key=lambda n: -max(baseline["packages_ms"].get(n, 0), result["packages_ms"].get(n, 0))):
+            print(f"{name:<32} {baseline['packages_ms'].get(name, 0):>12.1f} {result['packages_ms'].get(name, 0):>12.1f}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(result, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""
+Concurrent load test for /query: throughput and latency at increasing concurrency.
+
+    uvicorn backend.app.main:app --workers 1 &
+    python -m benchmarks.load_test_query --concurrency 1 2 4 8 16 --requests 200
+
+With a non-blocking server, QPS should grow with concurrency until the search
+executor's cores are saturated, instead of staying flat.
+
+To measure query micro-batching, run the server once with QUERY_BATCHING=0 and
+once with the default, passing --unique so every request misses the answer cache:
+
+    python -m benchmarks.load_test_query --unique --concurrency 1 8 32
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+import numpy as np
+
+QUESTIONS = [
+    "What are the obligations of the contractor?",
+    "Summarize the termination clause",
+    "Which penalties apply for late delivery?",
+    "Who are the parties to the agreement?",
+    "What is the governing law?",
+    "Describe the payment schedule",
+    "What warranties are given?",
+    "How are disputes resolved?",
+]
+
+
+async def run_level(client: httpx.AsyncClient, concurrency: int, total: int, params: dict, unique: bool = False) -> dict:
+    latencies = []
+    errors = 0
+    counter = iter(range(total))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            question = QUESTIONS[i % len(QUESTIONS)]
+            if unique:
+                question = f"{question} (request {concurrency}-{i})"
+            resp = await client.get("/query", params={"q": question, **params})
+            latencies.append(time.perf_counter() - start)
+            if resp.status_code != 200:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    ms = np.asarray(latencies) * 1000
+    return {
+        "concurrency": concurrency,
+        "requests": total,
+        "errors": errors,
+        "qps": round(total / elapsed, 2),
+        "p50_ms": round(float(np.percentile(ms, 50)), 1),
+        "p95_ms": round(float(np.percentile(ms, 95)), 1),
+        "p99_ms": round(float(np.percentile(ms, 99)), 1),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--docs", help="Comma-separated document filter")
+    parser.add_argument("--unique", action="store_true", help="Make every question distinct to bypass the answer cache")
+    parser.add_argument("--out", help="Write results as JSON to this path")
+    args = parser.parse_args()
+
+    params = {"k": args.k}
+    if args.docs:
+        params["docs"] = args.docs
+    limits = httpx.Limits(max_connections=max(args.concurrency))
+    async with httpx.AsyncClient(base_url=args.url, timeout=120, limits=limits) as client:
+        await client.get("/query", params={"q": "warm up", **params})
+        results = []
+        for level in args.concurrency:
+            row = await run_level(client, level, args.requests, params, args.unique)
+            results.append(row)
+            print(f"c={level:<3} qps={row['qps']:<8} p50={row['p50_ms']}ms p95={row['p95_ms']}ms p99={row['p99_ms']}ms errors={row['errors']}")
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
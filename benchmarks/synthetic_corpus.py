@@ -0,0 +1,144 @@
+"""
+Reproducible synthetic corpus for the benchmarks: digital PDFs (with a text
+layer), scanned PDFs (page images only, so every page goes through OCR) and
+PNG images, filled with legal-style prose, case numbers and citations.
+
+    python -m benchmarks.synthetic_corpus --out /tmp/corpus --digital 5 --scanned 2 --images 3 --pages 10
+
+The same seed always yields byte-identical files.
+"""
+import argparse
+import json
+import textwrap
+import time
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+SUBJECTS = ["The contractor", "The plaintiff", "The defendant", "The court", "Each party", "The supplier", "The tribunal", "The licensee"]
+VERBS = ["shall deliver", "has breached", "may terminate", "must notify", "is liable for", "disputes", "shall indemnify", "has waived"]
+OBJECTS = [
+    "the goods described in Schedule A", "the payment schedule", "all confidential information",
+    "the warranty obligations", "damages arising from late delivery", "the arbitration clause",
+    "the governing law provision", "any claim under this agreement",
+]
+QUALIFIERS = [
+    "within thirty days of written notice", "subject to clause 14.2", "without prejudice to other remedies",
+    "as determined by the arbitrator", "notwithstanding any prior agreement", "to the extent permitted by law",
+]
+LINE_CHARS = 90
+LINES_PER_PAGE = 48
+# Scanned pages are rendered at this resolution (A4)
+SCAN_DPI = 150
+# PDF timestamps are pinned so repeated runs produce identical bytes
+FIXED_DATE = time.gmtime(1704067200)
+
+
+def _sentence(rng: np.random.Generator) -> str:
+    sentence = f"{rng.choice(SUBJECTS)} {rng.choice(VERBS)} {rng.choice(OBJECTS)} {rng.choice(QUALIFIERS)}."
+    roll = rng.random()
+    if roll < 0.15:
+        sentence += f" See case no. {rng.integers(1, 25)}-cv-{rng.integers(1000, 99999)}."
+    elif roll < 0.25:
+        sentence += f" Under {rng.integers(1, 50)} U.S.C. {rng.integers(100, 9999)}, relief is available."
+    return sentence
+
+def page_lines(rng: np.random.Generator, lines: int = LINES_PER_PAGE) -> List[str]:
+    text = " ".join(_sentence(rng) for _ in range(lines))
+    return textwrap.wrap(text, LINE_CHARS)[:lines]
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+def write_text_pdf(path: Path, pages: List[List[str]]):
+    """Minimal PDF with a real text layer (Helvetica, one text object per page)."""
+    objects: Dict[int, bytes] = {
+        1: b"<< /Type /Catalog /Pages 2 0 R >>",
+        3: b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+    }
+    kids = []
+    for i, lines in enumerate(pages):
+        page_id, content_id = 4 + 2 * i, 5 + 2 * i
+        kids.append(f"{page_id} 0 R")
+        stream = ("BT /F1 10 Tf 14 TL 50 800 Td " + " ".join(f"({_pdf_escape(l)}) '" for l in lines) + " ET").encode("latin-1")
+        objects[page_id] = (
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {content_id} 0 R >>"
+        ).encode()
+        objects[content_id] = f"<< /Length {len(stream)} >>\nstream\n".encode() + stream + b"\nendstream"
+    objects[2] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {len(pages)} >>".encode()
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = {}
+    for obj_id in sorted(objects):
+        offsets[obj_id] = len(out)
+        out += f"{obj_id} 0 obj\n".encode() + objects[obj_id] + b"\nendobj\n"
+    xref = len(out)
+    count = max(objects) + 1
+    out += f"xref\n0 {count}\n0000000000 65535 f \n".encode()
+    for obj_id in range(1, count):
+        out += f"{offsets[obj_id]:010d} 00000 n \n".encode()
+    out += f"trailer\n<< /Size {count} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    path.write_bytes(bytes(out))
+
+
+def _font(size: int):
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:  # Pillow without FreeType sizing
+        return ImageFont.load_default()
+
+def render_page(lines: List[str]) -> Image.Image:
+    """A page as a grayscale scan, text only (no text layer)."""
+    width, height = int(8.27 * SCAN_DPI), int(11.69 * SCAN_DPI)
+    image = Image.new("L", (width, height), 255)
+    draw = ImageDraw.Draw(image)
+    font = _font(20)
+    for row, line in enumerate(lines):
+        draw.text((70, 80 + row * 32), line, fill=0, font=font)
+    return image
+
+
+def generate(out_dir: Path, digital: int, scanned: int, images: int, pages: int, seed: int = 0) -> List[Dict]:
+    """Write the corpus and return a manifest of {path, content_type, kind, pages}."""
+    out_dir.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    manifest = []
+    for i in range(digital):
+        path = out_dir / f"digital_{i:03d}.pdf"
+        write_text_pdf(path, [page_lines(rng) for _ in range(pages)])
+        manifest.append({"path": str(path), "content_type": "application/pdf", "kind": "digital_pdf", "pages": pages})
+    for i in range(scanned):
+        path = out_dir / f"scanned_{i:03d}.pdf"
+        rendered = [render_page(page_lines(rng)) for _ in range(pages)]
+        rendered[0].save(
+            path, "PDF", save_all=True, append_images=rendered[1:], resolution=SCAN_DPI,
+            creationDate=FIXED_DATE, modDate=FIXED_DATE,
+        )
+        manifest.append({"path": str(path), "content_type": "application/pdf", "kind": "scanned_pdf", "pages": pages})
+    for i in range(images):
+        path = out_dir / f"image_{i:03d}.png"
+        render_page(page_lines(rng)).save(path, "PNG")
+        manifest.append({"path": str(path), "content_type": "image/png", "kind": "image", "pages": 1})
+    (out_dir / "manifest.json").write_text(json.dumps(manifest, indent=2))
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", type=Path, required=True)
+    parser.add_argument("--digital", type=int, default=5)
+    parser.add_argument("--scanned", type=int, default=2)
+    parser.add_argument("--images", type=int, default=3)
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    manifest = generate(args.out, args.digital, args.scanned, args.images, args.pages, args.seed)
+    print(f"Wrote {len(manifest)} files ({sum(m['pages'] for m in manifest)} pages) to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,13 @@
 import streamlit as st
 import requests
 import mimetypes
+import json
+from concurrent.futures import ThreadPoolExecutor
 import pandas as pd  # For displaying tables
 
 API_URL = "http://127.0.0.1:8000"  # Update for deployment
+UPLOAD_BATCH_SIZE = 10     # Files per /upload/batch request
+UPLOAD_PARALLELISM = 4     # Batch requests in flight at once
 
 st.set_page_config(page_title="Wasserstoff Gen-AI Chatbot", layout="wide")
 
@@ -68,6 +72,8 @@ if 'selected_docs' not in st.session_state:
     st.session_state.selected_docs = []
 if 'query' not in st.session_state:
     st.session_state.query = ""
+if 'uploaded' not in st.session_state:
+    st.session_state.uploaded = {}  # (name, size) -> job_id, so reruns don't re-upload
 
 @st.cache_data(ttl=300)
 def get_known_documents():
@@ -79,6 +85,13 @@ def get_known_documents():
         st.error(f"Failed to fetch document list: {e}")
         return []
 
+def _try(fn, *args):
+    """Run fn in a worker thread and return (result, error) instead of raising."""
+    try:
+        return fn(*args), None
+    except Exception as e:
+        return None, e
+
 known_docs = get_known_documents()
 
 # Sidebar layout
@@ -86,22 +99,57 @@ with st.sidebar:
     st.header("Upload Documents (75+)")
     uploaded_files = st.file_uploader("Upload multiple PDF or Image files", type=["pdf", "png", "jpg", "jpeg"], accept_multiple_files=True)
     if uploaded_files:
-        for uploaded_file in uploaded_files:
-            mime_type, _ = mimetypes.guess_type(uploaded_file.name)
-            files = {
-                "file": (uploaded_file.name, uploaded_file.getvalue(), mime_type or "application/octet-stream")
-            }
-            with st.spinner(f"Uploading and processing {uploaded_file.name}..."):
-                try:
-                    resp = requests.post(f"{API_URL}/upload", files=files)
-                    resp.raise_for_status()
-                    status = resp.json().get("status")
-                    st.success(f"Uploaded: {uploaded_file.name} (Status: {status})")
-                    known_docs = get_known_documents()  # Refresh list
-                except Exception as e:
-                    st.error(f"Upload failed for {uploaded_file.name}: {e}")
-        if uploaded_files:
-            st.info("All selected files uploaded and processing started.")
+        new_files = [f for f in uploaded_files if (f.name, f.size) not in st.session_state.uploaded]
+        batches = [new_files[i:i + UPLOAD_BATCH_SIZE] for i in range(0, len(new_files), UPLOAD_BATCH_SIZE)]
+
+        def post_batch(batch):
+            files = [
+                ("files", (f.name, f.getvalue(), mimetypes.guess_type(f.name)[0] or "application/octet-stream"))
+                for f in batch
+            ]
+            resp = requests.post(f"{API_URL}/upload/batch", files=files)
+            resp.raise_for_status()
+            return resp.json().get("results", [])
+
+        if batches:
+            with st.spinner(f"Uploading {len(new_files)} files..."):
+                with ThreadPoolExecutor(max_workers=UPLOAD_PARALLELISM) as pool:
+                    outcomes = list(pool.map(lambda b: _try(post_batch, b), batches))
+            for batch, (results, error) in zip(batches, outcomes):
+                if error:
+                    st.error(f"Upload failed for {', '.join(f.name for f in batch)}: {error}")
+                    continue
+                sizes = {f.name: f.size for f in batch}
+                for result in results:
+                    name = result["filename"]
+                    if result["status"] in ("rejected", "error"):
+                        st.error(f"Upload failed for {name}: {result.get('error')}")
+                    else:
+                        st.session_state.uploaded[(name, sizes.get(name))] = result.get("job_id")
+                        st.success(f"Uploaded: {name} (Status: {result['status']})")
+
+    st.markdown("---")
+    st.subheader("Ingestion status")
+    try:
+        jobs_resp = requests.get(f"{API_URL}/jobs", params={"limit": 200})
+        jobs_resp.raise_for_status()
+        jobs_data = jobs_resp.json()
+        counts = jobs_data.get("counts", {})
+        pending = sum(counts.get(s, 0) for s in ("queued", "running", "retrying"))
+        if pending:
+            st.warning(f"{pending} document(s) still being indexed; results may be incomplete.")
+        for job in jobs_data.get("jobs", []):
+            if job["status"] in ("queued", "running", "retrying"):
+                st.progress(job["progress"], text=f"{job['filename']}: {job['stage'] or job['status']}")
+            elif job["status"] == "failed":
+                st.error(f"{job['filename']} failed: {job['error']}")
+        if counts:
+            st.caption(", ".join(f"{k}: {v}" for k, v in sorted(counts.items())))
+        if st.button("Refresh status"):
+            get_known_documents.clear()
+            st.rerun()
+    except Exception as e:
+        st.error(f"Failed to fetch ingestion status: {e}")
 
     st.markdown("---")
     st.session_state.selected_docs = st.multiselect(
@@ -151,22 +199,45 @@ if st.session_state.results:
     length_option = st.selectbox("Summary Length:", ["long", "medium", "short"])
 
     if st.button("Generate Summary"):
-        with st.spinner("Synthesizing detailed answer..."):
-            try:
-                synthesis_resp = requests.post(f"{API_URL}/synthesize", json={
-                    "question": st.session_state.query,
-                    "results": st.session_state.results,
-                    "style": style_option,
-                    "include_sources": include_sources_option,
-                    "length": length_option
-                })
+        placeholder = st.empty()
+        answer = ""
+        try:
+            with requests.post(f"{API_URL}/synthesize/stream", json={
+                "question": st.session_state.query,
+                "results": st.session_state.results,
+                "style": style_option,
+                "include_sources": include_sources_option,
+                "length": length_option
+            }, stream=True, timeout=(10, 300)) as synthesis_resp:
                 synthesis_resp.raise_for_status()
-                st.session_state.detailed_summary = synthesis_resp.json().get("answer", "")
+                event = None
+                for line in synthesis_resp.iter_lines(decode_unicode=True):
+                    if not line:
+                        event = None
+                        continue
+                    if line.startswith("event:"):
+                        event = line[len("event:"):].strip()
+                    elif line.startswith("data:"):
+                        data = json.loads(line[len("data:"):])
+                        if event == "error":
+                            raise RuntimeError(data.get("details", "unknown error"))
+                        if event == "done":
+                            if data.get("ttft_ms") is not None:
+                                st.caption(f"First token after {data['ttft_ms']:.0f} ms, complete after {data['total_ms'] / 1000:.1f} s")
+                            break
+                        answer += data.get("token", "")
+                        placeholder.markdown(
+                            f"## 🧠 Detailed AI Summary\n<div class='result-box detailed-summary'>{answer}▌</div>",
+                            unsafe_allow_html=True
+                        )
+            st.session_state.detailed_summary = answer
+            placeholder.empty()
 
-                if not st.session_state.detailed_summary:
-                    st.error("Received empty response from AI")
-            except Exception as e:
-                st.error(f"LLM synthesis failed: {e}")
+            if not st.session_state.detailed_summary:
+                st.error("Received empty response from AI")
+        except Exception as e:
+            st.session_state.detailed_summary = answer
+            st.error(f"LLM synthesis failed: {e}")
 
     # Display detailed summary if available
     if st.session_state.detailed_summary:
@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+
+from backend.app.services import dedup
+
+# A typical disclaimer chunk; copies differ only in the document name and page number
+FOOTER = (
+    "This document is confidential and intended solely for the named addressee. If you received it in error "
+    "please notify the sender immediately and delete every copy. Any review, retransmission, dissemination or "
+    "other use of this information by persons other than the intended recipient is prohibited. Acme Corporation "
+    "accepts no liability for errors, omissions or damage arising from its contents, and statements herein do "
+    "not constitute legal, tax or investment advice. {name} page {page}"
+)
+
+
+def _text(seed: int, words: int = 60) -> str:
+    rng = np.random.default_rng(seed)
+    return " ".join(f"w{n}" for n in rng.integers(0, 10000, words))
+
+
+def _result(content: str, n: int) -> dict:
+    return {"content": content, "metadata": {"filename": f"doc{n}.pdf", "chunk_num": n}, "score": float(n)}
+
+
+def test_near_duplicates_are_similar_and_distinct_texts_are_not():
+    a = dedup.minhash(FOOTER.format(name="a.pdf", page=1))
+    b = dedup.minhash(FOOTER.format(name="a.pdf", page=2))
+    c = dedup.minhash(_text(0))
+    assert dedup.similarity(a, b) >= dedup.DEDUP_THRESHOLD
+    assert dedup.similarity(a, c) < 0.2
+    assert dedup.minhash("") is None
+
+
+def test_collapse_folds_copies_into_best_ranked():
+    results = [
+        _result(FOOTER.format(name="a.pdf", page=1), 0),
+        _result(_text(1), 1),
+        _result(FOOTER.format(name="b.pdf", page=7), 2),
+        _result(_text(2), 3),
+        _result(FOOTER.format(name="c.pdf", page=3), 4),
+    ]
+    collapsed = dedup.collapse(results, k=10)
+    assert [r["metadata"]["chunk_num"] for r in collapsed] == [0, 1, 3]
+    assert [d["chunk_num"] for d in collapsed[0]["duplicates"]] == [2, 4]
+    assert "duplicates" not in collapsed[1]
+    assert dedup.collapse(results, k=2) == collapsed[:2]
+
+
+def test_collapse_keeps_texts_without_tokens():
+    results = [_result("", 0), _result("", 1), _result(_text(3), 2)]
+    assert len(dedup.collapse(results, k=3)) == 3
+
+
+def test_canonical_positions():
+    texts = [FOOTER.format(name="a.pdf", page=1), _text(4), FOOTER.format(name="a.pdf", page=2), ""]
+    assert dedup.canonical_positions(texts) == [0, 1, 0, 3]
+
+
+def test_query_returns_k_distinct_results(tmp_path, monkeypatch):
+    pytest.importorskip("faiss")
+    pytest.importorskip("filelock")
+    pytest.importorskip("langchain_core")
+    from backend.app.services import faiss_store
+
+    manager = faiss_store.IndexManager(tmp_path / "faiss_index.faiss", tmp_path / "faiss_index.sqlite")
+    monkeypatch.setattr(faiss_store, "_manager", manager)
+    monkeypatch.setattr(faiss_store, "QUERY_BATCHING", False)
+    monkeypatch.setattr(dedup, "DEDUP_OVERFETCH", 2)
+
+    rng = np.random.default_rng(0)
+    dim, k = 16, 4
+    query = rng.standard_normal(dim).astype("float32")
+    # 20 copies of a footer sit right next to the query and crowd every first-round candidate
+    copies = query + 0.01 * rng.standard_normal((20, dim)).astype("float32")
+    distinct = query + 2.0 * rng.standard_normal((10, dim)).astype("float32")
+    assert manager.acquire_writer()
+    try:
+        manager.add(
+            np.vstack([copies, distinct]),
+            [FOOTER.format(name=f"doc{i}.pdf", page=i) for i in range(20)] + [_text(100 + i) for i in range(10)],
+            [{"filename": f"doc{i}.pdf", "chunk_num": i} for i in range(30)],
+        )
+
+        hits = faiss_store.query_chunks(None, "footer", k=k, query_vector=query.tolist(), mode="dense")
+        assert len(hits) == k
+        assert len(hits[0]["duplicates"]) == 19
+        assert len({h["content"] for h in hits}) == k
+
+        # Fewer distinct chunks than k: everything distinct comes back, and the loop ends
+        hits = faiss_store.query_chunks(None, "footer", k=20, query_vector=query.tolist(), mode="dense")
+        assert len(hits) == 11
+
+        plain = faiss_store.query_chunks(
+            None, "footer", k=k, query_vector=query.tolist(), mode="dense", collapse_duplicates=False
+        )
+        assert len(plain) == k and all("duplicates" not in h for h in plain)
+    finally:
+        manager.release_writer()
@@ -0,0 +1,188 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("faiss")
+pytest.importorskip("filelock")
+pytest.importorskip("langchain_core")
+
+from backend.app.services import faiss_store  # noqa: E402
+from backend.app.services.faiss_store import IndexManager  # noqa: E402
+
+DIM = 8
+
+
+@pytest.fixture
+def writer(tmp_path, monkeypatch):
+    # Compaction only runs when a test calls it
+    monkeypatch.setattr(faiss_store, "COMPACT_DELAY", 3600.0)
+    base = tmp_path / "faiss_index"
+    manager = IndexManager(base.with_suffix(".faiss"), base.with_suffix(".sqlite"), persist_delay=3600)
+    assert manager.acquire_writer()
+    yield manager
+    manager.release_writer()
+
+
+def _add(manager, filename, texts, rng):
+    vectors = rng.standard_normal((len(texts), DIM)).astype("float32")
+    return manager.add(vectors, texts, [{"filename": filename, "chunk_num": i} for i in range(len(texts))])
+
+
+def test_delete_readd_compact_keeps_new_chunks(writer):
+    rng = np.random.default_rng(0)
+    old = _add(writer, "a.pdf", [f"Order in case 12-cv-3456 part {i}" for i in range(5)], rng)
+    writer.delete_document("a.pdf")
+    # Replace-on-reupload: the same document comes straight back
+    new = _add(writer, "a.pdf", [f"unrelated weather report {i}" for i in range(5)], rng)
+    assert not set(old) & set(new)
+
+    query = np.zeros((1, DIM), dtype="float32")
+    _, ids = writer.search(query, 10)
+    assert set(ids[0]) - {-1} == set(new)
+
+    writer.compact()
+    assert writer.get().ntotal == 5
+    assert writer.meta.count() == 5
+    _, ids = writer.search(query, 10)
+    assert set(ids[0]) - {-1} == set(new)
+    assert len(writer.lexical.search("12-cv-3456")[0]) == 0
+    assert set(writer.lexical.search("weather", k=10)[0].tolist()) == set(new)
+
+    # The high-water mark survives a restart even though the deleted ids are gone everywhere
+    assert writer.meta.next_id() == max(new) + 1
+    writer.delete_document("a.pdf")
+    writer.compact()
+    assert IndexManager(writer.path, writer.meta_path).meta.next_id() == max(new) + 1
+
+
+def test_compact_ivf_index(writer):
+    rng = np.random.default_rng(1)
+    # Enough vectors to train an IVF index with the minimum number of lists
+    vectors = rng.standard_normal((1000, DIM)).astype("float32")
+    writer.add(vectors[:100], [f"gone {i}" for i in range(100)], [{"filename": "gone.pdf"}] * 100)
+    kept = writer.add(vectors[100:], [f"kept {i}" for i in range(900)], [{"filename": "kept.pdf"}] * 900)
+    writer.retrain("ivf_flat")
+    writer.delete_document("gone.pdf")
+
+    writer.compact()
+    assert writer.info()["index_type"] == "ivf_flat"
+    assert writer.get().ntotal == 900
+    # Every surviving vector is still found under its own id
+    _, ids = writer.search(vectors[100::50], 1, nprobe=1024)
+    assert ids[:, 0].tolist() == kept[::50]
+
+
+def test_compact_waits_for_retrain(writer):
+    rng = np.random.default_rng(2)
+    _add(writer, "a.pdf", [f"chunk {i}" for i in range(5)], rng)
+    writer.delete_document("a.pdf")
+    writer._retraining = True  # as if a migration had exported the vectors before the delete
+    try:
+        writer.compact()
+        assert writer.get().ntotal == 5
+        assert writer.info()["pending_deletes"] == 5
+        assert writer._compact_timer is not None
+    finally:
+        writer._retraining = False
+    writer.compact()
+    assert writer.get().ntotal == 0
+    assert writer.info()["pending_deletes"] == 0
+
+
+@pytest.mark.parametrize("index_type", ["hnsw", "ivf_flat", "ivf_pq"])
+def test_document_scoped_search_on_ann_index(writer, index_type):
+    rng = np.random.default_rng(3)
+    writer.add(
+        rng.standard_normal((2000, DIM)).astype("float32"),
+        [f"bulk {i}" for i in range(2000)],
+        [{"filename": f"bulk{i % 20}.pdf"} for i in range(2000)],
+    )
+    # A small document far from the query: no probed list / visited node holds its vectors
+    small = writer.add(
+        10 + rng.standard_normal((5, DIM)).astype("float32"),
+        [f"small {i}" for i in range(5)],
+        [{"filename": "small.pdf"}] * 5,
+    )
+    writer.retrain(index_type)
+    assert writer.info()["index_type"] == index_type
+
+    allowed = writer.meta.ids_for_filenames(["small.pdf"])
+    _, ids = writer.search(np.zeros((1, DIM), dtype="float32"), 4, ids=allowed, nprobe=1, ef_search=4)
+    assert len(set(ids[0].tolist())) == 4 and set(ids[0].tolist()) <= set(small)
+
+    # Reloaded from the published snapshot (memory-mapped where supported)
+    writer.reload()
+    _, ids = writer.search(np.zeros((1, DIM), dtype="float32"), 4, ids=allowed, nprobe=1, ef_search=4)
+    assert set(ids[0].tolist()) <= set(small)
+
+
+def test_restore_vectors_lost_in_a_crash(tmp_path):
+    rng = np.random.default_rng(4)
+    base = tmp_path / "faiss_index"
+    crashed = IndexManager(base.with_suffix(".faiss"), base.with_suffix(".sqlite"), persist_delay=3600)
+    assert crashed.acquire_writer()
+    vectors = rng.standard_normal((10, DIM)).astype("float32")
+    crashed.add(vectors[:5], [f"a {i}" for i in range(5)], [{"filename": "a.pdf"}] * 5)
+    crashed.flush()
+    lost = crashed.add(vectors[5:], [f"b {i}" for i in range(5)], [{"filename": "b.pdf"}] * 5)
+    # The process dies before the debounced persist: rows are committed, vectors are not
+    crashed._timer.cancel()
+    crashed._writer_lock.release()
+
+    writer = IndexManager(base.with_suffix(".faiss"), base.with_suffix(".sqlite"), persist_delay=3600)
+    assert writer.acquire_writer()
+    try:
+        assert writer.get().ntotal == 5
+        missing = writer.unindexed_chunks()
+        assert [chunk_id for chunk_id, _ in missing] == lost
+        assert writer.restore([chunk_id for chunk_id, _ in missing], vectors[5:]) == 5
+        assert writer.unindexed_chunks() == []
+        assert writer.restore([max(lost) + 1], vectors[:1]) == 0  # no such chunk (e.g. deleted meanwhile)
+        _, ids = writer.search(vectors[5:6], 1)
+        assert ids[0, 0] == lost[0]
+    finally:
+        writer.release_writer()
+
+
+def test_searches_run_while_a_snapshot_is_written(writer, monkeypatch):
+    import threading
+
+    rng = np.random.default_rng(5)
+    _add(writer, "a.pdf", [f"chunk {i}" for i in range(5)], rng)
+    writing, release = threading.Event(), threading.Event()
+    publish = faiss_store._publish_snapshot
+
+    def slow_publish(*args):
+        writing.set()
+        assert release.wait(10)
+        return publish(*args)
+
+    monkeypatch.setattr(faiss_store, "_publish_snapshot", slow_publish)
+    flusher = threading.Thread(target=writer.flush)
+    flusher.start()
+    assert writing.wait(10)
+    # A write waits for the snapshot; searches, including ones arriving after it, do not
+    adder = threading.Thread(target=_add, args=(writer, "b.pdf", ["late chunk"], rng))
+    adder.start()
+    _, ids = writer.search(np.zeros((1, DIM), dtype="float32"), 5)
+    assert (ids != -1).sum() == 5
+    assert adder.is_alive()
+    release.set()
+    flusher.join(10)
+    adder.join(10)
+    assert writer.get().ntotal == 6
+    assert writer.info()["snapshot"] == 1
+
+
+def test_all_documents_selected_searches_unfiltered(writer, monkeypatch):
+    rng = np.random.default_rng(6)
+    for name in ("a.pdf", "b.pdf", "c.pdf"):
+        _add(writer, name, [f"{name} {i}" for i in range(4)], rng)
+    writer.delete_document("c.pdf")  # still in the index, tombstoned
+
+    def no_subset_scan(*args):
+        raise AssertionError("every live vector is allowed; the subset scan is not needed")
+
+    monkeypatch.setattr(IndexManager, "_subset_scan", staticmethod(no_subset_scan))
+    allowed = writer.meta.ids_for_filenames(["a.pdf", "b.pdf"])
+    _, ids = writer.search(np.zeros((1, DIM), dtype="float32"), 12, ids=allowed)
+    assert set(ids[0].tolist()) - {-1} == set(allowed.tolist())
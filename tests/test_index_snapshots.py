@@ -0,0 +1,92 @@
+import time
+
+import numpy as np
+import pytest
+
+pytest.importorskip("faiss")
+pytest.importorskip("filelock")
+pytest.importorskip("langchain_core")
+
+from backend.app.services import faiss_store  # noqa: E402
+from backend.app.services.faiss_store import IndexManager  # noqa: E402
+
+DIM = 8
+
+
+@pytest.fixture
+def base(tmp_path, monkeypatch):
+    monkeypatch.setattr(faiss_store, "SNAPSHOT_POLL", 0.0)
+    return tmp_path / "faiss_index"
+
+
+def _manager(base):
+    # Long persist delay: writes stay unpublished until an explicit flush()
+    return IndexManager(base.with_suffix(".faiss"), base.with_suffix(".sqlite"), persist_delay=3600)
+
+
+def _add(manager, filename, vectors):
+    return manager.add(
+        vectors,
+        [f"{filename} chunk {i}" for i in range(len(vectors))],
+        [{"filename": filename, "chunk_num": i} for i in range(len(vectors))],
+    )
+
+
+def _wait_for_snapshot(manager, version, timeout=10.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        manager.get()  # polls and starts the background swap
+        if manager.info()["snapshot"] == version:
+            return
+        time.sleep(0.05)
+    raise AssertionError(f"reader never swapped in snapshot v{version}")
+
+
+def test_publish_and_reader_reload(base):
+    rng = np.random.default_rng(0)
+    writer = _manager(base)
+    assert writer.acquire_writer()
+    try:
+        first = _add(writer, "a.pdf", rng.standard_normal((10, DIM)).astype("float32"))
+        writer.flush()
+
+        reader = _manager(base)
+        assert not reader.acquire_writer()
+        assert reader.get().ntotal == 10
+
+        second = _add(writer, "b.pdf", rng.standard_normal((5, DIM)).astype("float32"))
+        writer.flush()
+        _wait_for_snapshot(reader, writer.info()["snapshot"])
+        assert reader.get().ntotal == 15
+        _, ids = reader.search(np.zeros((1, DIM), dtype="float32"), 15)
+        assert set(ids[0]) == set(first) | set(second)
+    finally:
+        writer.release_writer()
+
+
+def test_reader_search_skips_unpublished_ids(base):
+    rng = np.random.default_rng(1)
+    writer = _manager(base)
+    assert writer.acquire_writer()
+    try:
+        published = _add(writer, "a.pdf", rng.standard_normal((10, DIM)).astype("float32"))
+        writer.flush()
+        reader = _manager(base)
+        reader.get()
+
+        # Committed to SQLite by the writer, but not yet in any published snapshot
+        unpublished = _add(writer, "b.pdf", rng.standard_normal((10, DIM)).astype("float32"))
+        allowed = reader.meta.ids_for_filenames(["a.pdf", "b.pdf"])
+        assert set(unpublished) <= set(allowed)
+
+        query = rng.standard_normal((1, DIM)).astype("float32")
+        distances, ids = reader.search(query, 5, ids=allowed)
+        hits = [i for i in ids[0] if i != -1]
+        assert len(hits) == 5
+        assert set(hits) <= set(published)
+
+        # Only unpublished ids selected: nothing to return, but no error either
+        _, ids = reader.search(query, 5, ids=np.asarray(unpublished, dtype="int64"))
+        assert (ids == -1).all()
+    finally:
+        writer.release_writer()
@@ -0,0 +1,71 @@
+import numpy as np
+
+from backend.app.services import lexical_index
+from backend.app.services.lexical_index import LexicalIndex
+
+WORDS = "alpha beta gamma delta epsilon zeta eta theta iota kappa lambda mu nu xi omicron pi rho sigma".split()
+QUERIES = ["alpha beta", "gamma", "theta iota kappa", "sigma rho pi alpha", "nu xi"]
+
+
+def _corpus(n, seed=0):
+    rng = np.random.default_rng(seed)
+    return {i: " ".join(rng.choice(WORDS, int(rng.integers(3, 30)))) for i in range(n)}
+
+
+def _scores(index: LexicalIndex, query: str):
+    ids, scores = index.search(query, k=1000)
+    return dict(zip(ids.tolist(), scores.tolist()))
+
+
+def _assert_same_scores(index: LexicalIndex, rebuilt: LexicalIndex):
+    for query in QUERIES:
+        got, expected = _scores(index, query), _scores(rebuilt, query)
+        assert got.keys() == expected.keys(), query
+        np.testing.assert_allclose([got[i] for i in expected], list(expected.values()), rtol=1e-5)
+
+
+def test_scores_after_merge_match_rebuild(tmp_path, monkeypatch):
+    # Every flush merges the delta into the base segment
+    monkeypatch.setattr(lexical_index, "LEXICAL_MERGE_POSTINGS", 1)
+    corpus = _corpus(300)
+    deleted = set(range(0, 300, 7))
+
+    index = LexicalIndex(tmp_path / "incremental.bm25")
+    for start in range(0, 300, 50):
+        ids = list(range(start, start + 50))
+        index.add(ids, [corpus[i] for i in ids])
+        index.delete([i for i in ids if i in deleted and i < start + 25])
+        index.flush()
+    index.delete(deleted)
+    index.flush()
+    assert index.stats()["delta_postings"] == 0
+
+    live = [i for i in corpus if i not in deleted]
+    rebuilt = LexicalIndex(tmp_path / "rebuilt.bm25")
+    rebuilt.add(live, [corpus[i] for i in live])
+
+    _assert_same_scores(index, rebuilt)
+    for query in QUERIES:
+        assert not set(_scores(index, query)) & deleted
+
+    # Persisted segments score the same after a reload
+    reloaded = LexicalIndex(tmp_path / "incremental.bm25")
+    reloaded.reload()
+    _assert_same_scores(reloaded, rebuilt)
+
+
+def test_buffer_delta_and_base_segments_combine(tmp_path, monkeypatch):
+    monkeypatch.setattr(lexical_index, "LEXICAL_MERGE_POSTINGS", 10 ** 9)
+    corpus = _corpus(90, seed=1)
+    index = LexicalIndex(tmp_path / "segments.bm25")
+    index.add(range(0, 30), [corpus[i] for i in range(0, 30)])
+    monkeypatch.setattr(lexical_index, "LEXICAL_MERGE_POSTINGS", 1)
+    index.flush()  # base
+    monkeypatch.setattr(lexical_index, "LEXICAL_MERGE_POSTINGS", 10 ** 9)
+    index.add(range(30, 60), [corpus[i] for i in range(30, 60)])
+    index.flush()  # delta
+    index.add(range(60, 90), [corpus[i] for i in range(60, 90)])  # still buffered
+
+    rebuilt = LexicalIndex(tmp_path / "rebuilt.bm25")
+    rebuilt.add(range(90), [corpus[i] for i in range(90)])
+    _assert_same_scores(index, rebuilt)
@@ -0,0 +1,62 @@
+import threading
+
+import numpy as np
+import pytest
+
+pytest.importorskip("langchain_core")
+
+from backend.app.services.query_batcher import QueryBatcher  # noqa: E402
+
+
+class FakeEmbedder:
+    def __init__(self):
+        self.calls = []
+        self.gate = threading.Event()
+
+    def embed_queries(self, questions):
+        self.calls.append(list(questions))
+        if len(self.calls) == 1:
+            assert self.gate.wait(10)  # hold the first batch until every other caller is queued
+        return [[float(len(q)), 0.0] for q in questions]
+
+
+class FakeManager:
+    def __init__(self):
+        self.searches = 0
+
+    def search(self, vectors, k, nprobe=None, ef_search=None):
+        self.searches += 1
+        ids = np.tile(np.arange(k, dtype="int64"), (len(vectors), 1))
+        return vectors[:, :1].repeat(k, axis=1), ids
+
+
+def test_filtered_queries_share_the_embedding_pass():
+    embedder, manager = FakeEmbedder(), FakeManager()
+    batcher = QueryBatcher(manager, wait_ms=50)
+    results = {}
+
+    def embed(question):
+        results[question] = batcher.embed(embedder, question)
+
+    def search(question):
+        results[question] = batcher.search(embedder, question, 3)
+
+    first = threading.Thread(target=embed, args=("q",))
+    first.start()
+    while not embedder.calls:
+        pass
+    threads = [threading.Thread(target=embed, args=("x" * n,)) for n in range(2, 6)]
+    threads.append(threading.Thread(target=search, args=("unfiltered",)))
+    for t in threads:
+        t.start()
+    while batcher._queue.qsize() < len(threads):
+        pass
+    embedder.gate.set()
+    for t in [first] + threads:
+        t.join(10)
+
+    assert len(embedder.calls) == 2 and len(embedder.calls[1]) == 5
+    assert manager.searches == 1  # only the unfiltered query is searched by the batcher
+    assert results["xxxx"].tolist() == [4.0, 0.0]
+    distances, ids = results["unfiltered"]
+    assert ids.tolist() == [[0, 1, 2]] and distances[0, 0] == len("unfiltered")